@@ -0,0 +1,139 @@
+"""Admission control: bounded concurrency per class of request, shedding load with 503s.
+
+Under overload, requests that are let in all at once queue up in the threadpool and the
+event loop, and every one of them gets slower until clients time out. ``AdmissionMiddleware``
+lets at most ``max_in_flight`` requests of a class run at a time. The next ``max_queue``
+wait in FIFO order for a slot, for up to ``max_wait`` seconds. A request that finds the
+queue full, or whose wait runs out, is answered at once with 503 and ``Retry-After``. This
+keeps the latency of admitted requests bounded by the wait budget plus the service time.
+
+Ingest (``POST /receipts/process*``) and reads have separate budgets, so a flood of heavy
+receipts cannot starve cheap points lookups. Metrics, docs and the OpenAPI schema are never
+limited.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from app import metrics
+
+ADMISSION_SHED = metrics.registry.counter(
+    "receipts_admission_shed_total", "Requests answered with 503 by admission control.", ("budget", "reason")
+)
+ADMISSION_WAIT = metrics.registry.histogram(
+    "receipts_admission_wait_seconds", "Time admitted requests waited for a slot.", ("budget",)
+)
+
+UNLIMITED_PATHS = ("/metrics", "/docs", "/redoc", "/openapi.json")
+
+
+class Budget:
+    """A FIFO-fair limit on concurrent requests, with a bounded queue and a bounded wait."""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Takes a slot; returns None once admitted or the reason the request is shed."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            ADMISSION_WAIT.observe(0.0, self.name)
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                return "wait_timeout"
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+        ADMISSION_WAIT.observe(time.perf_counter() - start, self.name)
+        return None
+
+    def _abandon(self, waiter) -> bool:
+        """Stops waiting; returns True if a slot was handed over in the meantime."""
+        if waiter.done():
+            return True
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        return False
+
+    def release(self) -> None:
+        # Hand the slot straight to the longest waiter, so newcomers cannot jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def classify(scope) -> Optional[str]:
+    """The budget of a request: "ingest", "read", or None for requests that are never limited."""
+    path = scope["path"]
+    if path in UNLIMITED_PATHS:
+        return None
+    if scope["method"] == "POST" and path.startswith("/receipts/process"):
+        return "ingest"
+    return "read"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying a ``Budget`` per request class."""
+
+    def __init__(
+        self,
+        app,
+        budgets: Dict[str, Budget],
+        retry_after: int = 1,
+        classify: Callable[[dict], Optional[str]] = classify,
+    ):
+        self.app = app
+        self.budgets = budgets
+        self.retry_after = retry_after
+        self.classify = classify
+        self._body = json.dumps({"detail": "The service is overloaded, retry later."}).encode()
+
+    async def __call__(self, scope, receive, send):
+        budget = self.budgets.get(self.classify(scope)) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await budget.acquire()
+        if reason is not None:
+            ADMISSION_SHED.inc(budget.name, reason)
+            await self._shed(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
+
+    async def _shed(self, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self._body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": self._body})
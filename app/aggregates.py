@@ -0,0 +1,189 @@
+"""Running totals of receipts and points per retailer and per purchase date.
+
+``Aggregates`` is updated as each receipt is scored, so reports read a few numbers instead
+of scanning the store. Every key maps to a series laid out like a metrics histogram: one
+count per points bucket, then the overflow bucket, the receipt count and the points sum.
+Series add element-wise, which makes aggregates mergeable: ``snapshot`` returns plain JSON
+data and ``merge`` adds a snapshot in.
+
+With several worker processes, ``AggregateSync`` writes this process's snapshot to a
+directory shared by the workers every few seconds and merges the other workers' files, so
+any worker can answer for all of them. Other workers' numbers lag by at most that interval.
+Each worker start writes its own file, removed when it closes. Aggregates live in memory, so
+the file of a worker that died without closing stops counting once it is several intervals
+old, and is removed by the next worker that reads the directory.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+POINTS_BUCKETS = (10, 25, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+Series = List[int]
+
+
+def normalize_retailer(retailer: str) -> str:
+    """Retailer key: case-folded with runs of whitespace collapsed, so spellings group together."""
+    return " ".join(retailer.split()).casefold()
+
+
+def combine(series: Iterable[Optional[Series]]) -> Optional[Series]:
+    """Adds series element-wise; None if there are none."""
+    total = None
+    for values in series:
+        if values is None:
+            continue
+        total = list(values) if total is None else [a + b for a, b in zip(total, values)]
+    return total
+
+
+def summarize(series: Series, buckets: Sequence[int] = POINTS_BUCKETS) -> Dict[str, object]:
+    """The API form of a series: counts, points and the points histogram."""
+    histogram = [{"le": bound, "count": count} for bound, count in zip(buckets, series)]
+    histogram.append({"le": None, "count": series[len(buckets)]})
+    return {"count": series[-2], "points": series[-1], "histogram": histogram}
+
+
+class Aggregates:
+    """Receipt counts, point sums and point histograms keyed by retailer and by purchase date."""
+
+    def __init__(self, buckets: Sequence[int] = POINTS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.retailers: Dict[str, Series] = {}
+        self.dates: Dict[str, Series] = {}  # ISO dates, which sort chronologically
+        self._sorted_dates: List[str] = []
+        self._lock = threading.Lock()
+
+    def _series(self, table: Dict[str, Series], key: str) -> Series:
+        series = table.get(key)
+        if series is None:
+            series = table[key] = [0] * (len(self.buckets) + 3)
+            if table is self.dates:
+                insort(self._sorted_dates, key)
+        return series
+
+    def record(self, retailer: str, purchase_date, points: int) -> None:
+        self.record_many([(retailer, purchase_date, points)])
+
+    def record_many(self, entries: Iterable[Tuple[str, object, int]]) -> None:
+        """Adds ``(retailer, purchase date, points)`` for each scored receipt."""
+        entries = [
+            (normalize_retailer(retailer), purchase_date.isoformat(), points, bisect_left(self.buckets, points))
+            for retailer, purchase_date, points in entries
+        ]
+        with self._lock:
+            for retailer, purchase_date, points, index in entries:
+                for series in (self._series(self.retailers, retailer), self._series(self.dates, purchase_date)):
+                    series[index] += 1
+                    series[-2] += 1
+                    series[-1] += points
+
+    def retailer(self, retailer: str) -> Optional[Series]:
+        return self.retailers.get(normalize_retailer(retailer))
+
+    def date(self, purchase_date: str) -> Optional[Series]:
+        return self.dates.get(purchase_date)
+
+    def date_range(self, start: Optional[str] = None, end: Optional[str] = None) -> Optional[Series]:
+        """Combined series of the dates from ``start`` to ``end``, both inclusive."""
+        with self._lock:
+            low = 0 if start is None else bisect_left(self._sorted_dates, start)
+            high = len(self._sorted_dates) if end is None else bisect_right(self._sorted_dates, end)
+            keys = self._sorted_dates[low:high]
+        return combine(self.dates[key] for key in keys)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "retailers": {key: list(series) for key, series in self.retailers.items()},
+                "dates": {key: list(series) for key, series in self.dates.items()},
+            }
+
+    def merge(self, snapshot: Dict[str, object]) -> None:
+        """Adds a snapshot taken with the same buckets into these aggregates."""
+        if tuple(snapshot["buckets"]) != self.buckets:
+            raise ValueError("Cannot merge aggregates with different points buckets")
+        with self._lock:
+            for table, name in ((self.retailers, "retailers"), (self.dates, "dates")):
+                for key, values in snapshot[name].items():
+                    series = self._series(table, key)
+                    for index, value in enumerate(values):
+                        series[index] += value
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, object]) -> "Aggregates":
+        aggregates = cls(snapshot["buckets"])
+        aggregates.merge(snapshot)
+        return aggregates
+
+
+class AggregateSync:
+    """Shares the aggregates of worker processes through snapshot files in one directory."""
+
+    # Intervals without a publication after which a worker's file is stale
+    STALE_INTERVALS = 5
+
+    def __init__(self, local: Aggregates, directory: str, interval: float = 1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.local = local
+        self.directory = directory
+        self.interval = interval
+        # Unique per start, so a worker that reuses a dead worker's PID does not take over its file
+        self.path = os.path.join(directory, f"{os.getpid()}-{os.urandom(6).hex()}.json")
+        self._stop = threading.Event()
+        self._peers = self._load_peers()
+        self._thread = threading.Thread(target=self._run, name="aggregate-sync", daemon=True)
+        self._thread.start()
+
+    def publish(self) -> None:
+        """Atomically replaces this process's snapshot file."""
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.local.snapshot(), f, separators=(",", ":"))
+        os.replace(temporary, self.path)
+
+    def _load_peers(self) -> Aggregates:
+        """Merges the other workers' files, removing those of workers that died without closing."""
+        peers = Aggregates(self.local.buckets)
+        stale_before = time.time() - self.STALE_INTERVALS * self.interval
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith((".json", ".json.tmp")) or path.startswith(self.path):
+                continue
+            try:
+                if os.path.getmtime(path) < stale_before:
+                    os.remove(path)
+                    continue
+                if name.endswith(".json"):
+                    with open(path) as f:
+                        peers.merge(json.load(f))
+            except (OSError, ValueError):
+                continue  # Removed or replaced while we read it; next reload catches up
+        return peers
+
+    def peers(self) -> Aggregates:
+        """The merged aggregates of the other workers, reloaded by the sync thread every interval."""
+        return self._peers
+
+    def sources(self) -> List[Aggregates]:
+        return [self.local, self.peers()]
+
+    def _run(self) -> None:
+        # File I/O stays on this thread, off the event loop serving the aggregate endpoints
+        while not self._stop.wait(self.interval):
+            self.publish()
+            self._peers = self._load_peers()
+
+    def close(self) -> None:
+        """Stops publishing and removes this worker's file: its aggregates end with the process."""
+        self._stop.set()
+        self._thread.join()
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
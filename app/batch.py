@@ -0,0 +1,88 @@
+import json
+from typing import Any, Iterator, List, Optional, Tuple
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from app.models import Receipt
+
+# Content types that mark a body as newline-delimited JSON rather than a JSON array
+NDJSON_MEDIA_TYPES = (
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+    "application/x-jsonlines",
+)
+
+_entries_adapter = TypeAdapter(List[Any])
+
+
+def is_ndjson(content_type: Optional[str]) -> bool:
+    """Returns True when the Content-Type header announces an NDJSON stream."""
+    if not content_type:
+        return False
+    return content_type.split(";", 1)[0].strip().lower() in NDJSON_MEDIA_TYPES
+
+
+# Raised by json.loads on bytes that are not valid JSON, or not valid UTF-8
+JSON_DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+
+def json_decode_error(exc: ValueError, loc: Tuple = ()) -> dict:
+    """Builds the same error entry FastAPI emits for a body that is not valid JSON.
+
+    Bytes that are not valid UTF-8 get the same entry, located at the first bad byte.
+    """
+    if isinstance(exc, UnicodeDecodeError):
+        pos, error = exc.start, f"Invalid UTF-8: {exc.reason}"
+    else:
+        pos, error = exc.pos, exc.msg
+    return {
+        "type": "json_invalid",
+        "loc": loc + (pos,),
+        "msg": "JSON decode error",
+        "input": {},
+        "ctx": {"error": error},
+    }
+
+
+def iter_ndjson_lines(body: bytes) -> Iterator[bytes]:
+    """Yields the non-blank lines of an NDJSON body."""
+    for line in body.splitlines():
+        if line.strip():
+            yield line
+
+
+def decode_batch(body: bytes, content_type: Optional[str]) -> List[Tuple[Any, Optional[List[dict]]]]:
+    """Splits a batch body into ``(entry, errors)`` pairs, one per receipt, in input order.
+
+    A JSON array that cannot be decoded invalidates the whole request; with NDJSON only the
+    offending line is rejected.
+    """
+    if is_ndjson(content_type):
+        entries = []
+        for line in iter_ndjson_lines(body):
+            try:
+                entries.append((json.loads(line), None))
+            except JSON_DECODE_ERRORS as exc:
+                entries.append((None, [json_decode_error(exc)]))
+        return entries
+
+    try:
+        data = json.loads(body)
+    except JSON_DECODE_ERRORS as exc:
+        raise RequestValidationError([json_decode_error(exc, ("body",))], body=getattr(exc, "doc", None)) from exc
+    try:
+        data = _entries_adapter.validate_python(data)
+    except ValidationError as exc:
+        raise RequestValidationError(
+            [{**err, "loc": ("body",) + tuple(err["loc"])} for err in exc.errors(include_url=False)]
+        ) from exc
+    return [(entry, None) for entry in data]
+
+
+def validate_entry(entry: Any) -> Tuple[Optional[Receipt], Optional[List[dict]]]:
+    """Validates one batch entry, returning either the receipt or its validation errors."""
+    try:
+        return Receipt.model_validate(entry), None
+    except ValidationError as exc:
+        return None, exc.errors(include_url=False)
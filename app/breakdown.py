@@ -0,0 +1,202 @@
+"""Per-rule score breakdowns, stored compactly and rescored in bulk when a rule changes.
+
+``BreakdownStore`` wraps a backend store. For every receipt it keeps the rule ``Features``
+and one component per rule in typed arrays indexed by row; the points of a receipt are the
+sum of its components. Each total is also written through to the backend, so IDs stored
+before breakdowns were enabled are still found there.
+
+A migration changes one rule: the component of the new version is computed from the stored
+features into a new column, a chunk at a time, while reads keep summing the old column.
+Rows added in the meantime are caught up under the lock, then the column and the active
+rule version are switched together, so every total is computed with one set of rule
+versions. Totals that changed are then written through to the backend in bulk.
+"""
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.rules import Features, Rule, RuleRegistry, extract_features, score_features
+from app.storage import ReceiptStore
+
+# Breakdowns and rule versions live in process memory, so only backends that do too can hold
+# the totals: a durable or shared backend would outlive them or be shared between workers
+BREAKDOWN_BACKENDS = ("dict", "sharded", "compact")
+
+_SCALAR_COLUMNS = ("retailer_chars", "total_cents", "item_count", "day_of_month", "time_of_day_us", "item_start")
+_ITEM_COLUMNS = ("item_lengths", "item_prices")
+
+
+def _extended(column, values: Sequence[int]):
+    """Extends an int64 array, falling back to a list once a value does not fit."""
+    if isinstance(column, list):
+        column.extend(values)
+        return column
+    try:
+        column.extend(array("q", values))
+    except OverflowError:
+        column = list(column)
+        column.extend(values)
+    return column
+
+
+def _appended(column, value: int):
+    try:
+        column.append(value)
+    except OverflowError:
+        column = list(column)
+        column.append(value)
+    return column
+
+
+class MigrationInProgress(RuntimeError):
+    """Raised when a rule change is requested while another one is being applied."""
+
+
+class BreakdownStore(ReceiptStore):
+    """Store wrapper that keeps every receipt's rule inputs and per-rule points."""
+
+    def __init__(self, backing: ReceiptStore, registry: Optional[RuleRegistry] = None, chunk_size: int = 10_000):
+        self.backing = backing
+        self.blocking = backing.blocking
+        self.registry = RuleRegistry() if registry is None else registry
+        self.chunk_size = chunk_size
+        self._rows: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._columns = {name: array("q") for name in _SCALAR_COLUMNS + _ITEM_COLUMNS}
+        self._components = {rule.name: array("q") for rule in self.registry}
+        self._lock = threading.Lock()
+        self.migration: Optional[Dict[str, object]] = None
+
+    def add(self, receipt_id: str, receipt) -> int:
+        """Stores the breakdown and total of ``receipt``, returning its points."""
+        return self.add_many([(receipt_id, receipt)])[0]
+
+    def add_many(self, entries: Iterable[Tuple[str, object]]) -> List[int]:
+        """Stores the breakdown and total of each ``(receipt_id, receipt)``, returning the points."""
+        generation, rules = self.registry.snapshot()
+        rows = []
+        for receipt_id, receipt in entries:
+            features = extract_features(receipt)
+            rows.append((receipt_id, features, score_features(features, rules)))
+        with self._lock:
+            if self.registry.generation != generation:
+                # A migration switched rule versions since: score with the ones now active
+                _, rules = self.registry.snapshot()
+                rows = [(receipt_id, features, score_features(features, rules)) for receipt_id, features, _ in rows]
+            for receipt_id, features, components in rows:
+                self._append(receipt_id, features, zip(rules, components))
+            totals = [sum(components) for _, _, components in rows]
+            self.backing.put_many((receipt_id, total) for (receipt_id, _, _), total in zip(rows, totals))
+        return totals
+
+    def _append(self, receipt_id: str, features: Features, components) -> None:
+        columns = self._columns
+        # The scalar features, then the row's offset into the item columns
+        values = features[:5] + (len(columns["item_lengths"]),)
+        for name, value in zip(_SCALAR_COLUMNS, values):
+            columns[name] = _appended(columns[name], value)
+        columns["item_lengths"] = _extended(columns["item_lengths"], features.item_lengths)
+        columns["item_prices"] = _extended(columns["item_prices"], features.item_prices)
+        for rule, points in components:
+            self._components[rule.name] = _appended(self._components[rule.name], points)
+        # Publish the row last, so readers never see a partly written one
+        self._rows[receipt_id] = len(self._ids)
+        self._ids.append(receipt_id)
+
+    def _features(self, row: int) -> Features:
+        columns = self._columns
+        start = columns["item_start"][row]
+        stop = start + columns["item_count"][row]
+        return Features(
+            columns["retailer_chars"][row],
+            columns["total_cents"][row],
+            columns["item_count"][row],
+            columns["day_of_month"][row],
+            columns["time_of_day_us"][row],
+            columns["item_lengths"][start:stop],
+            columns["item_prices"][start:stop],
+        )
+
+    def _total(self, row: int) -> int:
+        return sum(column[row] for column in list(self._components.values()))
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        row = self._rows.get(receipt_id)
+        if row is None:
+            return self.backing.get(receipt_id)
+        return self._total(row)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        rows = [self._rows.get(receipt_id) for receipt_id in receipt_ids]
+        missing = [receipt_id for receipt_id, row in zip(receipt_ids, rows) if row is None]
+        found = iter(self.backing.get_many(missing) if missing else ())
+        return [next(found) if row is None else self._total(row) for row in rows]
+
+    def put(self, receipt_id: str, points: int) -> None:
+        self.backing.put(receipt_id, points)
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        self.backing.put_many(entries)
+
+    def __len__(self) -> int:
+        return len(self.backing)
+
+    def breakdown(self, receipt_id: str) -> Optional[Dict[str, Tuple[int, int]]]:
+        """Returns ``{rule name: (version, points)}`` for ``receipt_id``, or None without a breakdown."""
+        with self._lock:
+            row = self._rows.get(receipt_id)
+            if row is None:
+                return None
+            return {rule.name: (rule.version, self._components[rule.name][row]) for rule in self.registry}
+
+    def begin_migration(self, name: str, **params: int) -> Rule:
+        """Validates a change to rule ``name`` and claims the migration slot for it.
+
+        Raises ``KeyError`` for an unknown rule, ``ValueError`` for invalid parameters and
+        ``MigrationInProgress`` while another migration runs. Apply it with ``run_migration``.
+        """
+        rule = self.registry.new_version(name, **params)
+        with self._lock:
+            if self.migration is not None:
+                raise MigrationInProgress(f"Rule {self.migration['rule']!r} is being migrated")
+            self.migration = {"rule": name, "version": rule.version, "done": 0, "total": len(self._ids)}
+        return rule
+
+    def run_migration(self, rule: Rule) -> None:
+        """Recomputes ``rule``'s component for every stored receipt, then makes it the active version."""
+        try:
+            count = self.migration["total"]
+            column = array("q")
+            for start in range(0, count, self.chunk_size):
+                stop = min(start + self.chunk_size, count)
+                column = _extended(column, [rule(self._features(row)) for row in range(start, stop)])
+                self.migration["done"] = stop
+                # Let request threads run between chunks
+                time.sleep(0)
+
+            with self._lock:
+                count = len(self._ids)
+                column = _extended(column, [rule(self._features(row)) for row in range(len(column), count)])
+                previous = self._components[rule.name]
+                self._components[rule.name] = column
+                self.registry.activate(rule)
+
+            # Only receipts whose component changed have a new total
+            for start in range(0, count, self.chunk_size):
+                rows = [row for row in range(start, min(start + self.chunk_size, count)) if column[row] != previous[row]]
+                self.backing.put_many([(self._ids[row], self._total(row)) for row in rows])
+        finally:
+            self.migration = None
+
+    def migrate(self, name: str, **params: int) -> Rule:
+        """Changes rule ``name`` and rescores its component across the store, returning the new version."""
+        rule = self.begin_migration(name, **params)
+        self.run_migration(rule)
+        return rule
+
+    def flush(self) -> None:
+        self.backing.flush()
+
+    def close(self) -> None:
+        self.backing.close()
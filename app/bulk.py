@@ -0,0 +1,285 @@
+"""Offline bulk scoring of large receipt files, for backfills and audits.
+
+Usage::
+
+    python -m app.bulk receipts.ndjson --output points.csv --rejects rejects.ndjson
+    python -m app.bulk receipts.json --workers 8 --id-field receiptId
+
+The input is an NDJSON file (one receipt per line) or a JSON array of receipts, chosen by
+``--format`` or detected from the first byte. It is streamed with buffered reads: NDJSON line
+by line, arrays one element at a time. Raw records are grouped into chunks that worker
+processes validate with the ``Receipt`` model and score with the columnar engine. At most
+``--window`` chunks are in flight and results are written in input order as each chunk
+completes, so memory stays flat however large the file is.
+
+Accepted receipts are written to ``--output`` as ``id,points`` CSV rows; rejected records go
+to ``--rejects`` as NDJSON ``{"record": n, "errors": [...]}`` lines, where ``n`` counts
+records from 1. IDs are minted as for the API unless ``--id-field`` names a field of the
+input records that already holds one. Progress and the final throughput go to stderr.
+"""
+import argparse
+import codecs
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from pydantic import ValidationError
+
+from app.executor import pool_context
+from app.models import Receipt, new_receipt_id
+from app.points_engine import calculate_points_bulk
+
+READ_SIZE = 1 << 20
+# An array element larger than this is treated as a malformed file rather than buffered forever
+MAX_RECORD_BYTES = 64 << 20
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = re.compile(r"[\s,\]]")
+
+# (record number, receipt ID, points) for accepted records, (record number, None, errors) otherwise
+Result = Tuple[int, Optional[str], object]
+
+
+def iter_ndjson_records(stream: BinaryIO) -> Iterator[bytes]:
+    """Yields the non-blank lines of an NDJSON stream."""
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def iter_json_array_records(stream: BinaryIO, read_size: int = READ_SIZE) -> Iterator[str]:
+    """Yields the source text of each element of a JSON array, reading ``read_size`` bytes at a time.
+
+    Elements are delimited with ``json.JSONDecoder.raw_decode``; an element cut off by the end
+    of the buffer is retried once more data has been read.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=eof)
+        position = 0
+        return True
+
+    def skip_whitespace() -> str:
+        """Returns the next significant character, or "" at the end of the input."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ""
+
+    if skip_whitespace() != "[":
+        raise ValueError("Expected a JSON array of receipts")
+    position += 1
+    if skip_whitespace() == "]":
+        return
+    while True:
+        if not skip_whitespace():
+            raise ValueError("Unexpected end of JSON array")
+        if buffer[position] not in '{["':
+            # A bare number or literal has no closing bracket: buffer up to the delimiter after it
+            while _SCALAR_END.search(buffer, position) is None and fill():
+                pass
+        while True:
+            try:
+                _, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Possibly cut off by the end of the buffer: read more and retry
+                if len(buffer) - position > MAX_RECORD_BYTES or not fill():
+                    raise
+                continue
+            break
+        yield buffer[position:end]
+        position = end
+        char = skip_whitespace()
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"Expected ',' or ']' after array element, got {char or 'end of input'!r}")
+        position += 1
+
+
+def detect_format(stream: BinaryIO) -> str:
+    """Returns "json" when the first significant byte opens an array, otherwise "ndjson"."""
+    head = stream.peek(64)[:64].lstrip(b"\xef\xbb\xbf" + _WHITESPACE.encode())
+    return "json" if head.startswith(b"[") else "ndjson"
+
+
+def score_records(records: Sequence, id_field: Optional[str] = None) -> List[Tuple[Optional[str], object]]:
+    """Validates and scores raw records, returning ``(id, points)`` or ``(None, errors)`` for each.
+
+    Runs in the worker processes.
+    """
+    outcomes = []
+    accepted = []
+    for record in records:
+        try:
+            if id_field is None:
+                receipt, receipt_id = Receipt.model_validate_json(record), new_receipt_id()
+            else:
+                data = json.loads(record)
+                receipt = Receipt.model_validate(data)
+                receipt_id = data.get(id_field)
+        except ValidationError as exc:
+            outcomes.append((None, exc.errors(include_url=False, include_context=False)))
+            continue
+        except ValueError as exc:  # Not JSON, or not UTF-8
+            position = exc.pos if isinstance(exc, json.JSONDecodeError) else getattr(exc, "start", 0)
+            outcomes.append((None, [{"type": "json_invalid", "loc": [position], "msg": "JSON decode error"}]))
+            continue
+        if receipt_id is None:
+            outcomes.append((None, [{"type": "missing", "loc": [id_field], "msg": "Field required"}]))
+            continue
+        outcomes.append((str(receipt_id), None))
+        accepted.append((len(outcomes) - 1, receipt))
+    points = calculate_points_bulk(receipt for _, receipt in accepted)
+    for (index, _), receipt_points in zip(accepted, points):
+        outcomes[index] = (outcomes[index][0], receipt_points)
+    return outcomes
+
+
+def iter_chunks(records: Iterator, chunk_size: int) -> Iterator[list]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def score_stream(
+    records: Iterator,
+    workers: int,
+    chunk_size: int = 2000,
+    window: Optional[int] = None,
+    id_field: Optional[str] = None,
+) -> Iterator[Result]:
+    """Scores ``records`` in worker processes, yielding results in input order.
+
+    At most ``window`` chunks are submitted ahead of the one being written. ``workers`` = 0
+    scores in this process.
+    """
+    chunks = iter_chunks(records, chunk_size)
+    number = 0
+    if workers <= 0:
+        for chunk in chunks:
+            for receipt_id, outcome in score_records(chunk, id_field):
+                number += 1
+                yield number, receipt_id, outcome
+        return
+
+    window = window or workers * 2
+    with ProcessPoolExecutor(workers, mp_context=pool_context()) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(score_records, chunk, id_field))
+            if len(in_flight) < window:
+                continue
+            for receipt_id, outcome in in_flight.popleft().result():
+                number += 1
+                yield number, receipt_id, outcome
+        while in_flight:
+            for receipt_id, outcome in in_flight.popleft().result():
+                number += 1
+                yield number, receipt_id, outcome
+
+
+class Progress:
+    """Reports records, throughput and how far through the input file we are to stderr."""
+
+    def __init__(self, stream: BinaryIO, total_bytes: int, interval: float = 2.0, out: TextIO = sys.stderr):
+        self.stream = stream
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.out = out
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self.records = 0
+        self.rejected = 0
+
+    def update(self, rejected: bool) -> None:
+        self.records += 1
+        self.rejected += rejected
+        if self.records % 1000 == 0:
+            now = time.perf_counter()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        line = f"{self.records:,} records ({self.rejected:,} rejected) in {elapsed:.1f}s, {self.records / elapsed:,.0f} records/s"
+        if final:
+            line += f", {self.total_bytes / elapsed / 1e6:.1f} MB/s"
+        elif self.total_bytes:
+            try:
+                line += f", {self.stream.tell() / self.total_bytes:.0%} read"
+            except (OSError, ValueError):
+                pass
+        print(line, file=self.out, flush=True)
+
+
+def main(argv=None, stdout: TextIO = sys.stdout) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="NDJSON or JSON array file of receipts")
+    parser.add_argument("--format", choices=["auto", "ndjson", "json"], default="auto")
+    parser.add_argument("--output", help="CSV file for id,points rows (default: stdout)")
+    parser.add_argument("--rejects", help="NDJSON file for rejected records (default: discard)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (0 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="records per worker task")
+    parser.add_argument("--window", type=int, help="chunks in flight (default: 2 per worker)")
+    parser.add_argument("--id-field", help="input field holding each receipt's ID, instead of minting one")
+    parser.add_argument("--progress-interval", type=float, default=2.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    with open(args.input, "rb", buffering=READ_SIZE) as source:
+        fmt = detect_format(source) if args.format == "auto" else args.format
+        records = iter_json_array_records(source) if fmt == "json" else iter_ndjson_records(source)
+        progress = Progress(source, os.fstat(source.fileno()).st_size, args.progress_interval)
+
+        output = open(args.output, "w", newline="") if args.output else stdout
+        rejects = open(args.rejects, "w") if args.rejects else None
+        try:
+            writer = csv.writer(output, lineterminator="\n")
+            writer.writerow(["id", "points"])
+            results = score_stream(records, args.workers, args.chunk_size, args.window, args.id_field)
+            for number, receipt_id, outcome in results:
+                if receipt_id is None:
+                    if rejects is not None:
+                        rejects.write(json.dumps({"record": number, "errors": outcome}, default=str) + "\n")
+                else:
+                    writer.writerow([receipt_id, outcome])
+                progress.update(receipt_id is None)
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            return 1
+        finally:
+            if output is not stdout:
+                output.close()
+            if rejects is not None:
+                rejects.close()
+    progress.report(final=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Cold-start report: starts uvicorn repeatedly with and without fast startup.
+
+Run ``python -m app.coldstart`` to start uvicorn several times in each mode and report
+import time, time to ready and time to the first response, as JSON. ``--write-openapi``
+builds the OpenAPI cache file that ``RECEIPTS_FAST_STARTUP`` loads (see ``app.startup``).
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from app.startup import APP_DIR, EXAMPLE_BODY, cached_openapi
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.05).close()
+            return
+        except OSError:
+            time.sleep(0.002)
+    raise RuntimeError("uvicorn did not start listening in time")
+
+
+def measure(fast: bool, port: int, timeout: float = 30.0) -> Dict[str, Optional[float]]:
+    """Starts uvicorn once and times it from spawn to the first response."""
+    import urllib.request
+
+    env = dict(os.environ, RECEIPTS_FAST_STARTUP="true" if fast else "false")
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    spawned = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(APP_DIR))
+    try:
+        _wait_for_port(port, process, timeout)
+        listening = time.perf_counter()
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/receipts/process", EXAMPLE_BODY, {"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(request).read()
+        first_response = time.perf_counter()
+        urllib.request.urlopen(request).read()
+        second_request = time.perf_counter() - first_response
+        openapi_start = time.perf_counter()
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/openapi.json").read()
+        openapi_request = time.perf_counter() - openapi_start
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/startup") as response:
+            server = json.load(response)
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "spawn_to_listening_seconds": listening - spawned,
+        "spawn_to_first_response_seconds": first_response - spawned,
+        "first_request_seconds": first_response - listening,
+        "second_request_seconds": second_request,
+        "first_openapi_request_seconds": openapi_request,
+        "import_seconds": server["import_seconds"],
+        "ready_seconds": server["ready_seconds"],
+    }
+
+
+def main(argv=None, stdout=sys.stdout) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="uvicorn starts per mode")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--write-openapi", metavar="PATH", help="only build the cached OpenAPI file and exit")
+    args = parser.parse_args(argv)
+
+    if args.write_openapi:
+        from app.main import app
+
+        cached_openapi(app, args.write_openapi)
+        return 0
+
+    report = {}
+    for mode, fast in (("default", False), ("fast_startup", True)):
+        runs: List[Dict[str, Optional[float]]] = [measure(fast, args.port) for _ in range(args.runs)]
+        report[mode] = {
+            key.replace("_seconds", "_ms"): round(statistics.median(run[key] for run in runs) * 1000, 2)
+            for key in runs[0]
+        }
+    json.dump({"median_of": args.runs, **report}, stdout, indent=2)
+    stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
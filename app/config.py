@@ -0,0 +1,147 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Mapping, Optional
+
+# Every setting can be overridden with an environment variable named RECEIPTS_<FIELD_NAME>
+ENV_PREFIX = "RECEIPTS_"
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Service configuration."""
+
+    # Storage backend: "dict", "sharded", "compact", "shared", "sqlite" or "wal"
+    store_backend: str = "dict"
+    # Number of lock stripes for the sharded backend
+    store_shards: int = 64
+    # Database file for the sqlite backend
+    store_path: str = "receipts.db"
+    # The sqlite backend commits after this many writes or this many seconds, whichever comes first
+    sqlite_batch_size: int = 256
+    sqlite_flush_interval: float = 0.05
+    # Directory of the wal backend, how often its log is fsynced and how many new
+    # writes trigger a compacted snapshot
+    wal_dir: str = "receipts-wal"
+    wal_fsync_interval: float = 0.05
+    wal_snapshot_every: int = 100_000
+    # Table file and fixed slot count of the shared backend; keep the file under /dev/shm
+    shm_path: str = "/dev/shm/receipts.shm"
+    shm_capacity: int = 1 << 20
+
+    # Receipt IDs: "uuid4" (random) or "uuid7" (time-ordered, starting with their creation time)
+    id_scheme: str = "uuid4"
+    # Expire receipts this many seconds after their ID was minted (0 keeps them forever).
+    # Receipts are kept in partitions of retention_partition_seconds by ID time, and expiry
+    # drops whole partitions; requires uuid7 IDs and the dict, sharded or compact backend
+    retention_seconds: float = 0
+    retention_partition_seconds: float = 3600
+
+    # Return the original ID when an identical receipt is resubmitted
+    dedupe_receipts: bool = False
+    # Bounds of the cache behind content dedupe and the Idempotency-Key header (0 TTL never expires)
+    dedupe_max_entries: int = 100_000
+    dedupe_ttl_seconds: float = 86_400
+
+    # Record request metrics and serve them at /metrics
+    metrics_enabled: bool = True
+
+    # Validate receipt bodies straight from the raw bytes into a lean receipt with amounts in
+    # cents
+    fast_ingest: bool = True
+
+    # "eager" scores receipts before POST /receipts/process returns; "deferred" stores them
+    # unscored and computes points on first read or in the background (not with "shared")
+    scoring_mode: str = "eager"
+    # Bound of the deferred scoring queue (receipts are scored inline while it is full) and
+    # number of background scoring threads
+    deferred_queue_size: int = 10_000
+    deferred_workers: int = 1
+
+    # Worker processes for scoring very large receipts and batches (0 scores everything
+    # in-process), the item count and batch size from which the pool is used, and the
+    # receipts per chunk a batch is split into
+    score_pool_workers: int = 0
+    score_pool_min_items: int = 1000
+    score_pool_min_batch: int = 1000
+    score_pool_chunk_size: int = 250
+
+    # Keep every receipt's rule inputs and per-rule points so GET /receipts/{id}/breakdown can
+    # show them and a rule change rescores only its own component. Kept in process memory, so
+    # single-process only: requires the dict, sharded or compact backend, eager scoring and
+    # aggregates_enabled off, since aggregates keep the points awarded at ingest
+    store_breakdowns: bool = False
+    # Token expected in the X-Admin-Token header of PUT /rules/{name} (empty disables rule
+    # changes) and receipts rescored per chunk of a rule migration
+    rules_admin_token: str = ""
+    rule_migration_chunk_size: int = 10_000
+
+    # Keep running receipt counts, point sums and point histograms per retailer and purchase
+    # date for the /aggregates endpoints. Off by default: memory grows with every distinct
+    # retailer and date, and the totals start from zero on every restart
+    aggregates_enabled: bool = False
+    # Directory shared by all uvicorn workers where each publishes its aggregates, and the
+    # seconds between publications (empty: aggregates cover this process only)
+    aggregates_dir: str = ""
+    aggregates_sync_interval: float = 1.0
+
+    # Index the retailer, purchase date and purchase time of every receipt for GET /receipts
+    index_receipts: bool = False
+
+    # Admission control: at most this many ingest (POST /receipts/process*) and read requests
+    # run at once, this many more wait for a slot, for up to this many seconds; the rest are
+    # answered with 503 and a Retry-After of admission_retry_after seconds
+    admission_enabled: bool = False
+    admission_ingest_concurrency: int = 32
+    admission_ingest_queue: int = 128
+    admission_ingest_max_wait: float = 0.5
+    admission_read_concurrency: int = 256
+    admission_read_queue: int = 1024
+    admission_read_max_wait: float = 0.25
+    admission_retry_after: int = 1
+
+    # Profile POST /receipts/process* requests with cProfile: all of them, a random fraction of
+    # them, or those whose X-Profile-Token header matches profile_token (empty disables the
+    # header, and protects /profiles when set)
+    profiling_enabled: bool = False
+    profile_sample_rate: float = 0.0
+    profile_token: str = ""
+    # Profiled requests slower than this many milliseconds are kept, with a redacted shape of
+    # the receipt, in a ring of the newest profile_max_entries captures in profile_dir
+    profile_slow_ms: float = 100.0
+    profile_dir: str = "receipt-profiles"
+    profile_max_entries: int = 100
+
+    # Warm validators, scoring and responses before serving, and serve the OpenAPI schema
+    # from this file, rebuilt when the app or its libraries change
+    fast_startup: bool = False
+    openapi_cache_path: str = "openapi-cache.json"
+
+    # IDs read from the store per batched lookup when streaming POST /receipts/points
+    bulk_lookup_chunk_size: int = 1000
+
+    # Receipts with more items than this are scored on a worker thread instead of the event loop
+    inline_score_max_items: int = 100
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "Settings":
+        """Builds settings from defaults overridden by ``RECEIPTS_*`` environment variables."""
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(ENV_PREFIX + field.name.upper())
+            if raw is None:
+                continue
+            if field.type in (bool, "bool"):
+                values[field.name] = raw.strip().lower() in _TRUE_VALUES
+            elif field.type in (int, "int"):
+                values[field.name] = int(raw)
+            elif field.type in (float, "float"):
+                values[field.name] = float(raw)
+            else:
+                values[field.name] = raw
+        return cls(**values)
+
+
+settings = Settings.from_env()
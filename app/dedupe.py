@@ -0,0 +1,118 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Union
+
+from app.fast_ingest import LeanReceipt
+from app.models import Receipt
+from app.points_engine import to_cents
+
+
+def _cents(amount: Union[str, int]) -> int:
+    return amount if isinstance(amount, int) else to_cents(amount)
+
+
+def receipt_fingerprint(receipt: Union[Receipt, LeanReceipt]) -> str:
+    """Returns a content hash of a validated receipt.
+
+    The hash is taken over the normalized fields with amounts in cents, so retries that differ
+    only in key order, whitespace between tokens, equivalent time spellings ("13:01" and
+    "13:01:00") or the ingest path that validated them match.
+    """
+    canonical = json.dumps(
+        [
+            receipt.retailer,
+            receipt.purchaseDate.isoformat(),
+            receipt.purchaseTime.isoformat(),
+            [[item.shortDescription, _cents(item.price)] for item in receipt.items],
+            _cents(receipt.total),
+        ],
+        separators=(",", ":"),
+    )
+    return "sha256:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def idempotency_cache_key(idempotency_key: str) -> str:
+    return "key:" + idempotency_key
+
+
+class IdempotencyKeyReused(ValueError):
+    """Raised when an idempotency key is sent again with a different receipt."""
+
+
+class ReceiptCache:
+    """Bounded map from a receipt fingerprint or idempotency key to the ID already issued.
+
+    Each entry also records the fingerprint of the receipt it was issued for. Entries are
+    evicted least-recently-used once ``max_entries`` is reached, and expire ``ttl_seconds``
+    after they were stored (0 disables expiry).
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (receipt_id, fingerprint, expires_at)
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str):
+        """The live entry for ``key``, marked most recently used; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] and entry[2] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the receipt ID recorded for ``key``, counting a hit or a miss."""
+        return self.lookup([key])
+
+    def lookup(
+        self,
+        keys: Sequence[str],
+        fingerprint: Optional[str] = None,
+        expired: Optional[Callable[[str], bool]] = None,
+    ) -> Optional[str]:
+        """Returns the ID recorded under the first of ``keys`` found, counting one hit or miss.
+
+        IDs that ``expired`` reports as expired are skipped. Raises ``IdempotencyKeyReused``
+        when the entry found was recorded for a receipt with another ``fingerprint``.
+        """
+        with self._lock:
+            for key in keys:
+                entry = self._entry(key)
+                if entry is None or (expired is not None and expired(entry[0])):
+                    continue
+                if fingerprint is not None and entry[1] is not None and entry[1] != fingerprint:
+                    raise IdempotencyKeyReused(f"{key!r} was recorded for a different receipt")
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, receipt_id: str, fingerprint: Optional[str] = None) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            self._entries[key] = (receipt_id, fingerprint, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
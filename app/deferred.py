@@ -0,0 +1,167 @@
+"""Deferred scoring: receipts are stored unscored and their points computed when first needed.
+
+``DeferredStore`` wraps a backend store. ``defer`` parks a validated receipt (the lean
+receipt from fast ingest, with amounts already in cents) and queues its ID for a background
+worker; whichever comes first, a read of the ID or the worker, scores it and writes the
+points through to the backend. Scoring for one ID is serialized on a striped lock and the
+receipt is dropped once its points are stored, so every receipt is scored exactly once.
+
+The queue is bounded: when it is full ``defer`` refuses the receipt and the caller scores it
+inline, so a sustained overload degrades to eager scoring instead of unbounded memory.
+Receipts bound for a fixed-capacity backend are always scored inline, so that a full store
+is reported to the client that posts the receipt rather than after its ID was issued.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from anyio import to_thread
+
+from app import metrics
+from app.storage import ReceiptStore, StoreFull
+
+DEFERRED_LAG = metrics.registry.histogram(
+    "receipts_deferred_lag_seconds", "Time from a deferred receipt being stored to its points being computed.", ("source",)
+)
+DEFERRED_INLINE = metrics.registry.counter(
+    "receipts_deferred_inline_total", "Receipts scored on the ingest path because the deferred queue was full."
+)
+DEFERRED_DROPPED = metrics.registry.counter(
+    "receipts_deferred_dropped_total", "Deferred receipts dropped because the store was full when they were scored."
+)
+
+
+class DeferredStore(ReceiptStore):
+    """Store wrapper that holds receipts until their points are first needed."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        backing: ReceiptStore,
+        max_queue: int = 10_000,
+        workers: int = 1,
+        inline_max_items: int = 100,
+        locks: int = 64,
+    ):
+        self.backing = backing
+        self.blocking = backing.blocking
+        self.inline_max_items = inline_max_items
+        self._pending: Dict[str, Tuple[object, Callable[[object], int], float]] = {}
+        self._pending_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(locks)]
+        self._queue = queue.Queue(max_queue)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"deferred-score-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def defer(self, receipt_id: str, receipt, score: Callable[[object], int]) -> bool:
+        """Parks ``receipt`` to be scored later, or returns False if it must be scored now."""
+        if self.backing.fixed_capacity:
+            return False
+        # Park before queueing so a worker never dequeues an ID it cannot find
+        with self._pending_lock:
+            self._pending[receipt_id] = (receipt, score, time.monotonic())
+        try:
+            self._queue.put_nowait(receipt_id)
+        except queue.Full:
+            with self._pending_lock:
+                del self._pending[receipt_id]
+            DEFERRED_INLINE.inc()
+            return False
+        return True
+
+    def _resolve(self, receipt_id: str, source: str) -> Optional[int]:
+        """Scores and stores a pending receipt; None if it is not pending."""
+        with self._locks[hash(receipt_id) % len(self._locks)]:
+            entry = self._pending.get(receipt_id)
+            if entry is None:
+                return None
+            receipt, score, enqueued_at = entry
+            points = score(receipt)
+            # Store before forgetting the receipt, so a reader that misses it here finds it there
+            try:
+                self.backing.put(receipt_id, points)
+            except StoreFull:
+                with self._pending_lock:
+                    del self._pending[receipt_id]
+                DEFERRED_DROPPED.inc()
+                raise
+            with self._pending_lock:
+                del self._pending[receipt_id]
+        DEFERRED_LAG.observe(time.monotonic() - enqueued_at, source)
+        return points
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        if receipt_id in self._pending:
+            points = self._resolve(receipt_id, "read")
+            if points is not None:
+                return points
+        return self.backing.get(receipt_id)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        for receipt_id in receipt_ids:
+            if receipt_id in self._pending:
+                self._resolve(receipt_id, "read")
+        return self.backing.get_many(receipt_ids)
+
+    async def get_async(self, receipt_id: str) -> Optional[int]:
+        entry = self._pending.get(receipt_id)
+        if self.blocking or (entry is not None and len(entry[0].items) > self.inline_max_items):
+            return await to_thread.run_sync(self.get, receipt_id)
+        return self.get(receipt_id)
+
+    async def get_many_async(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        # Scoring pending receipts is CPU work, kept off the event loop whatever their size
+        if self.blocking or any(receipt_id in self._pending for receipt_id in receipt_ids):
+            return await to_thread.run_sync(self.get_many, receipt_ids)
+        return self.get_many(receipt_ids)
+
+    def put(self, receipt_id: str, points: int) -> None:
+        self.backing.put(receipt_id, points)
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        self.backing.put_many(entries)
+
+    def __len__(self) -> int:
+        return len(self.backing) + len(self._pending)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _work(self) -> None:
+        while True:
+            receipt_id = self._queue.get()
+            if receipt_id is self._STOP:
+                return
+            try:
+                self._resolve(receipt_id, "worker")
+            except StoreFull:
+                pass  # Dropped and counted by _resolve
+            # Hand the GIL back after every receipt rather than holding it for a whole
+            # switch interval, so the event loop is not stalled behind the backlog
+            time.sleep(0)
+
+    def drain(self) -> None:
+        """Scores every pending receipt on the calling thread."""
+        for receipt_id in list(self._pending):
+            self._resolve(receipt_id, "worker")
+
+    def flush(self) -> None:
+        self.backing.flush()
+
+    def close(self) -> None:
+        for _ in self._workers:
+            self._queue.put(self._STOP)
+        for worker in self._workers:
+            worker.join()
+        self.drain()
+        self.backing.close()
@@ -0,0 +1,123 @@
+"""Process-pool scoring for receipts and batches too large to score on the request worker.
+
+Scoring holds the GIL for its whole item loop, so a receipt with thousands of items stalls
+every other request served by the same process. ``ScoringExecutor`` sends such receipts, and
+large batches split into chunks, to a pool of worker processes.
+
+Receipts cross the process boundary in a packed form rather than as pickled models: every
+text column (retailers, descriptions, amounts) is joined into one string with a NUL
+separator, which none of the ``Receipt`` patterns allow, and every number column is a list
+of ints. Pickling then copies a handful of large objects instead of walking thousands of
+small ones. Workers unpack into ``ReceiptColumns`` and score with the columnar engine.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from app.points_engine import ReceiptColumns, calculate_points_bulk, retailer_points, score_columns, to_cents
+
+SEPARATOR = "\x00"
+
+# retailers, totals, item counts, days of month, times of day (us), descriptions, prices
+PackedReceipts = Tuple[str, list, List[int], List[int], List[int], str, list]
+
+
+def _amounts(values: list) -> object:
+    """Text amounts are joined into one string; amounts already in cents stay a list."""
+    if values and isinstance(values[0], str):
+        return SEPARATOR.join(values)
+    return values
+
+
+def _cents(packed: object) -> List[int]:
+    if isinstance(packed, str):
+        return [to_cents(amount) for amount in packed.split(SEPARATOR)] if packed else []
+    return packed
+
+
+def pack_receipts(receipts: Sequence) -> PackedReceipts:
+    """Packs ``Receipt`` or ``LeanReceipt`` objects into a compact, cheaply pickled tuple."""
+    items = [item for receipt in receipts for item in receipt.items]
+    times = [receipt.purchaseTime for receipt in receipts]
+    return (
+        SEPARATOR.join([receipt.retailer for receipt in receipts]),
+        _amounts([receipt.total for receipt in receipts]),
+        [len(receipt.items) for receipt in receipts],
+        [receipt.purchaseDate.day for receipt in receipts],
+        [((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond for t in times],
+        SEPARATOR.join([item.shortDescription for item in items]),
+        _amounts([item.price for item in items]),
+    )
+
+
+def score_packed(packed: PackedReceipts) -> List[int]:
+    """Scores packed receipts; runs in the pool workers."""
+    retailers, totals, item_counts, days, times, descriptions, prices = packed
+    columns = ReceiptColumns.from_lists(
+        retailer_points=[retailer_points(retailer) for retailer in retailers.split(SEPARATOR)],
+        total_cents=_cents(totals),
+        item_counts=item_counts,
+        day_of_month=days,
+        time_of_day_us=times,
+        item_description_lengths=[len(description.strip()) for description in descriptions.split(SEPARATOR)],
+        item_price_cents=_cents(prices),
+    )
+    return score_columns(columns)
+
+
+def pool_context():
+    """Start method for worker pools; never fork, which would copy locks held by other threads."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ScoringExecutor:
+    """Decides where receipts are scored and owns the process pool.
+
+    ``workers`` = 0 disables the pool and everything is scored in-process.
+    """
+
+    def __init__(self, workers: int = 0, min_items: int = 1000, min_batch: int = 1000, chunk_size: int = 250):
+        self.workers = workers
+        self.min_items = min_items
+        self.min_batch = min_batch
+        self.chunk_size = chunk_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Batches score on the threadpool, so two of them can ask for the pool at once
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=pool_context())
+        return self._pool
+
+    def accepts(self, item_count: int) -> bool:
+        """Returns True when a receipt with ``item_count`` items should go to the pool."""
+        return self.workers > 0 and item_count >= self.min_items
+
+    async def score_async(self, receipt) -> int:
+        """Scores one large receipt in the pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        points = await loop.run_in_executor(self.pool, score_packed, pack_receipts([receipt]))
+        return points[0]
+
+    def score_bulk(self, receipts: Iterable) -> List[int]:
+        """Scores a batch, in pool-sized chunks when it is large enough to be worth it."""
+        receipts = list(receipts)
+        if self.workers <= 0 or len(receipts) < self.min_batch:
+            return calculate_points_bulk(receipts)
+        chunks = (
+            pack_receipts(receipts[start:start + self.chunk_size]) for start in range(0, len(receipts), self.chunk_size)
+        )
+        return [points for chunk in self.pool.map(score_packed, chunks) for points in chunk]
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,108 @@
+"""Single-pass validation of raw receipt bodies into a lean internal receipt.
+
+The standard path decodes the body into Python dicts and lists, validates them into
+``Receipt``/``Item`` models and then parses every amount again as a ``Decimal`` to score it.
+Here the raw bytes go straight through one cached ``TypeAdapter`` that applies the same
+constraints as ``Receipt`` and converts amounts to integer cents as it validates.
+
+Only valid bodies take this path: anything the lean adapter rejects is handed to the
+standard FastAPI handler, so error responses are produced exactly as before.
+"""
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Annotated, Callable, List, Optional
+
+from fastapi.routing import APIRoute
+from pydantic import AfterValidator, Field, StringConstraints, TypeAdapter, ValidationError
+
+from app.points_engine import WINDOW_END_US, WINDOW_START_US, item_bonus, retailer_points, to_cents
+
+# Same patterns as the constr fields of app.models
+Description = Annotated[str, StringConstraints(pattern=r"^[\w\s\-]+$")]
+Retailer = Annotated[str, StringConstraints(pattern=r"^[\w\s\-&]+$")]
+Cents = Annotated[str, StringConstraints(pattern=r"^\d+\.\d{2}$"), AfterValidator(to_cents)]
+
+
+@dataclass
+class LeanItem:
+    shortDescription: Description
+    price: Cents  # Integer cents
+
+
+@dataclass
+class LeanReceipt:
+    retailer: Retailer
+    purchaseDate: date
+    purchaseTime: time
+    items: Annotated[List[LeanItem], Field(min_length=1)]
+    total: Cents  # Integer cents
+
+
+LEAN_RECEIPT_ADAPTER = TypeAdapter(LeanReceipt)
+
+
+def parse_lean_receipt(body: bytes) -> LeanReceipt:
+    """Validates a raw JSON body into a ``LeanReceipt``, raising ``ValidationError`` if invalid."""
+    return LEAN_RECEIPT_ADAPTER.validate_json(body)
+
+
+def lean_points(receipt: LeanReceipt) -> int:
+    """Returns the same points as ``calculate_points`` using the pre-converted cents."""
+    points = retailer_points(receipt.retailer)
+    if receipt.total % 100 == 0:
+        points += 50
+    if receipt.total % 25 == 0:
+        points += 25
+    points += (len(receipt.items) // 2) * 5
+    for item in receipt.items:
+        points += item_bonus(len(item.shortDescription.strip()), item.price)
+    if receipt.purchaseDate.day % 2 == 1:
+        points += 6
+    t = receipt.purchaseTime
+    time_of_day = ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond
+    if WINDOW_START_US < time_of_day < WINDOW_END_US:
+        points += 10
+    return points
+
+
+def is_json(content_type: Optional[str]) -> bool:
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or (media_type.startswith("application/") and media_type.endswith("+json"))
+
+
+def fast_path(handler: Callable, enabled: Callable[[], bool]):
+    """Gives an endpoint a handler for bodies that validate as a ``LeanReceipt``.
+
+    ``handler`` is awaited with the lean receipt and the ``Idempotency-Key`` header and returns
+    the response. ``enabled`` is checked on every request.
+    """
+
+    def decorate(endpoint):
+        endpoint.fast_handler = handler
+        endpoint.fast_enabled = enabled
+        return endpoint
+
+    return decorate
+
+
+class FastIngestRoute(APIRoute):
+    """Route that serves endpoints marked with ``fast_path`` from the raw request bytes."""
+
+    def get_route_handler(self):
+        standard_handler = super().get_route_handler()
+        fast_handler = getattr(self.endpoint, "fast_handler", None)
+        if fast_handler is None:
+            return standard_handler
+        enabled = self.endpoint.fast_enabled
+
+        async def handler(request):
+            if not enabled() or not is_json(request.headers.get("content-type")):
+                return await standard_handler(request)
+            try:
+                receipt = parse_lean_receipt(await request.body())
+            except ValidationError:
+                # The body is cached on the request, so the standard handler re-reads it
+                return await standard_handler(request)
+            return await fast_handler(receipt, request.headers.get("idempotency-key"))
+
+        return handler
@@ -0,0 +1,49 @@
+"""Receipt ID schemes.
+
+``uuid4`` IDs are random. ``uuid7`` IDs (RFC 9562) start with their creation time in Unix
+milliseconds, followed by 74 random bits, in the canonical UUID string form. They sort by
+creation time as strings and as 16-byte keys, so a store can tell from an ID alone which
+time partition holds it. Both forms are canonical UUIDs, so every backend stores either, and
+both match the ``^\\S+$`` pattern of ``ReceiptResponse.id``.
+"""
+import os
+import re
+import time
+from typing import Callable, Optional
+from uuid import uuid4
+
+# Version 7 in bits 76-79 and variant 0b10 in bits 62-63; the other 74 bits below the time are random
+_VERSION_VARIANT = 0x7 << 76 | 0b10 << 62
+_RANDOM_BITS = ((1 << 12) - 1) << 64 | ((1 << 62) - 1)
+_UUID7 = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-7[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$")
+
+
+def uuid7(millis: Optional[int] = None) -> str:
+    """Returns a new UUIDv7 string for ``millis`` (default: now). IDs of the same millisecond are unordered."""
+    if millis is None:
+        millis = time.time_ns() // 1_000_000
+    value = millis << 80 | int.from_bytes(os.urandom(10), "big") & _RANDOM_BITS | _VERSION_VARIANT
+    digits = "%032x" % value
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def uuid7_millis(receipt_id: str) -> Optional[int]:
+    """The creation time in Unix milliseconds of a canonical UUIDv7 string, or None for any other ID."""
+    if not _UUID7.match(receipt_id):
+        return None
+    return int(receipt_id[:8] + receipt_id[9:13], 16)
+
+
+def _uuid4() -> str:
+    return str(uuid4())
+
+
+ID_SCHEMES = {"uuid4": _uuid4, "uuid7": uuid7}
+
+
+def id_minter(scheme: str) -> Callable[[], str]:
+    """The function minting new IDs of ``scheme``."""
+    try:
+        return ID_SCHEMES[scheme.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown receipt ID scheme: {scheme!r}") from None
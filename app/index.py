@@ -0,0 +1,201 @@
+"""Secondary indexes over receipt metadata, for paginated listings by retailer, date and time.
+
+The store maps IDs to points only, so ``ReceiptIndex`` keeps what listings need on the side,
+one row per receipt: the ID, the retailer as submitted, and the purchase date and time.
+
+* retailer: a hash index from the normalized retailer to its rows in insertion order
+* purchase date and time: a ``SortedIndex`` of ``datetime key << ROW_BITS | row``
+* time of day, across all dates: a ``SortedIndex`` of ``time key << ROW_BITS | row``
+
+Packing the row into the low bits makes every entry unique and keeps ties in insertion
+order. A cursor is the last entry of the previous page; the next page starts right after it
+by bisection, so fetching a page costs O(log n + page size) and stays correct while new
+receipts are indexed.
+
+With retention, ``expire`` drops the oldest rows once their receipts have expired. Row
+numbers stay absolute, so cursors stay valid. The retailer lists are trimmed at once. The
+sorted indexes skip dropped rows and are rebuilt when dropped rows outnumber live ones.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.aggregates import normalize_retailer
+
+ROW_BITS = 40
+US_PER_DAY = 86_400_000_000
+
+# (receipt ID, retailer, purchase date, purchase time)
+Entry = Tuple[str, str, date, time]
+
+
+def time_key(value: time) -> int:
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+def datetime_key(day: date, value: time) -> int:
+    return day.toordinal() * US_PER_DAY + time_key(value)
+
+
+class SortedIndex:
+    """Sorted ints kept in blocks of bounded size, so inserts and seeks cost O(log n + block size)."""
+
+    def __init__(self, load: int = 1000):
+        self._load = load
+        self._blocks: List[List[int]] = []
+        self._maxes: List[int] = []  # Largest value of each block
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, value: int) -> None:
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([value])
+            self._maxes.append(value)
+            return
+        position = bisect_left(self._maxes, value)
+        if position == len(self._blocks):
+            position -= 1
+            self._blocks[position].append(value)
+            self._maxes[position] = value
+        else:
+            insort(self._blocks[position], value)
+        block = self._blocks[position]
+        if len(block) > 2 * self._load:
+            self._blocks[position:position + 1] = [block[:self._load], block[self._load:]]
+            self._maxes[position:position + 1] = [block[self._load - 1], block[-1]]
+
+    def iter_from(self, value: int, inclusive: bool = True) -> Iterator[int]:
+        """Yields the values from ``value`` (or just after it) upwards."""
+        seek = bisect_left if inclusive else bisect_right
+        position = seek(self._maxes, value)
+        if position == len(self._blocks):
+            return
+        block = self._blocks[position]
+        # Index rather than slice, so a page does not copy the rest of its block
+        for offset in range(seek(block, value), len(block)):
+            yield block[offset]
+        for position in range(position + 1, len(self._blocks)):
+            yield from self._blocks[position]
+
+    def retain(self, keep: Callable[[int], bool]) -> None:
+        """Drops every value for which ``keep`` is false."""
+        blocks = [[value for value in block if keep(value)] for block in self._blocks]
+        self._blocks = [block for block in blocks if block]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = sum(map(len, self._blocks))
+
+
+class ReceiptIndex:
+    """Retailer, purchase date and time of day indexes over stored receipts."""
+
+    def __init__(self, load: int = 1000):
+        self._ids: List[str] = []
+        self._retailers: List[str] = []
+        self._dates: List[date] = []
+        self._times: List[time] = []
+        self._retailer_names: Dict[str, str] = {}  # Shares one string per spelling
+        self._by_retailer: Dict[str, List[int]] = {}
+        self._by_datetime = SortedIndex(load)
+        self._by_time = SortedIndex(load)
+        self._first_row = 0  # Rows before this one have expired
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, receipt_id: str, receipt) -> None:
+        self.add_many([(receipt_id, receipt)])
+
+    def add_many(self, entries: Iterable[Tuple[str, object]]) -> None:
+        """Indexes each ``(receipt_id, receipt)``."""
+        with self._lock:
+            for receipt_id, receipt in entries:
+                row = self._first_row + len(self._ids)
+                self._ids.append(receipt_id)
+                self._retailers.append(self._retailer_names.setdefault(receipt.retailer, receipt.retailer))
+                self._dates.append(receipt.purchaseDate)
+                self._times.append(receipt.purchaseTime)
+                self._by_retailer.setdefault(normalize_retailer(receipt.retailer), []).append(row)
+                self._by_datetime.add(datetime_key(receipt.purchaseDate, receipt.purchaseTime) << ROW_BITS | row)
+                self._by_time.add(time_key(receipt.purchaseTime) << ROW_BITS | row)
+
+    def _entry(self, row: int) -> Entry:
+        row -= self._first_row
+        return self._ids[row], self._retailers[row], self._dates[row], self._times[row]
+
+    def expire(self, expired: Callable[[str], bool]) -> int:
+        """Drops the oldest rows for as long as ``expired`` holds for their receipt ID; returns how many.
+
+        Rows are in the order receipts were stored, which with time-ordered IDs is the order
+        they expire in, give or take the few receipts stored out of order while in flight.
+        """
+        with self._lock:
+            count = 0
+            while count < len(self._ids) and expired(self._ids[count]):
+                count += 1
+            if not count:
+                return 0
+            for column in (self._ids, self._retailers, self._dates, self._times):
+                del column[:count]
+            self._first_row += count
+            for key in list(self._by_retailer):
+                rows = self._by_retailer[key]
+                del rows[:bisect_left(rows, self._first_row)]
+                if not rows:
+                    del self._by_retailer[key]
+            if len(self._by_datetime) > 2 * len(self._ids):
+                first_row = self._first_row
+                mask = (1 << ROW_BITS) - 1
+                self._by_datetime.retain(lambda value: value & mask >= first_row)
+                self._by_time.retain(lambda value: value & mask >= first_row)
+                self._retailer_names = {name: name for name in self._retailers}
+            return count
+
+    def by_retailer(self, retailer: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Entry], Optional[str]]:
+        """Returns a page of a retailer's receipts in the order they were stored, and the next cursor."""
+        with self._lock:
+            rows = self._by_retailer.get(normalize_retailer(retailer), [])
+            start = bisect_right(rows, parse_cursor(cursor)) if cursor else 0
+            page = rows[start:start + limit]
+            more = start + limit < len(rows)
+            return [self._entry(row) for row in page], str(page[-1]) if more else None
+
+    def by_datetime(
+        self, start: Tuple[date, time], end: Tuple[date, time], limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Entry], Optional[str]]:
+        """Returns a page of receipts purchased from ``start`` to ``end`` inclusive, oldest first."""
+        return self._range(self._by_datetime, datetime_key(*start), datetime_key(*end), limit, cursor)
+
+    def by_time(self, start: time, end: time, limit: int, cursor: Optional[str] = None) -> Tuple[List[Entry], Optional[str]]:
+        """Returns a page of receipts purchased between two times of day inclusive, on any date."""
+        return self._range(self._by_time, time_key(start), time_key(end), limit, cursor)
+
+    def _range(
+        self, index: SortedIndex, low: int, high: int, limit: int, cursor: Optional[str]
+    ) -> Tuple[List[Entry], Optional[str]]:
+        first, inclusive = (parse_cursor(cursor), False) if cursor else (low << ROW_BITS, True)
+        last = (high + 1) << ROW_BITS
+        mask = (1 << ROW_BITS) - 1
+        with self._lock:
+            # One entry past the page tells whether there is another page
+            values = []
+            for value in index.iter_from(first, inclusive):
+                if value >= last or len(values) > limit:
+                    break
+                if value & mask >= self._first_row:
+                    values.append(value)
+            more = len(values) > limit
+            page = values[:limit]
+            return [self._entry(value & mask) for value in page], str(page[-1]) if more else None
+
+
+def parse_cursor(cursor: str) -> int:
+    """Raises ``ValueError`` for a cursor this index did not issue."""
+    value = int(cursor)
+    if value < 0:
+        raise ValueError("Invalid cursor")
+    return value
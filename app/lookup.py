@@ -0,0 +1,133 @@
+"""Bulk points lookups for many receipt IDs in one request.
+
+IDs are read from the store in chunks with ``get_many``, so a lookup costs one batched read
+per chunk instead of one probe per HTTP request. Large lookups can be streamed: IDs sent as
+an NDJSON body are read incrementally and results are written back one NDJSON line per ID,
+so neither side of the exchange has to be held in memory at once.
+"""
+import json
+from typing import AsyncIterator, Iterable, List, Optional, Sequence
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from app.batch import JSON_DECODE_ERRORS, NDJSON_MEDIA_TYPES, json_decode_error
+from app.models import BulkPointsRequest
+from app.storage import ReceiptStore
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Longest NDJSON line accepted: a 36-character ID with quotes and whitespace fits many times over
+MAX_ID_LINE_BYTES = 256
+
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    """Returns True when the Accept header asks for an NDJSON response."""
+    if not accept:
+        return False
+    return any(part.split(";", 1)[0].strip().lower() in NDJSON_MEDIA_TYPES for part in accept.split(","))
+
+
+def decode_lookup(body: bytes) -> List[str]:
+    """Returns the IDs of a JSON lookup body, raising ``RequestValidationError`` if it is invalid."""
+    try:
+        data = json.loads(body)
+    except JSON_DECODE_ERRORS as exc:
+        raise RequestValidationError([json_decode_error(exc, ("body",))], body=getattr(exc, "doc", None)) from exc
+    try:
+        return BulkPointsRequest.model_validate(data).ids
+    except ValidationError as exc:
+        raise RequestValidationError(
+            [{**err, "loc": ("body",) + tuple(err["loc"])} for err in exc.errors(include_url=False)]
+        ) from exc
+
+
+def lookup_result(receipt_ids: Sequence[str], points: Sequence[Optional[int]]) -> dict:
+    """Builds the ``BulkPointsResponse`` content from IDs and the points read for them."""
+    found = {}
+    missing = []
+    for receipt_id, receipt_points in zip(receipt_ids, points):
+        if receipt_points is None:
+            missing.append(receipt_id)
+        else:
+            found[receipt_id] = receipt_points
+    return {"points": found, "missing": missing}
+
+
+def parse_id_line(line: bytes) -> str:
+    """Returns the ID on one NDJSON line, written either as a JSON string or bare."""
+    line = line.strip()
+    if line.startswith(b'"'):
+        try:
+            receipt_id = json.loads(line)
+        except JSON_DECODE_ERRORS:
+            pass
+        else:
+            if isinstance(receipt_id, str):
+                return receipt_id
+    return line.decode("utf-8", "replace")
+
+
+def line_too_long(line_number: int) -> RequestValidationError:
+    return RequestValidationError([{
+        "type": "string_too_long",
+        "loc": ("body", line_number),
+        "msg": f"Line should have at most {MAX_ID_LINE_BYTES} bytes",
+        "input": {},
+        "ctx": {"max_length": MAX_ID_LINE_BYTES},
+    }])
+
+
+async def aiter_ids(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Yields the ID on each non-blank line of a streamed body.
+
+    Raises ``RequestValidationError`` for a line longer than ``MAX_ID_LINE_BYTES``, so a body
+    without newlines cannot make the unfinished line grow without bound.
+    """
+    pending = b""
+    line_number = 0
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if len(line) > MAX_ID_LINE_BYTES:
+                raise line_too_long(line_number)
+            line_number += 1
+            if line.strip():
+                yield parse_id_line(line)
+        if len(pending) > MAX_ID_LINE_BYTES:
+            raise line_too_long(line_number)
+    if pending.strip():
+        yield parse_id_line(pending)
+
+
+async def achunked(receipt_ids, size: int) -> AsyncIterator[List[str]]:
+    """Groups an iterable or async iterable of IDs into lists of at most ``size``."""
+    chunk = []
+    if hasattr(receipt_ids, "__aiter__"):
+        async for receipt_id in receipt_ids:
+            chunk.append(receipt_id)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    else:
+        for receipt_id in receipt_ids:
+            chunk.append(receipt_id)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_lines(receipt_ids: Iterable[str], points: Iterable[Optional[int]]) -> bytes:
+    """NDJSON lines of ``{"id": ..., "points": ...}``, with null points for unknown IDs."""
+    return b"".join(
+        json.dumps({"id": receipt_id, "points": receipt_points}, separators=(",", ":")).encode() + b"\n"
+        for receipt_id, receipt_points in zip(receipt_ids, points)
+    )
+
+
+async def stream_points(receipt_ids, store: ReceiptStore, chunk_size: int) -> AsyncIterator[bytes]:
+    """Looks up ``receipt_ids`` a chunk at a time, yielding the NDJSON lines of each chunk."""
+    async for chunk in achunked(receipt_ids, chunk_size):
+        yield encode_lines(chunk, await store.get_many_async(chunk))
@@ -1,16 +1,178 @@
-from fastapi import FastAPI, HTTPException, Request
+from app.startup import FirstRequestMiddleware, StartupTimings, cached_openapi, warm_up
+
+startup_timings = StartupTimings()  # Before the other imports, so import time covers them
+
+import hmac
+from contextlib import asynccontextmanager
+
+from datetime import date, time
+from typing import Optional
+
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Query, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from app.models import Receipt, ReceiptResponse, PointsResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from app.admission import AdmissionMiddleware, Budget
+from app.aggregates import AggregateSync, Aggregates, combine, summarize
+from app.batch import decode_batch, is_ndjson, validate_entry
+from app.breakdown import BREAKDOWN_BACKENDS, BreakdownStore, MigrationInProgress
+from app.deferred import DeferredStore
+from app.dedupe import IdempotencyKeyReused, ReceiptCache, idempotency_cache_key, receipt_fingerprint
+from app.executor import ScoringExecutor
+from app.index import ReceiptIndex
+from app.fast_ingest import FastIngestRoute, fast_path, lean_points
+from app import metrics
+from app.lookup import NDJSON_MEDIA_TYPE, aiter_ids, decode_lookup, lookup_result, stream_points, wants_ndjson
+from app.models import (
+    Receipt, ReceiptResponse, PointsResponse, BatchReceiptResponse, BulkPointsRequest, BulkPointsResponse,
+    AggregateSummary, BreakdownResponse, ProfileList, ReceiptPage, RuleChange, RuleInfo, RulesResponse, new_receipt_id
+)
 from app.points_calculator import calculate_points
-from app.storage import receipts_db
+from app.profiling import ProfileRing, ProfilingMiddleware, profiled
+from app.responses import DuplexStreamingResponse, id_response, points_response
+from app.retention import RETENTION_BACKENDS, RetentionStore
+from app.config import settings
+from app.storage import StoreFull, create_store
+
+store = create_store(settings)
+# The shared table has a fixed capacity, reported as a gauge
+shared_store = store if store.fixed_capacity else None
+retention = None
+if settings.retention_seconds:
+    if settings.id_scheme != "uuid7":
+        raise ValueError("retention_seconds requires id_scheme 'uuid7'")
+    if settings.store_backend.lower() not in RETENTION_BACKENDS:
+        raise ValueError(f"retention_seconds requires one of the {', '.join(RETENTION_BACKENDS)} backends")
+    if settings.store_breakdowns:
+        raise ValueError("store_breakdowns keeps every receipt and cannot be combined with retention_seconds")
+    store = retention = RetentionStore(
+        lambda: create_store(settings), settings.retention_seconds, settings.retention_partition_seconds
+    )
+if settings.store_breakdowns:
+    if settings.scoring_mode != "eager":
+        raise ValueError("store_breakdowns requires scoring_mode 'eager'")
+    if settings.store_backend.lower() not in BREAKDOWN_BACKENDS:
+        raise ValueError(f"store_breakdowns requires one of the {', '.join(BREAKDOWN_BACKENDS)} backends")
+    if settings.aggregates_enabled:
+        # A rule change rescores stored receipts, but aggregates keep the points awarded at ingest
+        raise ValueError("store_breakdowns cannot be combined with aggregates_enabled; set aggregates_enabled to false")
+    store = BreakdownStore(store, chunk_size=settings.rule_migration_chunk_size)
+elif settings.scoring_mode == "deferred":
+    if shared_store is not None:
+        # Unscored receipts wait in the worker that took them, where other workers cannot read them
+        raise ValueError("scoring_mode 'deferred' cannot be combined with the shared backend")
+    store = DeferredStore(
+        store, settings.deferred_queue_size, settings.deferred_workers, settings.inline_score_max_items
+    )
+aggregates = Aggregates()
+aggregate_sync = (
+    AggregateSync(aggregates, settings.aggregates_dir, settings.aggregates_sync_interval)
+    if settings.aggregates_enabled and settings.aggregates_dir else None
+)
+receipt_index = ReceiptIndex() if settings.index_receipts else None
+if retention is not None and receipt_index is not None:
+    retention.on_expire = lambda: receipt_index.expire(retention.expired)
+receipt_cache = ReceiptCache(settings.dedupe_max_entries, settings.dedupe_ttl_seconds)
+scoring_pool = ScoringExecutor(
+    settings.score_pool_workers, settings.score_pool_min_items, settings.score_pool_min_batch, settings.score_pool_chunk_size
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.fast_startup:
+        await warm_up()
+        cached_openapi(app, settings.openapi_cache_path)
+    startup_timings.mark_ready()
+    yield
+    store.close()  # Make buffered writes durable on shutdown
+    scoring_pool.close()
+    if aggregate_sync is not None:
+        aggregate_sync.close()
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = FastIngestRoute  # Serves endpoints marked with fast_path from raw bytes
+
+profile_ring = None
+if settings.profiling_enabled or settings.profile_sample_rate > 0 or settings.profile_token:
+    profile_ring = ProfileRing(settings.profile_dir, settings.profile_max_entries)
+    # Innermost, so the profiles and their latency leave out admission queueing
+    app.add_middleware(
+        ProfilingMiddleware, ring=profile_ring, profile_all=settings.profiling_enabled,
+        sample_rate=settings.profile_sample_rate, token=settings.profile_token,
+        slow_seconds=settings.profile_slow_ms / 1000,
+    )
 
-app = FastAPI()
+if settings.admission_enabled:
+    admission_budgets = {
+        "ingest": Budget(
+            "ingest", settings.admission_ingest_concurrency, settings.admission_ingest_queue,
+            settings.admission_ingest_max_wait,
+        ),
+        "read": Budget(
+            "read", settings.admission_read_concurrency, settings.admission_read_queue, settings.admission_read_max_wait
+        ),
+    }
+    # Added before the metrics middleware so shed requests are still counted and timed
+    app.add_middleware(AdmissionMiddleware, budgets=admission_budgets, retry_after=settings.admission_retry_after)
+
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.registry.callback(
+        "receipts_startup_seconds", "Seconds from process start to each startup milestone.",
+        lambda: {(phase,): seconds for phase, seconds in startup_timings.milestones().items()}, labelnames=("phase",),
+    )
+    if settings.admission_enabled:
+        metrics.registry.callback(
+            "receipts_admission_queue_depth", "Requests waiting for an admission slot.",
+            lambda: {(name,): budget.queue_depth for name, budget in admission_budgets.items()}, labelnames=("budget",),
+        )
+        metrics.registry.callback(
+            "receipts_admission_in_flight", "Requests holding an admission slot.",
+            lambda: {(name,): budget.in_flight for name, budget in admission_budgets.items()}, labelnames=("budget",),
+        )
+    metrics.registry.callback("receipts_stored", "Receipts held by the store.", lambda: len(store))
+    if shared_store is not None:
+        metrics.registry.callback(
+            "receipts_store_capacity", "Receipts the shared table holds before it is full.", lambda: shared_store.max_receipts
+        )
+    if retention is not None:
+        metrics.registry.callback(
+            "receipts_retention_partitions", "Time partitions of receipts held by the store.", lambda: retention.partitions
+        )
+    if isinstance(store, DeferredStore):
+        metrics.registry.callback(
+            "receipts_deferred_queue_depth", "Deferred receipts waiting for the background scorer.", lambda: store.queue_depth
+        )
+        metrics.registry.callback(
+            "receipts_deferred_pending", "Receipts stored but not scored yet.", lambda: store.pending
+        )
+    metrics.registry.callback(
+        "receipts_dedupe_hits_total", "Submissions whose receipt cache lookup found an ID.", lambda: receipt_cache.hits, "counter"
+    )
+    metrics.registry.callback(
+        "receipts_dedupe_misses_total", "Submissions whose receipt cache lookup found nothing.", lambda: receipt_cache.misses, "counter"
+    )
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        """Returns the service metrics in the Prometheus text format."""
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+app.add_middleware(FirstRequestMiddleware, timings=startup_timings)
+
+
+@app.get("/startup", include_in_schema=False)
+def get_startup():
+    """Returns how long this worker took to import, to become ready and to serve its first request."""
+    return JSONResponse(content={"fast_startup": settings.fast_startup, **startup_timings.report()})
 
 # Custom exception handler for validation errors
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Custom handler to return a 400 Bad Request instead of 422."""
+    metrics.VALIDATION_FAILURES.inc(getattr(request.scope.get("route"), "path", "unmatched"))
     return JSONResponse(
         status_code=400,
         content={
@@ -19,17 +181,353 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         },
     )
 
+@app.exception_handler(StoreFull)
+async def store_full_handler(request: Request, exc: StoreFull):
+    """Answers 503 once a fixed-capacity store cannot take more receipts."""
+    return JSONResponse(status_code=503, content={"detail": "The receipt store is full."})
+
+@metrics.timed_endpoint
+async def process_lean_receipt(receipt, idempotency_key: Optional[str]):
+    """Fast ingest path of process_receipt for bodies already validated into a LeanReceipt."""
+    return await ingest_receipt(receipt, idempotency_key, lean_points)
+
 @app.post("/receipts/process", response_model=ReceiptResponse)
-def process_receipt(receipt: Receipt):
+@fast_path(process_lean_receipt, enabled=lambda: settings.fast_ingest)
+@metrics.timed_endpoint
+async def process_receipt(receipt: Receipt, idempotency_key: Optional[str] = Header(None)):
     """Submits a receipt and returns an ID."""
-    receipt_response = ReceiptResponse()  # Auto-generate ID
-    points = calculate_points(receipt)  # Compute points
-    receipts_db[receipt_response.id] = points  # Store receipt data
-    return {"id": receipt_response.id}
+    return await ingest_receipt(receipt, idempotency_key, calculate_points)
+
+def aggregated(score):
+    """Wraps ``score`` to add each receipt it scores to the running aggregates, for deferred scoring."""
+    if not settings.aggregates_enabled:
+        return score
+
+    def score_and_record(receipt) -> int:
+        points = score(receipt)
+        aggregates.record(receipt.retailer, receipt.purchaseDate, points)
+        return points
+    return score_and_record
+
+async def ingest_receipt(receipt, idempotency_key: Optional[str], score) -> Response:
+    """Scores and stores a validated receipt with ``score``, returning the ID response."""
+    # Retries of a receipt we have already scored get the original ID back
+    cache_keys = []
+    fingerprint = None
+    if idempotency_key or settings.dedupe_receipts:
+        fingerprint = receipt_fingerprint(receipt)
+    if idempotency_key:
+        cache_keys.append(idempotency_cache_key(idempotency_key))
+    if settings.dedupe_receipts:
+        cache_keys.append(fingerprint)
+    if cache_keys:
+        try:
+            receipt_id = receipt_cache.lookup(cache_keys, fingerprint, None if retention is None else retention.expired)
+        except IdempotencyKeyReused:
+            raise HTTPException(status_code=422, detail="The Idempotency-Key was already used for a different receipt.")
+        if receipt_id is not None:
+            return id_response(receipt_id)
+
+    receipt_id = new_receipt_id()
+    points = None
+    if isinstance(store, BreakdownStore):
+        # Breakdowns are scored rule by rule from the receipt's features and stored with the total
+        with metrics.stage("score"):
+            if store.blocking or len(receipt.items) > settings.inline_score_max_items:
+                points = await run_in_threadpool(profiled(store.add), receipt_id, receipt)
+            else:
+                points = store.add(receipt_id, receipt)
+    # In deferred mode points are computed on first read or by the background scorer
+    elif not (isinstance(store, DeferredStore) and store.defer(receipt_id, receipt, aggregated(score))):
+        # Compute points inline when cheap, otherwise keep the event loop free
+        with metrics.stage("score"):
+            if scoring_pool.accepts(len(receipt.items)):
+                points = await scoring_pool.score_async(receipt)
+            elif len(receipt.items) > settings.inline_score_max_items:
+                points = await run_in_threadpool(profiled(score), receipt)
+            else:
+                points = score(receipt)
+        with metrics.stage("store"):
+            await store.put_async(receipt_id, points)  # Store receipt data
+    if points is not None and settings.aggregates_enabled:
+        aggregates.record(receipt.retailer, receipt.purchaseDate, points)
+    if receipt_index is not None:
+        receipt_index.add(receipt_id, receipt)
+    for key in cache_keys:
+        receipt_cache.put(key, receipt_id, fingerprint)
+    return id_response(receipt_id)
+
+@app.post(
+    "/receipts/process/batch",
+    response_model=BatchReceiptResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/Receipt"}}
+                },
+                "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/Receipt"}},
+            },
+        }
+    },
+)
+@metrics.timed_endpoint
+async def process_receipt_batch(request: Request):
+    """Submits a JSON array or NDJSON stream of receipts and returns an ID or errors for each."""
+    entries = decode_batch(await request.body(), request.headers.get("content-type"))
+    # Validation and scoring are CPU-bound, keep them off the event loop
+    results = await run_in_threadpool(profiled(process_batch_entries), entries)
+    return JSONResponse(content={"results": results})
+
+def process_batch_entries(entries):
+    """Validates, scores and stores decoded batch entries, returning one result per entry."""
+    # Validate every entry first so scoring runs over the accepted receipts in one pass
+    results = []
+    accepted = []
+    with metrics.stage("validate_entries"):
+        for entry, errors in entries:
+            receipt = None
+            if errors is None:
+                receipt, errors = validate_entry(entry)
+            if receipt is None:
+                results.append({"errors": errors})
+            else:
+                result = {"id": new_receipt_id()}
+                results.append(result)
+                accepted.append((result["id"], receipt))
+
+    if isinstance(store, BreakdownStore):
+        with metrics.stage("score"):
+            points = store.add_many(accepted)
+    else:
+        with metrics.stage("score"):
+            points = scoring_pool.score_bulk(receipt for _, receipt in accepted)
+        with metrics.stage("store"):
+            store.put_many((receipt_id, receipt_points) for (receipt_id, _), receipt_points in zip(accepted, points))
+    if settings.aggregates_enabled:
+        aggregates.record_many(
+            (receipt.retailer, receipt.purchaseDate, receipt_points) for (_, receipt), receipt_points in zip(accepted, points)
+        )
+    if receipt_index is not None:
+        receipt_index.add_many(accepted)
+    return results
 
 @app.get("/receipts/{id}/points", response_model=PointsResponse)
-def get_points(id: str):
+@metrics.timed_endpoint
+async def get_points(id: str):
     """Returns the points awarded for the receipt."""
-    if id not in receipts_db:
+    with metrics.stage("store"):
+        points = await store.get_async(id)
+    if points is None:
+        metrics.POINTS_NOT_FOUND.inc()
         raise HTTPException(status_code=404, detail="No receipt found for that ID.")
-    return {"points": receipts_db[id]}
\ No newline at end of file
+    return points_response(points)
+
+@app.get("/receipts", response_model=ReceiptPage)
+@metrics.timed_endpoint
+async def list_receipts(
+    retailer: Optional[str] = Query(None, description="List this retailer's receipts, in the order they were stored."),
+    start_date: Optional[date] = Query(None, description="List receipts purchased from this date on, oldest first."),
+    end_date: Optional[date] = Query(None, description="...up to and including this date."),
+    start_time: Optional[time] = Query(None, description="Time of day from which to list, on start_date if given."),
+    end_time: Optional[time] = Query(None, description="Time of day up to which to list, on end_date if given."),
+    limit: int = Query(100, ge=1, le=1000, description="Receipts per page."),
+    cursor: Optional[str] = Query(None, description="The next_cursor of the previous page."),
+):
+    """Lists stored receipts by retailer, by purchase date and time range, or by time of day range.
+
+    Bounds are inclusive. With only start_time and end_time, receipts of every date are listed
+    by time of day.
+    """
+    if receipt_index is None:
+        raise HTTPException(status_code=404, detail="Receipt indexes are not enabled.")
+    dates = start_date is not None or end_date is not None
+    times = start_time is not None or end_time is not None
+    if retailer is not None and (dates or times):
+        raise HTTPException(status_code=400, detail="Filter by retailer or by purchase date and time, not both.")
+    if retailer is None and not (dates or times):
+        raise HTTPException(status_code=400, detail="Give a retailer or a purchase date or time range.")
+    try:
+        if retailer is not None:
+            entries, next_cursor = receipt_index.by_retailer(retailer, limit, cursor)
+        elif dates:
+            start = (start_date or date.min, start_time or time.min)
+            end = (end_date or date.max, end_time or time.max)
+            entries, next_cursor = receipt_index.by_datetime(start, end, limit, cursor)
+        else:
+            entries, next_cursor = receipt_index.by_time(start_time or time.min, end_time or time.max, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    with metrics.stage("store"):
+        points = await store.get_many_async([receipt_id for receipt_id, _, _, _ in entries])
+    receipts = [
+        {"id": receipt_id, "retailer": name, "purchaseDate": day, "purchaseTime": moment, "points": receipt_points}
+        for (receipt_id, name, day, moment), receipt_points in zip(entries, points)
+        # Receipts can expire between being indexed and being listed
+        if retention is None or not retention.expired(receipt_id)
+    ]
+    return {"receipts": receipts, "next_cursor": next_cursor}
+
+@app.get("/receipts/{id}/breakdown", response_model=BreakdownResponse)
+@metrics.timed_endpoint
+async def get_breakdown(id: str):
+    """Returns the points awarded for the receipt by each rule."""
+    components = store.breakdown(id) if isinstance(store, BreakdownStore) else None
+    if components is None:
+        # Not a points lookup; the 404 is counted by receipts_http_requests_total
+        raise HTTPException(status_code=404, detail="No breakdown found for that ID.")
+    return {
+        "points": sum(points for _, points in components.values()),
+        "rules": {name: {"version": version, "points": points} for name, (version, points) in components.items()},
+    }
+
+def aggregate_sources():
+    """This process's aggregates, plus the other workers' when they are shared."""
+    if not settings.aggregates_enabled:
+        raise HTTPException(status_code=404, detail="Aggregates are not enabled.")
+    return aggregate_sync.sources() if aggregate_sync is not None else [aggregates]
+
+def aggregate_summary(series) -> dict:
+    return summarize(series if series is not None else [0] * (len(aggregates.buckets) + 3), aggregates.buckets)
+
+@app.get("/aggregates/retailers/{retailer}", response_model=AggregateSummary)
+async def get_retailer_aggregate(retailer: str):
+    """Returns the receipt count, points total and points histogram of a retailer."""
+    return aggregate_summary(combine(source.retailer(retailer) for source in aggregate_sources()))
+
+@app.get("/aggregates/dates/{purchase_date}", response_model=AggregateSummary)
+async def get_date_aggregate(purchase_date: date):
+    """Returns the receipt count, points total and points histogram of a purchase date."""
+    return aggregate_summary(combine(source.date(purchase_date.isoformat()) for source in aggregate_sources()))
+
+@app.get("/aggregates/dates", response_model=AggregateSummary)
+async def get_date_range_aggregate(start: Optional[date] = Query(None), end: Optional[date] = Query(None)):
+    """Returns the receipt count, points total and points histogram of the purchase dates from start to end."""
+    start_key = start.isoformat() if start else None
+    end_key = end.isoformat() if end else None
+    return aggregate_summary(combine(source.date_range(start_key, end_key) for source in aggregate_sources()))
+
+@app.get("/aggregates")
+async def get_aggregates():
+    """Returns every aggregate as a mergeable snapshot: buckets, then series keyed by retailer and by date."""
+    merged = Aggregates(aggregates.buckets)
+    for source in aggregate_sources():
+        merged.merge(source.snapshot())
+    return merged.snapshot()
+
+def rules_or_404() -> BreakdownStore:
+    if not isinstance(store, BreakdownStore):
+        raise HTTPException(status_code=404, detail="Per-rule breakdowns are not enabled.")
+    return store
+
+@app.get("/rules", response_model=RulesResponse)
+async def get_rules():
+    """Returns the active version of every scoring rule and the rule change in progress, if any."""
+    breakdowns = rules_or_404()
+    return {
+        "rules": [
+            {"name": rule.name, "version": rule.version, "params": rule.params, "description": rule.description}
+            for rule in breakdowns.registry
+        ],
+        "migration": breakdowns.migration,
+    }
+
+@app.put("/rules/{name}", response_model=RuleInfo, status_code=202)
+async def change_rule(
+    name: str, change: RuleChange, background_tasks: BackgroundTasks, x_admin_token: Optional[str] = Header(None)
+):
+    """Registers a new version of a rule and rescores its component for every stored receipt."""
+    breakdowns = rules_or_404()
+    if not settings.rules_admin_token or not hmac.compare_digest(x_admin_token or "", settings.rules_admin_token):
+        raise HTTPException(status_code=403, detail="A valid X-Admin-Token header is required.")
+    try:
+        rule = breakdowns.begin_migration(name, **change.params)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="No rule with that name.")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except MigrationInProgress as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    # Totals keep being served from the current version until the new one is switched in
+    background_tasks.add_task(breakdowns.run_migration, rule)
+    return {"name": rule.name, "version": rule.version, "params": rule.params, "description": rule.description}
+
+def profiles_or_404(x_profile_token: Optional[str]) -> ProfileRing:
+    if profile_ring is None:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled.")
+    if settings.profile_token and not hmac.compare_digest(x_profile_token or "", settings.profile_token):
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required.")
+    return profile_ring
+
+@app.get("/profiles", response_model=ProfileList)
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """Lists the captured profiles of slow requests, newest first."""
+    ring = profiles_or_404(x_profile_token)
+    return JSONResponse(content={"profiles": await run_in_threadpool(ring.entries)})
+
+@app.get(
+    "/profiles/{id}",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}, "text/plain": {}}}},
+)
+async def get_profile(
+    id: str,
+    format: str = Query("pstats", pattern="^(pstats|text)$", description="pstats for the profile file, text for a report."),
+    x_profile_token: Optional[str] = Header(None),
+):
+    """Downloads a captured profile, for ``pstats``, snakeviz and similar tools, or as a text report."""
+    ring = profiles_or_404(x_profile_token)
+    if format == "text":
+        report = await run_in_threadpool(ring.report, id)
+        if report is None:
+            raise HTTPException(status_code=404, detail="No profile found for that ID.")
+        return PlainTextResponse(report)
+    path = ring.profile_path(id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No profile found for that ID.")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{id}.prof")
+
+@app.post(
+    "/receipts/points",
+    response_model=BulkPointsResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": BulkPointsRequest.model_json_schema()},
+                NDJSON_MEDIA_TYPE: {"schema": {"type": "string", "description": "One receipt ID per line."}},
+            },
+        },
+        "responses": {
+            "200": {
+                "content": {
+                    NDJSON_MEDIA_TYPE: {
+                        "schema": {
+                            "type": "object",
+                            "properties": {"id": {"type": "string"}, "points": {"type": "integer", "nullable": True}},
+                        }
+                    }
+                }
+            }
+        },
+    },
+)
+@metrics.timed_endpoint
+async def get_points_bulk(request: Request):
+    """Returns the points for many receipts, plus the IDs that were not found."""
+    # NDJSON in either direction streams the lookup a chunk at a time
+    if is_ndjson(request.headers.get("content-type")):
+        receipt_ids = aiter_ids(request.stream())
+    else:
+        receipt_ids = decode_lookup(await request.body())
+        if not wants_ndjson(request.headers.get("accept")):
+            with metrics.stage("store"):
+                points = await store.get_many_async(receipt_ids)
+            return JSONResponse(content=lookup_result(receipt_ids, points))
+    return DuplexStreamingResponse(
+        stream_points(receipt_ids, store, settings.bulk_lookup_chunk_size), media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+startup_timings.mark_imported()
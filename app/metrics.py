@@ -0,0 +1,285 @@
+"""Low-overhead request metrics exposed in the Prometheus text format.
+
+Counters and histograms are plain Python objects guarded by a lock; an observation is a
+bisect into a fixed bucket list plus two additions. ``MetricsMiddleware`` times every
+request and splits it into stages:
+
+* ``receive_body`` - from the start of the request until the body has been read
+* ``validate`` - JSON decoding and pydantic validation, until the endpoint is entered
+* ``score`` / ``store`` - timed inside the endpoints with ``stage``
+* ``serialize`` - from the endpoint returning until the response starts
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class CallbackMetric:
+    """A gauge or counter whose value is read from a callback when the metrics are scraped.
+
+    With ``labelnames`` the callback returns a ``{label values: value}`` mapping instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], object],
+        metric_type: str = "gauge",
+        labelnames: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.metric_type = metric_type
+        self.labelnames = labelnames
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        if not self.labelnames:
+            yield f"{self.name} {_format_value(self.read())}"
+            return
+        for labels, value in sorted(self.read().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # labels -> bucket counts + [overflow, count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[-2] if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], object],
+        metric_type: str = "gauge",
+        labelnames: Tuple[str, ...] = (),
+    ) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, read, metric_type, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    "receipts_http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+REQUEST_LATENCY = registry.histogram(
+    "receipts_http_request_duration_seconds", "Time from request start to the end of the response.", ("route",)
+)
+STAGE_LATENCY = registry.histogram(
+    "receipts_stage_duration_seconds", "Time spent in each stage of handling a request.", ("route", "stage")
+)
+VALIDATION_FAILURES = registry.counter(
+    "receipts_validation_failures_total", "Requests rejected with 400 because the receipt was invalid.", ("route",)
+)
+POINTS_NOT_FOUND = registry.counter(
+    "receipts_points_not_found_total", "Points lookups that returned 404."
+)
+
+
+class RequestTiming:
+    """Timestamps of one request, shared between the middleware and the endpoint."""
+
+    __slots__ = ("scope", "start", "body_received", "handler_start", "handler_end")
+
+    def __init__(self, scope, start: float):
+        self.scope = scope
+        self.start = start
+        self.body_received = None
+        self.handler_start = None
+        self.handler_end = None
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope; label by its path template
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Times a block of an endpoint as stage ``name`` of the current request."""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, timing.route, name)
+
+
+def timed_endpoint(endpoint):
+    """Marks when an async endpoint starts and returns, to separate validation and serialization."""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.handler_start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if timing is not None:
+                timing.handler_end = time.perf_counter()
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and per-stage timings."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(scope, time.perf_counter())
+        token = _current_timing.set(timing)
+        status = 500
+        response_started = None
+
+        async def timed_receive():
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                timing.body_received = time.perf_counter()
+            return message
+
+        async def timed_send(message):
+            nonlocal status, response_started
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_started = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, timed_send)
+        finally:
+            _current_timing.reset(token)
+            end = time.perf_counter()
+            route = timing.route
+            REQUESTS.inc(scope["method"], route, str(status))
+            REQUEST_LATENCY.observe(end - timing.start, route)
+            if timing.handler_start is not None:
+                validated_from = timing.start
+                if timing.body_received is not None:
+                    STAGE_LATENCY.observe(timing.body_received - timing.start, route, "receive_body")
+                    validated_from = timing.body_received
+                STAGE_LATENCY.observe(timing.handler_start - validated_from, route, "validate")
+            if timing.handler_end is not None and response_started is not None:
+                STAGE_LATENCY.observe(response_started - timing.handler_end, route, "serialize")
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field, constr, ConfigDict
-from typing import List
+from pydantic import BaseModel, Field, StrictInt, constr, ConfigDict
+from typing import Any, Dict, List, Optional
 from datetime import date, time
-from uuid import uuid4
+
+from app.config import settings
+from app.ids import id_minter
 
 
 class Item(BaseModel):
@@ -54,8 +56,16 @@ class Receipt(BaseModel):
     )
 
 
+_mint_receipt_id = id_minter(settings.id_scheme)
+
+
+def new_receipt_id() -> str:
+    """Returns a new receipt ID of the configured ``id_scheme`` without building a ReceiptResponse."""
+    return _mint_receipt_id()
+
+
 class ReceiptResponse(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid4()), pattern=r"^\S+$")
+    id: str = Field(default_factory=new_receipt_id, pattern=r"^\S+$")
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -75,4 +85,181 @@ class PointsResponse(BaseModel):
                 'points': 100
             }
         }
-    )
\ No newline at end of file
+    )
+
+
+class BulkPointsRequest(BaseModel):
+    ids: List[str] = Field(..., description="The receipt IDs to look up.")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'ids': ['adb6b560-0eef-42bc-9d16-df48f30e89b2', '7fb1377b-b223-49d9-a31a-5a02701dd310']
+            }
+        }
+    )
+
+
+class BulkPointsResponse(BaseModel):
+    points: Dict[str, int] = Field(..., description="The points awarded, keyed by receipt ID, for every ID found.")
+    missing: List[str] = Field(..., description="The requested IDs with no receipt, in request order.")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'points': {'adb6b560-0eef-42bc-9d16-df48f30e89b2': 100},
+                'missing': ['7fb1377b-b223-49d9-a31a-5a02701dd310']
+            }
+        }
+    )
+
+
+class BatchEntryResult(BaseModel):
+    id: Optional[str] = Field(None, description="The ID assigned to the receipt, if it was accepted.")
+    errors: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Validation errors for the entry, if it was rejected."
+    )
+
+
+class BatchReceiptResponse(BaseModel):
+    results: List[BatchEntryResult] = Field(
+        ..., description="One result per submitted receipt, in input order."
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'results': [
+                    {'id': 'adb6b560-0eef-42bc-9d16-df48f30e89b2'},
+                    {'errors': [{'type': 'missing', 'loc': ['total'], 'msg': 'Field required'}]}
+                ]
+            }
+        }
+    )
+
+class RuleComponent(BaseModel):
+    version: int = Field(..., description="The version of the rule the points were computed with.")
+    points: int = Field(..., description="The points this rule awarded.")
+
+
+class BreakdownResponse(BaseModel):
+    points: int = Field(..., description="The number of points awarded.")
+    rules: Dict[str, RuleComponent] = Field(..., description="The points awarded by each rule, keyed by rule name.")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'points': 28,
+                'rules': {
+                    'retailer': {'version': 1, 'points': 6},
+                    'round_total': {'version': 1, 'points': 0},
+                    'total_multiple': {'version': 1, 'points': 0},
+                    'item_pairs': {'version': 1, 'points': 10},
+                    'item_descriptions': {'version': 1, 'points': 6},
+                    'odd_day': {'version': 1, 'points': 6},
+                    'purchase_window': {'version': 2, 'points': 0}
+                }
+            }
+        }
+    )
+
+
+class RuleInfo(BaseModel):
+    name: str = Field(..., description="The name of the rule.")
+    version: int = Field(..., description="The active version of the rule.")
+    params: Dict[str, int] = Field(..., description="The parameters of the active version.")
+    description: str = Field(..., description="What the rule awards points for.")
+
+
+class RuleMigration(BaseModel):
+    rule: str = Field(..., description="The rule being changed.")
+    version: int = Field(..., description="The version being rolled out.")
+    done: int = Field(..., description="Receipts rescored so far.")
+    total: int = Field(..., description="Receipts stored when the migration started.")
+
+
+class RulesResponse(BaseModel):
+    rules: List[RuleInfo] = Field(..., description="Every rule, in scoring order.")
+    migration: Optional[RuleMigration] = Field(None, description="The rule change being applied, if any.")
+
+
+class RuleChange(BaseModel):
+    params: Dict[str, StrictInt] = Field(..., description="The parameters to change; the others keep their value.")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'params': {'start_minute': 840, 'end_minute': 1020}
+            }
+        }
+    )
+
+
+class HistogramBucket(BaseModel):
+    le: Optional[int] = Field(..., description="Upper bound of the bucket in points, inclusive; null for the last one.")
+    count: int = Field(..., description="Receipts whose points fall in this bucket.")
+
+
+class AggregateSummary(BaseModel):
+    count: int = Field(..., description="The number of receipts.")
+    points: int = Field(..., description="The points awarded to them in total.")
+    histogram: List[HistogramBucket] = Field(..., description="How many receipts were awarded how many points.")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'count': 3,
+                'points': 140,
+                'histogram': [{'le': 25, 'count': 1}, {'le': 100, 'count': 2}, {'le': None, 'count': 0}]
+            }
+        }
+    )
+
+
+class ReceiptListing(BaseModel):
+    id: str = Field(..., description="The ID of the receipt.")
+    retailer: str = Field(..., description="The retailer as submitted.")
+    purchaseDate: date = Field(..., description="The date of the purchase.")
+    purchaseTime: time = Field(..., description="The time of the purchase.")
+    points: Optional[int] = Field(..., description="The number of points awarded.")
+
+
+class ReceiptPage(BaseModel):
+    receipts: List[ReceiptListing] = Field(..., description="One page of matching receipts.")
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor to get the next page; null on the last page."
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            'example': {
+                'receipts': [
+                    {
+                        'id': 'adb6b560-0eef-42bc-9d16-df48f30e89b2',
+                        'retailer': 'Target',
+                        'purchaseDate': '2022-01-01',
+                        'purchaseTime': '13:01:00',
+                        'points': 28
+                    }
+                ],
+                'next_cursor': '3155423815200000000000000000'
+            }
+        }
+    )
+
+
+class ProfileInfo(BaseModel):
+    id: str = Field(..., description="The ID to download the profile with.")
+    captured_at: float = Field(..., description="When the request finished, in seconds since the epoch.")
+    method: str = Field(..., description="The HTTP method of the request.")
+    path: str = Field(..., description="The path of the request.")
+    status: int = Field(..., description="The response status code.")
+    duration_ms: float = Field(..., description="The request latency while profiled, in milliseconds.")
+    trigger: str = Field(..., description="What selected the request: config, sample or header.")
+    shape: Dict[str, Any] = Field(
+        ..., description="The body with letters replaced by a, digits by 9 and other characters by ?, plus counts."
+    )
+
+
+class ProfileList(BaseModel):
+    profiles: List[ProfileInfo] = Field(..., description="The captured profiles, newest first.")
@@ -0,0 +1,183 @@
+"""Columnar points engine for scoring many receipts at once.
+
+Receipts are flattened into integer columns (cents, lengths, counts, day and time of day) so
+that the seven rules in ``calculate_points`` become whole-array operations. NumPy is used when
+it is installed; otherwise the same integer arithmetic runs in plain Python. NumPy is imported
+on first use rather than with this module, which keeps it out of a worker's startup.
+"""
+from array import array
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from app.models import Receipt
+
+
+@lru_cache(maxsize=None)
+def numpy_module():
+    """Returns the NumPy module, importing it on first call, or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - exercised when NumPy is not installed
+        return None
+    return numpy
+
+
+def __getattr__(name: str):
+    # ``points_engine.np`` stays available to callers without importing NumPy eagerly
+    if name == "np":
+        return numpy_module()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Purchase time window for rule 7, in microseconds since midnight (both ends exclusive)
+WINDOW_START_US = 14 * 3600 * 1_000_000
+WINDOW_END_US = 16 * 3600 * 1_000_000
+
+# Amounts at or above this many cents are kept as Python ints so array sums cannot overflow
+MAX_VECTOR_CENTS = 2 ** 53
+
+
+def to_cents(amount: str) -> int:
+    """Converts a validated ``\\d+.\\d{2}`` amount string to integer cents."""
+    # The pattern guarantees exactly two digits after the only dot
+    return int(amount.replace(".", ""))
+
+
+@lru_cache(maxsize=4096)
+def retailer_points(retailer: str) -> int:
+    """Rule 1: one point per alphanumeric character. Retailer names repeat heavily, so cache them."""
+    return sum(c.isalnum() for c in retailer)
+
+
+def item_bonus(description_length: int, price_cents: int) -> int:
+    """Rule 5 for one item: ceil(price * 0.2) when the trimmed description length is a multiple of 3."""
+    if description_length % 3:
+        return 0
+    return (price_cents + 499) // 500
+
+
+class ReceiptColumns:
+    """Flat, column-oriented layout of a list of receipts.
+
+    Per-receipt columns have one entry per receipt; the item columns are concatenated across
+    receipts in order and sliced with ``item_counts``.
+    """
+
+    __slots__ = (
+        "retailer_points",
+        "total_cents",
+        "item_counts",
+        "day_of_month",
+        "time_of_day_us",
+        "item_description_lengths",
+        "item_price_cents",
+    )
+
+    def __init__(self, **columns):
+        for name in self.__slots__:
+            setattr(self, name, columns.get(name, array("q")))
+
+    def __len__(self) -> int:
+        return len(self.total_cents)
+
+    @property
+    def wide(self) -> bool:
+        """True when an amount too large for a 64-bit column forced Python-int lists."""
+        return not isinstance(self.total_cents, array)
+
+    @classmethod
+    def from_receipts(cls, receipts: Iterable[Receipt]) -> "ReceiptColumns":
+        receipts = list(receipts)
+        items = [item for receipt in receipts for item in receipt.items]
+        times = [receipt.purchaseTime for receipt in receipts]
+        columns = {
+            "retailer_points": [retailer_points(receipt.retailer) for receipt in receipts],
+            "total_cents": [to_cents(receipt.total) for receipt in receipts],
+            "item_counts": [len(receipt.items) for receipt in receipts],
+            "day_of_month": [receipt.purchaseDate.day for receipt in receipts],
+            "time_of_day_us": [
+                ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond for t in times
+            ],
+            "item_description_lengths": [len(item.shortDescription.strip()) for item in items],
+            "item_price_cents": [to_cents(item.price) for item in items],
+        }
+        return cls.from_lists(**columns)
+
+    @classmethod
+    def from_lists(cls, **columns: List[int]) -> "ReceiptColumns":
+        """Builds columns from lists, packed into 64-bit arrays unless an amount is too large."""
+        largest = max(columns["total_cents"] + columns["item_price_cents"], default=0)
+        if largest < MAX_VECTOR_CENTS:
+            columns = {name: array("q", values) for name, values in columns.items()}
+        return cls(**columns)
+
+
+def score_columns_python(columns: ReceiptColumns) -> List[int]:
+    """Scores every receipt in ``columns`` with plain integer arithmetic."""
+    results = []
+    lengths = columns.item_description_lengths
+    prices = columns.item_price_cents
+    offset = 0
+    for i in range(len(columns)):
+        total_cents = columns.total_cents[i]
+        item_count = columns.item_counts[i]
+        time_of_day = columns.time_of_day_us[i]
+
+        points = columns.retailer_points[i]
+        if total_cents % 100 == 0:
+            points += 50
+        if total_cents % 25 == 0:
+            points += 25
+        points += (item_count // 2) * 5
+        for j in range(offset, offset + item_count):
+            points += item_bonus(lengths[j], prices[j])
+        if columns.day_of_month[i] % 2 == 1:
+            points += 6
+        if WINDOW_START_US < time_of_day < WINDOW_END_US:
+            points += 10
+
+        offset += item_count
+        results.append(points)
+    return results
+
+
+def score_columns_numpy(columns: ReceiptColumns) -> List[int]:
+    """Scores every receipt in ``columns`` with NumPy array operations."""
+    np = numpy_module()
+    total_cents = np.frombuffer(columns.total_cents, dtype=np.int64)
+    item_counts = np.frombuffer(columns.item_counts, dtype=np.int64)
+    day_of_month = np.frombuffer(columns.day_of_month, dtype=np.int64)
+    time_of_day = np.frombuffer(columns.time_of_day_us, dtype=np.int64)
+    lengths = np.frombuffer(columns.item_description_lengths, dtype=np.int64)
+    prices = np.frombuffer(columns.item_price_cents, dtype=np.int64)
+
+    points = np.array(columns.retailer_points, dtype=np.int64)
+    points += np.where(total_cents % 100 == 0, 50, 0)
+    points += np.where(total_cents % 25 == 0, 25, 0)
+    points += (item_counts // 2) * 5
+
+    # Per-item bonuses, summed per receipt through prefix-sum differences
+    bonuses = np.where(lengths % 3 == 0, (prices + 499) // 500, 0)
+    bonus_sums = np.concatenate(([0], np.cumsum(bonuses)))
+    ends = np.cumsum(item_counts)
+    points += bonus_sums[ends] - bonus_sums[ends - item_counts]
+
+    points += np.where(day_of_month % 2 == 1, 6, 0)
+    points += np.where((time_of_day > WINDOW_START_US) & (time_of_day < WINDOW_END_US), 10, 0)
+    return points.tolist()
+
+
+def score_columns(columns: ReceiptColumns, use_numpy: Optional[bool] = None) -> List[int]:
+    """Scores every receipt in ``columns``, using NumPy when available and safe."""
+    if use_numpy is None:
+        use_numpy = numpy_module() is not None
+    if use_numpy and numpy_module() is None:
+        raise RuntimeError("NumPy is not installed")
+    if use_numpy and len(columns) and not columns.wide:
+        return score_columns_numpy(columns)
+    return score_columns_python(columns)
+
+
+def calculate_points_bulk(receipts: Iterable[Receipt], use_numpy: Optional[bool] = None) -> List[int]:
+    """Returns the points for each receipt, identical to calling ``calculate_points`` on each."""
+    return score_columns(ReceiptColumns.from_receipts(receipts), use_numpy)
@@ -0,0 +1,298 @@
+"""Opt-in cProfile profiling of ingest requests, keeping slow ones in an on-disk ring buffer.
+
+``ProfilingMiddleware`` profiles ``POST /receipts/process*`` requests that are selected
+because profiling is on for every request, by a random sample, or by an ``X-Profile-Token``
+header matching the configured token. The event-loop thread is profiled for the whole
+request, covering body validation and inline scoring. Work the endpoint hands to the
+threadpool is profiled when it is wrapped with ``profiled``, and merged into the same
+profile. Scoring in the worker process pool is not covered.
+
+cProfile allows one active profiler per thread, so a worker profiles one request at a time
+and requests arriving meanwhile run unprofiled. On a busy worker the event-loop profile also
+includes the code of requests that interleave with the profiled one at ``await`` points.
+
+A profiled request slower than the threshold is written to ``ProfileRing``: a ``.prof``
+file in the ``pstats`` format and a ``.json`` file with the request, its duration and a
+redacted shape of the receipt. The shape keeps lengths, counts and character classes, which
+is what validation and scoring cost depends on, and drops the text.
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import string
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from anyio import to_thread
+
+from app import metrics
+from app.batch import is_ndjson, iter_ndjson_lines
+
+PROFILED_REQUESTS = metrics.registry.counter(
+    "receipts_profiled_requests_total", "Requests run under cProfile, by what selected them.", ("trigger",)
+)
+PROFILES_CAPTURED = metrics.registry.counter(
+    "receipts_profiles_captured_total", "Profiles of slow requests written to the ring buffer."
+)
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_ID = re.compile(r"^\d{13}-\d+-\d+$")
+# Items of a receipt shown one by one in its shape; the rest are only summarized
+SHAPE_ITEMS = 20
+_KEPT = set(string.punctuation) | set(string.whitespace)
+
+
+def redact(value: Any) -> Any:
+    """Replaces letters with "a", digits with "9" and other non-ASCII characters with "?"."""
+    if not isinstance(value, str):
+        return None if value is None else type(value).__name__
+    return "".join(
+        "a" if char.isalpha() else "9" if char.isdigit() else char if char in _KEPT else "?" for char in value
+    )
+
+
+def receipt_shape(receipt: Any) -> Any:
+    """The redacted shape of one decoded receipt body."""
+    if not isinstance(receipt, dict):
+        return {"type": type(receipt).__name__}
+    items = receipt.get("items")
+    shape = {field: redact(receipt.get(field)) for field in ("retailer", "purchaseDate", "purchaseTime", "total")}
+    if not isinstance(items, list):
+        shape["items"] = redact(items)
+        return shape
+    items = [item if isinstance(item, dict) else {} for item in items]
+    lengths = [len(item.get("shortDescription") or "") for item in items]
+    shape["item_count"] = len(items)
+    shape["description_length_max"] = max(lengths, default=0)
+    shape["description_length_total"] = sum(lengths)
+    shape["items"] = [
+        {"shortDescription": redact(item.get("shortDescription")), "price": redact(item.get("price"))}
+        for item in items[:SHAPE_ITEMS]
+    ]
+    return shape
+
+
+def body_shape(path: str, body: bytes, content_type: Optional[str]) -> Dict[str, Any]:
+    """The redacted shape of a request body: one receipt, or a batch summarized by its largest receipt."""
+    shape: Dict[str, Any] = {"bytes": len(body), "content_type": content_type}
+    try:
+        if is_ndjson(content_type):
+            receipts = [json.loads(line) for line in iter_ndjson_lines(body)]
+        else:
+            receipts = json.loads(body)
+    except ValueError:
+        shape["json"] = False
+        return shape
+    if not path.endswith("/batch"):
+        shape["receipt"] = receipt_shape(receipts)
+    elif isinstance(receipts, list):
+        sizes = [len(r["items"]) if isinstance(r, dict) and isinstance(r.get("items"), list) else 0 for r in receipts]
+        shape["receipts"] = len(receipts)
+        shape["item_count"] = sum(sizes)
+        if receipts:
+            shape["largest_receipt"] = receipt_shape(receipts[sizes.index(max(sizes))])
+    return shape
+
+
+class ProfileSession:
+    """The profilers of one request: its event-loop profile plus one per threadpool call."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another profiler is active on this thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+        return stats
+
+
+_current_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+def profiled(fn: Callable) -> Callable:
+    """Wraps ``fn`` to be profiled on whichever thread runs it, when the current request is profiled."""
+    session = _current_session.get()
+    if session is None:
+        return fn
+    return lambda *args, **kwargs: session.call(fn, *args, **kwargs)
+
+
+class ProfileRing:
+    """The newest ``max_entries`` captured profiles, as files in ``directory``."""
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._sequence = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def _ids(self) -> List[str]:
+        # IDs start with the capture time in milliseconds, so they sort oldest first
+        ids = [name[:-5] for name in os.listdir(self.directory) if name.endswith(".json") and PROFILE_ID.match(name[:-5])]
+        return sorted(ids, key=lambda profile_id: tuple(int(part) for part in profile_id.split("-")))
+
+    def write(self, stats: pstats.Stats, meta: Dict[str, Any]) -> str:
+        """Stores a profile and its metadata, dropping the oldest beyond ``max_entries``."""
+        with self._lock:
+            self._sequence += 1
+            profile_id = f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._sequence}"
+        stats.dump_stats(self._path(profile_id, ".prof"))
+        # The metadata file is what lists an entry, so it is written last and atomically
+        temporary = self._path(profile_id, ".json.tmp")
+        with open(temporary, "w") as f:
+            json.dump({"id": profile_id, **meta}, f)
+        os.replace(temporary, self._path(profile_id, ".json"))
+        for stale in self._ids()[:-self.max_entries]:
+            for suffix in (".json", ".prof"):
+                try:
+                    os.remove(self._path(stale, suffix))
+                except FileNotFoundError:
+                    pass  # Another worker sharing the directory removed it first
+        return profile_id
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Metadata of the stored profiles, newest first."""
+        entries = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, ".json")) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def profile_path(self, profile_id: str) -> Optional[str]:
+        """Path of a stored ``.prof`` file, or None for an unknown or malformed ID."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = self._path(profile_id, ".prof")
+        return path if os.path.exists(path) else None
+
+    def report(self, profile_id: str, limit: int = 50) -> Optional[str]:
+        """The top ``limit`` functions of a stored profile by cumulative time, as text."""
+        path = self.profile_path(profile_id)
+        if path is None:
+            return None
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling selected ingest requests and capturing the slow ones."""
+
+    def __init__(
+        self,
+        app,
+        ring: ProfileRing,
+        profile_all: bool = False,
+        sample_rate: float = 0.0,
+        token: str = "",
+        slow_seconds: float = 0.1,
+    ):
+        self.app = app
+        self.ring = ring
+        self.profile_all = profile_all
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+        self.slow_seconds = slow_seconds
+        self._busy = False  # One profiled request at a time per worker
+
+    def _trigger(self, scope) -> Optional[str]:
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/receipts/process"):
+            return None
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_TOKEN_HEADER and hmac.compare_digest(value, self.token):
+                    return "header"
+        if self.profile_all:
+            return "config"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = None if self._busy else self._trigger(scope)
+        if trigger is not None:
+            session = ProfileSession()
+            try:
+                session.profile.enable()
+            except ValueError:  # Another profiler, such as a debugger's, is active on the event loop
+                trigger = None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        self._busy = True
+        PROFILED_REQUESTS.inc(trigger)
+        chunks = []
+        status = 500
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _current_session.set(session)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            session.profile.disable()
+            duration = time.perf_counter() - start
+            _current_session.reset(token)
+            self._busy = False
+        if duration >= self.slow_seconds:
+            await self._capture(scope, b"".join(chunks), status, duration, trigger, session)
+
+    async def _capture(self, scope, body: bytes, status: int, duration: float, trigger: str, session) -> None:
+        content_type = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"content-type"), None)
+        meta = {
+            "captured_at": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "trigger": trigger,
+        }
+
+        def write():
+            meta["shape"] = body_shape(scope["path"], body, content_type)
+            self.ring.write(session.stats(), meta)
+
+        await to_thread.run_sync(write)
+        PROFILES_CAPTURED.inc()
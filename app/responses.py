@@ -0,0 +1,51 @@
+"""Response bodies written directly as bytes, and a streaming response for duplex lookups.
+
+The endpoint results are fixed, trivial shapes, so validating them against the response
+model and running them through ``jsonable_encoder`` on every call buys nothing. Endpoints
+return these responses instead; FastAPI passes a ``Response`` through untouched, while the
+``response_model`` on the route still documents the schema in OpenAPI. The bytes match what
+``JSONResponse`` renders for the same dict.
+"""
+from fastapi.responses import Response, StreamingResponse
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def id_response(receipt_id: str) -> Response:
+    """``{"id": ...}`` for an ID minted by ``new_receipt_id``, which never needs escaping."""
+    return Response(b'{"id":"' + receipt_id.encode() + b'"}', media_type=JSON_MEDIA_TYPE)
+
+
+def points_response(points: int) -> Response:
+    return Response(b'{"points":%d}' % points, media_type=JSON_MEDIA_TYPE)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response whose body is produced while the request body is still being read.
+
+    ``StreamingResponse`` calls ``receive`` in the background to notice client disconnects,
+    which would take request body chunks away from the generator reading ``request.stream()``.
+    Here only the generator receives; a disconnect surfaces there as ``ClientDisconnect``.
+
+    The response starts only when the first chunk is ready, so an error raised while the
+    generator reads the first part of the request (an invalid line, say) still gets its
+    error response. Once the response has started, an error ends the stream instead.
+    """
+
+    async def stream_response(self, send) -> None:
+        chunks = self.body_iterator.__aiter__()
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b""
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if first:
+            await send({"type": "http.response.body", "body": first, "more_body": True})
+        async for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,139 @@
+"""Time-partitioned storage that expires receipts a fixed time after their ID was minted.
+
+With ``uuid7`` IDs every receipt ID starts with its creation time. ``RetentionStore`` keeps
+one backing store per partition of ``partition_seconds`` of ID time, created by ``factory``
+on the first write to it. A partition expires once all of it is older than the retention
+window. Expired partitions are dropped whole, which frees their memory without visiting
+their entries. Under constant ingest the store therefore holds between ``retention_seconds``
+and ``retention_seconds + partition_seconds`` of receipts.
+
+Reads find the partition from the ID before looking the receipt up. An expired receipt reads
+as unknown from the moment it expires, even before its partition is dropped. Partitions are
+dropped when a write opens a new partition, and when the store's size is read.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app import metrics
+from app.ids import uuid7_millis
+from app.storage import ReceiptStore
+
+# Backends whose instances are independent in-memory stores, so each partition can be one
+RETENTION_BACKENDS = ("dict", "sharded", "compact")
+
+RECEIPTS_EXPIRED = metrics.registry.counter(
+    "receipts_expired_total", "Receipts dropped with their partition after the retention window."
+)
+
+
+class RetentionStore(ReceiptStore):
+    """Stores receipts in per-time-partition stores and drops partitions past the retention window."""
+
+    blocking = False  # Partitions are in-memory stores
+
+    def __init__(
+        self,
+        factory: Callable[[], ReceiptStore],
+        retention_seconds: float,
+        partition_seconds: float,
+        clock: Callable[[], float] = time.time,
+        on_expire: Optional[Callable[[], None]] = None,
+    ):
+        if retention_seconds <= 0 or partition_seconds <= 0:
+            raise ValueError("retention_seconds and partition_seconds must be positive")
+        self._factory = factory
+        self._retention_ms = int(retention_seconds * 1000)
+        self._partition_ms = max(int(partition_seconds * 1000), 1)
+        self._clock = clock
+        self.on_expire = on_expire  # Called after partitions are dropped
+        self._partitions: Dict[int, ReceiptStore] = {}
+        self._lock = threading.Lock()
+
+    def _oldest_live(self) -> int:
+        """The oldest partition that has not expired: every earlier one ended before the window."""
+        return (int(self._clock() * 1000) - self._retention_ms) // self._partition_ms
+
+    def _partition(self, receipt_id: str) -> Optional[int]:
+        millis = uuid7_millis(receipt_id)
+        return None if millis is None else millis // self._partition_ms
+
+    def expired(self, receipt_id: str) -> bool:
+        """True once ``receipt_id`` has expired; IDs that are not UUIDv7 are never stored."""
+        partition = self._partition(receipt_id)
+        return partition is None or partition < self._oldest_live()
+
+    def _live(self, receipt_id: str, oldest: int) -> Optional[ReceiptStore]:
+        partition = self._partition(receipt_id)
+        if partition is None or partition < oldest:
+            return None
+        return self._partitions.get(partition)
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        store = self._live(receipt_id, self._oldest_live())
+        return None if store is None else store.get(receipt_id)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        oldest = self._oldest_live()
+        results = []
+        for receipt_id in receipt_ids:
+            store = self._live(receipt_id, oldest)
+            results.append(None if store is None else store.get(receipt_id))
+        return results
+
+    def put(self, receipt_id: str, points: int) -> None:
+        self.put_many([(receipt_id, points)])
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        oldest = self._oldest_live()
+        groups: Dict[int, List[Tuple[str, int]]] = {}
+        for receipt_id, points in entries:
+            partition = self._partition(receipt_id)
+            if partition is None:
+                raise ValueError(f"RetentionStore only stores UUIDv7 receipt IDs, got {receipt_id!r}")
+            if partition >= oldest:  # A receipt scored after it expired is not kept
+                groups.setdefault(partition, []).append((receipt_id, points))
+        opened = False
+        for partition, group in groups.items():
+            store = self._partitions.get(partition)
+            if store is None:
+                with self._lock:
+                    store = self._partitions.get(partition)
+                    if store is None:
+                        store = self._partitions[partition] = self._factory()
+                        opened = True
+            store.put_many(group)
+        if opened:
+            self.expire()
+
+    def expire(self) -> int:
+        """Drops every expired partition, returning how many receipts they held."""
+        oldest = self._oldest_live()
+        with self._lock:
+            dropped = [self._partitions.pop(partition) for partition in list(self._partitions) if partition < oldest]
+        if not dropped:
+            return 0
+        count = 0
+        for store in dropped:
+            count += len(store)
+            store.close()
+        RECEIPTS_EXPIRED.inc(amount=count)
+        if self.on_expire is not None:
+            self.on_expire()
+        return count
+
+    @property
+    def partitions(self) -> int:
+        return len(self._partitions)
+
+    def __len__(self) -> int:
+        self.expire()
+        return sum(len(store) for store in list(self._partitions.values()))
+
+    def flush(self) -> None:
+        for store in list(self._partitions.values()):
+            store.flush()
+
+    def close(self) -> None:
+        for store in list(self._partitions.values()):
+            store.close()
@@ -0,0 +1,177 @@
+"""Versioned registry of the scoring rules.
+
+Each of the seven rules in ``calculate_points`` is a ``Rule`` with integer parameters, so a
+rule can be changed (say, a different afternoon window or item price multiplier) by
+registering a new version with new parameters. Rules are evaluated on ``Features``: the few
+numbers per receipt and per item that the rules read, extracted once when a receipt is
+stored so components can be recomputed later without the receipt.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+from app.points_engine import to_cents
+
+
+class Features(NamedTuple):
+    """The inputs of every rule for one receipt."""
+
+    retailer_chars: int  # Alphanumeric characters in the retailer name
+    total_cents: int
+    item_count: int
+    day_of_month: int
+    time_of_day_us: int
+    item_lengths: Sequence[int]  # Trimmed description length per item
+    item_prices: Sequence[int]  # Price in cents per item
+
+
+def extract_features(receipt) -> Features:
+    """Builds the ``Features`` of a ``Receipt`` or ``LeanReceipt``."""
+    items = receipt.items
+    t = receipt.purchaseTime
+    return Features(
+        sum(c.isalnum() for c in receipt.retailer),
+        receipt.total if isinstance(receipt.total, int) else to_cents(receipt.total),
+        len(items),
+        receipt.purchaseDate.day,
+        ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond,
+        [len(item.shortDescription.strip()) for item in items],
+        [item.price if isinstance(item.price, int) else to_cents(item.price) for item in items],
+    )
+
+
+def _retailer(f: Features, p: Dict[str, int]) -> int:
+    return f.retailer_chars * p["points_per_char"]
+
+
+def _round_total(f: Features, p: Dict[str, int]) -> int:
+    return p["points"] if f.total_cents % 100 == 0 else 0
+
+
+def _total_multiple(f: Features, p: Dict[str, int]) -> int:
+    return p["points"] if f.total_cents % p["multiple_cents"] == 0 else 0
+
+
+def _item_pairs(f: Features, p: Dict[str, int]) -> int:
+    return (f.item_count // p["items_per_group"]) * p["points"]
+
+
+def _item_descriptions(f: Features, p: Dict[str, int]) -> int:
+    # ceil(price * numerator / denominator) in dollars, computed exactly on cents
+    divisor = p["price_denominator"] * 100
+    return sum(
+        (price * p["price_numerator"] + divisor - 1) // divisor
+        for length, price in zip(f.item_lengths, f.item_prices)
+        if length % p["length_multiple"] == 0
+    )
+
+
+def _odd_day(f: Features, p: Dict[str, int]) -> int:
+    return p["points"] if f.day_of_month % 2 == 1 else 0
+
+
+def _purchase_window(f: Features, p: Dict[str, int]) -> int:
+    start_us = p["start_minute"] * 60_000_000
+    end_us = p["end_minute"] * 60_000_000
+    return p["points"] if start_us < f.time_of_day_us < end_us else 0
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    version: int
+    params: Dict[str, int] = field(hash=False)
+    description: str = ""
+    compute: Callable[[Features, Dict[str, int]], int] = field(default=None, repr=False, compare=False)
+
+    def __call__(self, features: Features) -> int:
+        return self.compute(features, self.params)
+
+
+DEFAULT_RULES = (
+    Rule("retailer", 1, {"points_per_char": 1}, "Points per alphanumeric character in the retailer name.", _retailer),
+    Rule("round_total", 1, {"points": 50}, "Points if the total is a round dollar amount.", _round_total),
+    Rule("total_multiple", 1, {"points": 25, "multiple_cents": 25}, "Points if the total is a multiple of an amount.",
+         _total_multiple),
+    Rule("item_pairs", 1, {"points": 5, "items_per_group": 2}, "Points for every group of items.", _item_pairs),
+    Rule(
+        "item_descriptions",
+        1,
+        {"length_multiple": 3, "price_numerator": 1, "price_denominator": 5},
+        "Price times numerator/denominator, rounded up, per item whose trimmed description length is a multiple.",
+        _item_descriptions,
+    ),
+    Rule("odd_day", 1, {"points": 6}, "Points if the day of the purchase date is odd.", _odd_day),
+    Rule(
+        "purchase_window",
+        1,
+        {"points": 10, "start_minute": 14 * 60, "end_minute": 16 * 60},
+        "Points if the purchase time is strictly between two minutes of the day.",
+        _purchase_window,
+    ),
+)
+
+
+# Evaluated by every new rule version to reject parameters the rule cannot run with
+_SAMPLE = Features(1, 100, 1, 1, 0, [3], [100])
+
+
+class RuleRegistry:
+    """The active version of every rule, plus every version ever registered."""
+
+    def __init__(self, rules: Sequence[Rule] = DEFAULT_RULES):
+        self._active: Dict[str, Rule] = {rule.name: rule for rule in rules}
+        self._history: Dict[str, List[Rule]] = {rule.name: [rule] for rule in rules}
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped on every activation
+
+    def __iter__(self) -> Iterator[Rule]:
+        return iter(list(self._active.values()))
+
+    def __getitem__(self, name: str) -> Rule:
+        return self._active[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._active
+
+    def names(self) -> List[str]:
+        return list(self._active)
+
+    def snapshot(self) -> Tuple[int, Tuple[Rule, ...]]:
+        """Returns the generation and the active rules, consistent with each other."""
+        with self._lock:
+            return self.generation, tuple(self._active.values())
+
+    def history(self, name: str) -> List[Rule]:
+        return list(self._history[name])
+
+    def new_version(self, name: str, **params: int) -> Rule:
+        """Returns the next version of rule ``name`` with some parameters changed; not yet active.
+
+        Raises ``KeyError`` for an unknown rule and ``ValueError`` for unknown parameters.
+        """
+        current = self._active[name]
+        unknown = set(params) - set(current.params)
+        if unknown:
+            raise ValueError(f"Unknown parameters for rule {name!r}: {', '.join(sorted(unknown))}")
+        for param, value in params.items():
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"Parameter {param!r} of rule {name!r} must be a non-negative integer")
+        latest = self._history[name][-1].version
+        rule = Rule(name, latest + 1, {**current.params, **params}, current.description, current.compute)
+        try:
+            rule(_SAMPLE)
+        except ZeroDivisionError:
+            raise ValueError(f"Parameters of rule {name!r} divide by zero") from None
+        return rule
+
+    def activate(self, rule: Rule) -> None:
+        with self._lock:
+            self._active[rule.name] = rule
+            self._history[rule.name].append(rule)
+            self.generation += 1
+
+
+def score_features(features: Features, rules: Sequence[Rule]) -> List[int]:
+    """Returns the component of each rule, in order."""
+    return [rule(features) for rule in rules]
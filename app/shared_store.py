@@ -0,0 +1,141 @@
+"""Receipt store in a fixed-capacity memory-mapped table that every uvicorn worker shares."""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable, Optional, Tuple
+
+from anyio import to_thread
+
+from app.storage import ReceiptStore, StoreFull, uuid_key, uuid_slot
+
+
+class SharedMemoryStore(ReceiptStore):
+    """Fixed-capacity hash table in a memory-mapped file, shared by every worker process.
+
+    Point the path at ``/dev/shm`` to keep it in RAM. Writers serialize on an ``flock`` of the
+    file; readers take no lock at all. That is safe because slots are never deleted or moved:
+    a writer fills in the key and points before it flips the slot's state byte, so a reader
+    either sees a complete entry or an empty slot.
+
+    Slot layout (32 bytes): 16-byte UUID key, signed 64-bit points, state byte, padding.
+    """
+
+    _MAGIC = b"RCPTSHM1"
+    _HEADER = struct.Struct("<8sQQ")  # magic, capacity, count
+    _HEADER_SIZE = 64
+    _SLOT_SIZE = 32
+    _POINTS = struct.Struct("<q")
+    _MAX_LOAD = 0.9
+
+    fixed_capacity = True
+
+    def __init__(self, path: str, capacity: int = 1 << 20):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # The first process to take the lock lays out the table; later ones adopt its capacity
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, self._HEADER_SIZE + capacity * self._SLOT_SIZE)
+                os.pwrite(self._fd, self._HEADER.pack(self._MAGIC, capacity, 0), 0)
+            magic, capacity, _ = self._HEADER.unpack(os.pread(self._fd, self._HEADER.size, 0))
+            if magic != self._MAGIC:
+                raise ValueError(f"{path} is not a shared receipt store")
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.capacity = capacity
+        self.max_receipts = int(capacity * self._MAX_LOAD)  # Beyond this load, probing gets slow
+        self._map = mmap.mmap(self._fd, self._HEADER_SIZE + capacity * self._SLOT_SIZE)
+
+    def _offset(self, slot: int) -> int:
+        return self._HEADER_SIZE + slot * self._SLOT_SIZE
+
+    def _find(self, key: bytes) -> Tuple[int, bool]:
+        """Returns the slot holding ``key`` (found=True) or the free slot where it would go."""
+        view = self._map
+        capacity = self.capacity
+        slot = uuid_slot(key, capacity)
+        for _ in range(capacity):
+            offset = self._offset(slot)
+            if not view[offset + 24]:
+                return slot, False
+            if view[offset:offset + 16] == key:
+                return slot, True
+            slot += 1
+            if slot == capacity:
+                slot = 0
+        return -1, False
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        key = uuid_key(receipt_id)
+        if key is None:
+            return None
+        slot, found = self._find(key)
+        if not found:
+            return None
+        return self._POINTS.unpack_from(self._map, self._offset(slot) + 16)[0]
+
+    def put(self, receipt_id: str, points: int) -> None:
+        key = uuid_key(receipt_id)
+        if key is None:
+            raise ValueError(f"SharedMemoryStore only stores UUID receipt IDs, got {receipt_id!r}")
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._insert(key, points)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        keyed = []
+        for receipt_id, points in entries:
+            key = uuid_key(receipt_id)
+            if key is None:
+                raise ValueError(f"SharedMemoryStore only stores UUID receipt IDs, got {receipt_id!r}")
+            keyed.append((key, points))
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                # Refuse the whole batch up front rather than storing part of it
+                if len(self) + len(keyed) > self.max_receipts:
+                    raise StoreFull(self._full_message())
+                for key, points in keyed:
+                    self._insert(key, points)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    async def put_async(self, receipt_id: str, points: int) -> None:
+        # Reads take no lock, but a put waits on the file lock, which a large put_many in
+        # another worker can hold for a while: keep that wait off the event loop
+        await to_thread.run_sync(self.put, receipt_id, points)
+
+    def _insert(self, key: bytes, points: int) -> None:
+        slot, found = self._find(key)
+        offset = self._offset(slot)
+        if found:
+            self._POINTS.pack_into(self._map, offset + 16, points)
+            return
+        count = len(self)
+        if slot < 0 or count >= self.max_receipts:
+            raise StoreFull(self._full_message())
+        # Publish order matters for lock-free readers: contents first, state byte last
+        self._map[offset:offset + 16] = key
+        self._POINTS.pack_into(self._map, offset + 16, points)
+        self._map[offset + 24] = 1
+        struct.pack_into("<Q", self._map, 16, count + 1)
+
+    def _full_message(self) -> str:
+        return f"Shared receipt store {self.path} is full ({len(self)} of {self.max_receipts} receipts)"
+
+    def __len__(self) -> int:
+        return struct.unpack_from("<Q", self._map, 16)[0]
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
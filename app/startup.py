@@ -0,0 +1,172 @@
+"""Startup milestones and the startup-optimized mode for autoscaled workers.
+
+``StartupTimings`` records when the process started, when ``app.main`` finished importing,
+when the app was ready to serve and when the first request completed. They are served at
+``GET /startup`` and as ``receipts_startup_seconds`` metrics.
+
+With ``RECEIPTS_FAST_STARTUP`` the lifespan does the work that would otherwise land on the
+first requests before the worker reports ready:
+
+* ``warm_up`` runs every validator, scorer and response builder of the hot endpoints once,
+  including the validation error path, and starts the threadpool's first thread
+* ``cached_openapi`` loads the OpenAPI schema from a file written by an earlier start or by
+  ``python -m app.coldstart --write-openapi``; the file is rebuilt when the app's source or
+  the FastAPI and pydantic versions change
+
+Every worker imports this module, so it keeps to what serving needs; the cold-start report
+lives in ``app.coldstart``.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started, from /proc; None where that is unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields resume after its closing parenthesis
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+class StartupTimings:
+    """Startup milestones, in seconds since the process started (or since import began)."""
+
+    def __init__(self):
+        self._origin = time.perf_counter() - (process_age() or 0.0)
+        self.import_started = self._now()
+        self.imported: Optional[float] = None
+        self.ready: Optional[float] = None
+        self.first_request: Optional[float] = None
+        self.first_request_duration: Optional[float] = None
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def mark_imported(self) -> None:
+        self.imported = self._now()
+
+    def mark_ready(self) -> None:
+        self.ready = self._now()
+
+    def mark_first_request(self, duration: float) -> None:
+        if self.first_request is None:
+            self.first_request = self._now()
+            self.first_request_duration = duration
+
+    def milestones(self) -> Dict[str, float]:
+        """Seconds from process start to each milestone reached so far."""
+        reached = {"imported": self.imported, "ready": self.ready, "first_request": self.first_request}
+        return {name: seconds for name, seconds in reached.items() if seconds is not None}
+
+    def report(self) -> Dict[str, Optional[float]]:
+        return {
+            "interpreter_seconds": self.import_started,
+            "import_seconds": None if self.imported is None else self.imported - self.import_started,
+            "ready_seconds": self.ready,
+            "first_request_seconds": self.first_request,
+            "first_request_duration_seconds": self.first_request_duration,
+        }
+
+
+class FirstRequestMiddleware:
+    """ASGI middleware recording when the first HTTP request completes."""
+
+    def __init__(self, app, timings: StartupTimings):
+        self.app = app
+        self.timings = timings
+
+    async def __call__(self, scope, receive, send):
+        if self.timings.first_request is not None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.timings.mark_first_request(time.perf_counter() - start)
+
+
+EXAMPLE_BODY = (
+    b'{"retailer": "M&M Corner Market", "purchaseDate": "2022-01-01", "purchaseTime": "13:01",'
+    b' "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}], "total": "6.49"}'
+)
+
+
+async def warm_up() -> None:
+    """Runs the hot request paths once so their lazy initialization is not paid by a client."""
+    from anyio import to_thread
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import ValidationError
+
+    from app.batch import decode_batch, validate_entry
+    from app.dedupe import receipt_fingerprint
+    from app.fast_ingest import lean_points, parse_lean_receipt
+    from app.models import Receipt, new_receipt_id
+    from app.points_calculator import calculate_points
+    from app.points_engine import calculate_points_bulk
+    from app.responses import id_response, points_response
+
+    receipt = Receipt.model_validate_json(EXAMPLE_BODY)
+    points_response(calculate_points(receipt) + lean_points(parse_lean_receipt(EXAMPLE_BODY)))
+    calculate_points_bulk([receipt], use_numpy=False)
+    id_response(new_receipt_id())
+    receipt_fingerprint(receipt)
+    for entry, errors in decode_batch(b"[" + EXAMPLE_BODY + b"]", "application/json"):
+        validate_entry(entry)
+    for invalid in (b"{}", b'{"items": [{"price": "x"}]}'):
+        for parse in (parse_lean_receipt, Receipt.model_validate_json):
+            try:
+                parse(invalid)
+            except ValidationError as exc:
+                JSONResponse(status_code=400, content={"detail": "", "errors": jsonable_encoder(exc.errors())})
+    await to_thread.run_sync(lambda: None)
+
+
+def openapi_fingerprint() -> str:
+    """Changes whenever the app's source or the libraries that shape its schema change."""
+    import fastapi
+    import pydantic
+
+    digest = hashlib.sha256(f"{fastapi.__version__}:{pydantic.VERSION}".encode())
+    for name in sorted(os.listdir(APP_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(APP_DIR, name), "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def cached_openapi(app, path: str) -> dict:
+    """Installs the app's OpenAPI schema from ``path``, building and writing it there if stale."""
+    fingerprint = openapi_fingerprint()
+    schema = None
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") == fingerprint:
+            schema = cached["schema"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    if schema is None:
+        app.openapi_schema = None
+        schema = app.openapi()
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w") as f:
+                json.dump({"fingerprint": fingerprint, "schema": schema}, f)
+            os.replace(temporary, path)
+        except OSError:
+            pass  # A read-only filesystem only costs the next start a rebuild
+    # FastAPI serves /openapi.json from this attribute once it is set
+    app.openapi_schema = schema
+    return schema
@@ -1,2 +1,331 @@
-# Simple in-memory dictionary to store receipts
-receipts_db = {}
\ No newline at end of file
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from anyio import to_thread
+
+from app.config import Settings
+
+
+class StoreFull(RuntimeError):
+    """Raised when a fixed-capacity store has no room for another receipt."""
+
+
+class ReceiptStore(ABC):
+    """Maps receipt IDs to the points awarded for them.
+
+    Implementations must be safe to call from FastAPI's threadpool. Async handlers use the
+    ``*_async`` methods, which call in-memory stores inline and move stores that can block on
+    I/O (``blocking = True``) to a worker thread. Stores that hold a fixed number of receipts
+    (``fixed_capacity = True``) raise ``StoreFull`` once they cannot take another.
+    """
+
+    blocking = False
+    fixed_capacity = False
+
+    @abstractmethod
+    def get(self, receipt_id: str) -> Optional[int]:
+        """Returns the points stored for ``receipt_id``, or None if it is unknown."""
+
+    @abstractmethod
+    def put(self, receipt_id: str, points: int) -> None:
+        """Stores the points for ``receipt_id``."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        """Stores several ``(receipt_id, points)`` pairs."""
+        for receipt_id, points in entries:
+            self.put(receipt_id, points)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        """Returns the points for each of ``receipt_ids`` in order, None where unknown."""
+        return [self.get(receipt_id) for receipt_id in receipt_ids]
+
+    def __contains__(self, receipt_id: str) -> bool:
+        return self.get(receipt_id) is not None
+
+    async def get_async(self, receipt_id: str) -> Optional[int]:
+        if self.blocking:
+            return await to_thread.run_sync(self.get, receipt_id)
+        return self.get(receipt_id)
+
+    async def get_many_async(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        if self.blocking:
+            return await to_thread.run_sync(self.get_many, receipt_ids)
+        return self.get_many(receipt_ids)
+
+    async def put_async(self, receipt_id: str, points: int) -> None:
+        if self.blocking:
+            await to_thread.run_sync(self.put, receipt_id, points)
+        else:
+            self.put(receipt_id, points)
+
+    def flush(self) -> None:
+        """Makes buffered writes durable. A no-op for in-memory stores."""
+
+    def close(self) -> None:
+        self.flush()
+
+
+class DictStore(ReceiptStore):
+    """Simple in-memory dictionary to store receipts."""
+
+    def __init__(self, data: Optional[Dict[str, int]] = None):
+        self.data = {} if data is None else data
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        return self.data.get(receipt_id)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        return list(map(self.data.get, receipt_ids))
+
+    def put(self, receipt_id: str, points: int) -> None:
+        self.data[receipt_id] = points
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        self.data.update(entries)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class ShardedStore(ReceiptStore):
+    """In-memory store split into lock-striped shards so concurrent writers rarely contend."""
+
+    def __init__(self, shards: int = 64):
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _shard(self, receipt_id: str) -> int:
+        return hash(receipt_id) % len(self._shards)
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        index = self._shard(receipt_id)
+        with self._locks[index]:
+            return self._shards[index].get(receipt_id)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        # Group by shard so each lock is taken once per call
+        grouped = {}
+        for position, receipt_id in enumerate(receipt_ids):
+            grouped.setdefault(self._shard(receipt_id), []).append(position)
+        results = [None] * len(receipt_ids)
+        for index, positions in grouped.items():
+            shard = self._shards[index]
+            with self._locks[index]:
+                for position in positions:
+                    results[position] = shard.get(receipt_ids[position])
+        return results
+
+    def put(self, receipt_id: str, points: int) -> None:
+        index = self._shard(receipt_id)
+        with self._locks[index]:
+            self._shards[index][receipt_id] = points
+
+    def put_many(self, entries: Iterable[Tuple[str, int]]) -> None:
+        # Group by shard so each lock is taken once per call
+        grouped = {}
+        for receipt_id, points in entries:
+            grouped.setdefault(self._shard(receipt_id), []).append((receipt_id, points))
+        for index, shard_entries in grouped.items():
+            with self._locks[index]:
+                self._shards[index].update(shard_entries)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+def uuid_key(receipt_id: str) -> Optional[bytes]:
+    """Returns the 16-byte form of a canonical UUID string, or None for any other ID."""
+    try:
+        parsed = UUID(receipt_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    # Other spellings of the same UUID (braces, upper case, no dashes) are different IDs
+    if str(parsed) != receipt_id:
+        return None
+    return parsed.bytes
+
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def uuid_slot(key: bytes, capacity: int) -> int:
+    """Maps a 16-byte UUID key to its home slot in a table of ``capacity`` slots.
+
+    Only the last 8 bytes are hashed; they are random in every UUID version we mint. The
+    result is deterministic, so every process sharing a table agrees on it.
+    """
+    mixed = (int.from_bytes(key[8:], "little") * _GOLDEN) & _MASK64
+    return (mixed * capacity) >> 64  # Maps the hash onto [0, capacity) without a modulo
+
+
+class CompactStore(ReceiptStore):
+    """Memory-compact store keyed by 16-byte binary UUIDs.
+
+    Keys live in one flat ``bytearray`` and points in an ``array('q')``, addressed by a
+    linear-probing hash table, so an entry costs a few dozen bytes instead of a string
+    object, an int object and a dict slot. Only canonical UUID strings can be stored.
+
+    The table grows incrementally: once it is full enough a larger one is allocated, and
+    each write moves the next ``_MIGRATE_SLOTS`` slots of the old table into it. Until the
+    old table is empty, lookups that miss the new table fall back to it. No single write
+    rehashes the whole table, so a put never stalls the event loop that calls it inline.
+    """
+
+    _EMPTY = bytes(16)  # The nil UUID marks free slots and is never minted
+    _MAX_LOAD = 0.8
+    _GROWTH = 1.5
+    # Old slots moved per write while growing. The old table is at most 80% full and the new
+    # one 1.5 times its size, so the move finishes long before the new table needs to grow
+    _MIGRATE_SLOTS = 64
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._count = 0  # Distinct keys across both tables
+        self._old = None  # (keys, values, capacity, next slot to move) while growing
+        self._allocate(max(capacity, 8))
+
+    def _allocate(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._keys = bytearray(16 * capacity)
+        self._values = array("q", bytes(8 * capacity))
+        self._filled = 0  # Keys in this table
+
+    def _probe(self, keys: bytearray, capacity: int, key: bytes) -> int:
+        """Returns the slot of ``keys`` holding ``key``, or the free slot where it would go."""
+        slot = uuid_slot(key, capacity)
+        while True:
+            current = keys[slot * 16:slot * 16 + 16]
+            if current == key or current == self._EMPTY:
+                return slot
+            slot += 1
+            if slot == capacity:
+                slot = 0
+
+    def _slot(self, key: bytes) -> int:
+        return self._probe(self._keys, self._capacity, key)
+
+    def _lookup(self, key: bytes) -> Optional[int]:
+        slot = self._slot(key)
+        if self._keys[slot * 16:slot * 16 + 16] == key:
+            return self._values[slot]
+        if self._old is not None:
+            keys, values, capacity, _ = self._old
+            slot = self._probe(keys, capacity, key)
+            if keys[slot * 16:slot * 16 + 16] == key:
+                return values[slot]
+        return None
+
+    def get(self, receipt_id: str) -> Optional[int]:
+        key = uuid_key(receipt_id)
+        if key is None or key == self._EMPTY:
+            return None
+        with self._lock:
+            return self._lookup(key)
+
+    def get_many(self, receipt_ids: Sequence[str]) -> List[Optional[int]]:
+        keys = [uuid_key(receipt_id) for receipt_id in receipt_ids]
+        with self._lock:
+            return [None if key is None or key == self._EMPTY else self._lookup(key) for key in keys]
+
+    def put(self, receipt_id: str, points: int) -> None:
+        key = uuid_key(receipt_id)
+        if key is None or key == self._EMPTY:
+            raise ValueError(f"CompactStore only stores UUID receipt IDs, got {receipt_id!r}")
+        with self._lock:
+            self._insert(key, points)
+
+    def _insert(self, key: bytes, points: int) -> None:
+        if self._old is None and self._filled + 1 > self._capacity * self._MAX_LOAD:
+            self._old = (self._keys, self._values, self._capacity, 0)
+            self._allocate(int(self._capacity * self._GROWTH))
+        slot = self._slot(key)
+        if self._keys[slot * 16:slot * 16 + 16] == self._EMPTY:
+            if self._old is None or self._lookup(key) is None:
+                self._count += 1
+            self._keys[slot * 16:slot * 16 + 16] = key
+            self._filled += 1
+        self._values[slot] = points
+        if self._old is not None:
+            self._migrate(self._MIGRATE_SLOTS)
+
+    def _migrate(self, slots: int) -> None:
+        """Moves the next ``slots`` slots of the old table into the new one."""
+        old_keys, old_values, old_capacity, start = self._old
+        stop = min(start + slots, old_capacity)
+        keys, values = self._keys, self._values
+        for old_slot in range(start, stop):
+            key = bytes(old_keys[old_slot * 16:old_slot * 16 + 16])
+            if key == self._EMPTY:
+                continue
+            slot = self._slot(key)
+            # A key written since the growth started already has its newer points here
+            if keys[slot * 16:slot * 16 + 16] == self._EMPTY:
+                keys[slot * 16:slot * 16 + 16] = key
+                values[slot] = old_values[old_slot]
+                self._filled += 1
+        self._old = None if stop == old_capacity else (old_keys, old_values, old_capacity, stop)
+
+    def _iter_raw(self, keys=None, values=None, capacity=None) -> Iterator[Tuple[bytes, int]]:
+        if keys is None:
+            keys, values, capacity = self._keys, self._values, self._capacity
+        for slot in range(capacity):
+            key = bytes(keys[slot * 16:slot * 16 + 16])
+            if key != self._EMPTY:
+                yield key, values[slot]
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Yields ``(receipt_id, points)`` for every stored receipt, in no particular order."""
+        with self._lock:
+            entries = list(self._iter_raw())
+            if self._old is not None:
+                keys, values, capacity, _ = self._old
+                moved = set(key for key, _ in entries)
+                entries.extend(entry for entry in self._iter_raw(keys, values, capacity) if entry[0] not in moved)
+        for key, points in entries:
+            yield str(UUID(bytes=key)), points
+
+    def __len__(self) -> int:
+        return self._count
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the table's key and value buffers, the old table's too while growing."""
+        size = len(self._keys) + self._values.itemsize * len(self._values)
+        if self._old is not None:
+            size += len(self._old[0]) + self._old[1].itemsize * len(self._old[1])
+        return size
+
+    def bytes_per_entry(self) -> float:
+        return self.memory_bytes() / max(self._count, 1)
+
+
+def create_store(settings: Settings) -> ReceiptStore:
+    """Builds the storage backend selected by ``settings.store_backend``."""
+    backend = settings.store_backend.lower()
+    if backend == "dict":
+        return DictStore()
+    if backend == "sharded":
+        return ShardedStore(settings.store_shards)
+    if backend == "compact":
+        return CompactStore()
+    # The other backends live in their own modules, imported only when selected
+    if backend == "shared":
+        from app.shared_store import SharedMemoryStore
+
+        return SharedMemoryStore(settings.shm_path, settings.shm_capacity)
+    if backend == "wal":
+        from app.wal import LogStructuredStore
+
+        return LogStructuredStore(settings.wal_dir, settings.wal_fsync_interval, settings.wal_snapshot_every)
+    if backend == "sqlite":
+        from app.sqlite_store import SQLiteStore
+
+        return SQLiteStore(settings.store_path, settings.sqlite_batch_size, settings.sqlite_flush_interval)
+    raise ValueError(f"Unknown storage backend: {settings.store_backend!r}")
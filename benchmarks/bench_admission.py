@@ -0,0 +1,125 @@
+"""Load test of admission control: latency and shedding at 2-5x the ingest capacity.
+
+Run with ``python -m benchmarks.bench_admission [--duration 5] [--overload 2 5]``. Requests
+are sent in-process over ``httpx.ASGITransport``. The ingest capacity is measured first with
+a closed-loop burst of receipts. Then, for each overload factor, an open-loop arrival process
+offers that multiple of the capacity for ``--duration`` seconds, 80% ingest and 20% points
+lookups, against the app with and without ``AdmissionMiddleware``.
+
+Without admission control every request is let in and latency grows for as long as the
+overload lasts. With it, p99 of the admitted requests stays near the wait budget plus the
+service time, the excess is shed with 503, and lookups keep their own budget.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+import app.main as app_main
+from app.admission import AdmissionMiddleware, Budget
+from app.storage import DictStore
+from benchmarks.bench_async import percentile
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+
+async def capacity(app, bodies) -> float:
+    """Receipts per second a closed loop of 16 clients achieves."""
+    pending = iter(bodies)
+
+    async def worker(client):
+        for body in pending:
+            await client.post("/receipts/process", content=body, headers={"Content-Type": "application/json"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(16)))
+    return len(bodies) / (time.perf_counter() - start)
+
+
+async def open_loop(app, bodies, ids, rate, duration, seed):
+    """Offers ``rate`` requests per second for ``duration`` seconds; returns (kind, status, latency)."""
+    rng = random.Random(seed)
+    results = []
+
+    async def request(client, kind):
+        start = time.perf_counter()
+        if kind == "ingest":
+            response = await client.post(
+                "/receipts/process", content=rng.choice(bodies), headers={"Content-Type": "application/json"}
+            )
+        else:
+            response = await client.get(f"/receipts/{rng.choice(ids)}/points")
+        results.append((kind, response.status_code, time.perf_counter() - start))
+
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=None) as client:
+        tasks = []
+        start = time.perf_counter()
+        sent = 0
+        while time.perf_counter() - start < duration:
+            # Send every arrival that is due, then yield to the requests in flight
+            due = int((time.perf_counter() - start) * rate)
+            for _ in range(due - sent):
+                tasks.append(asyncio.ensure_future(request(client, "ingest" if rng.random() < 0.8 else "read")))
+            sent = max(sent, due)
+            await asyncio.sleep(0.001)
+        await asyncio.gather(*tasks)
+    return results
+
+
+def summarize(results, kind):
+    ok = [latency for k, status, latency in results if k == kind and status < 500]
+    shed = sum(1 for k, status, _ in results if k == kind and status == 503)
+    total = sum(1 for k, _, _ in results if k == kind)
+    return {
+        f"{kind}_p50_ms": round(percentile(ok, 0.5) * 1000, 1) if ok else None,
+        f"{kind}_p99_ms": round(percentile(ok, 0.99) * 1000, 1) if ok else None,
+        f"{kind}_shed_pct": round(100 * shed / total, 1) if total else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--overload", type=float, nargs="+", default=[2.0, 5.0])
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="large")
+    parser.add_argument("--concurrency", type=int, default=8, help="admitted ingest requests")
+    parser.add_argument("--max-wait", type=float, default=0.25, help="ingest queue-wait budget in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bodies = [json.dumps(receipt).encode() for receipt in generate_receipts(200, args.seed, shape=SHAPES[args.shape])]
+    original = app_main.store
+    try:
+        app_main.store = DictStore()
+        rate = asyncio.run(capacity(app_main.app, bodies))
+        ids = list(app_main.store.data)
+        rows = []
+        for factor in args.overload:
+            for admission in (False, True):
+                app = app_main.app
+                if admission:
+                    budgets = {
+                        "ingest": Budget("ingest", args.concurrency, args.concurrency * 4, args.max_wait),
+                        "read": Budget("read", 256, 1024, args.max_wait),
+                    }
+                    app = AdmissionMiddleware(app_main.app, budgets)
+                results = asyncio.run(open_loop(app, bodies, ids, rate * factor, args.duration, args.seed))
+                rows.append({
+                    "overload": factor,
+                    "admission": admission,
+                    **summarize(results, "ingest"),
+                    **summarize(results, "read"),
+                })
+    finally:
+        app_main.store = original
+    print(json.dumps({"capacity_rps": round(rate, 1), "runs": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
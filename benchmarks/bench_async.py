@@ -0,0 +1,89 @@
+"""Compares request latency of the async handlers with threadpool-dispatched sync handlers.
+
+Run with ``python -m benchmarks.bench_async [--concurrency 200] [--requests 5000]``. Both apps
+are driven in-process through ``httpx.ASGITransport``, so the difference is the dispatch
+cost: sync handlers hop to anyio's worker threadpool (40 threads by default) for every call
+and queue behind it. Async requests that never await run to completion once started, so
+their latency here excludes the socket-level queueing a real server would add.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from app.main import app as async_app
+from app.models import Receipt, ReceiptResponse
+from app.points_calculator import calculate_points
+from app.storage import DictStore
+from benchmarks.synthetic import generate_receipts
+
+
+def build_sync_app() -> FastAPI:
+    """The original handlers: plain ``def`` functions run on the threadpool."""
+    sync_app = FastAPI()
+    store = DictStore()
+
+    @sync_app.post("/receipts/process")
+    def process_receipt(receipt: Receipt):
+        receipt_response = ReceiptResponse()
+        store.put(receipt_response.id, calculate_points(receipt))
+        return {"id": receipt_response.id}
+
+    @sync_app.get("/receipts/{id}/points")
+    def get_points(id: str):
+        points = store.get(id)
+        if points is None:
+            raise HTTPException(status_code=404, detail="No receipt found for that ID.")
+        return {"points": points}
+
+    return sync_app
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def drive(app, receipts, concurrency):
+    """Posts every receipt and reads its points back, ``concurrency`` requests at a time."""
+    latencies = []
+    queue = asyncio.Queue()
+    for receipt in receipts:
+        queue.put_nowait(receipt)
+
+    async def worker(client):
+        while not queue.empty():
+            receipt = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post("/receipts/process", json=receipt)
+            latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            await client.get(f"/receipts/{response.json()['id']}/points")
+            latencies.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000, help="receipts posted per app")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    receipts = generate_receipts(args.requests, args.seed)
+    print(f"{'handlers':<10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for label, app in [("sync", build_sync_app()), ("async", async_app)]:
+        throughput, p50, p99 = asyncio.run(drive(app, receipts, args.concurrency))
+        print(f"{label:<10} {throughput:>10,.0f} {p50 * 1e3:>10.2f} {p99 * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compares POST latency during an ingest burst with eager and deferred scoring.
+
+Run with ``python -m benchmarks.bench_deferred [--requests 5000] [--concurrency 100]``. A
+burst of receipts is posted in-process over ``httpx.ASGITransport`` against the app with
+its store swapped for each mode:
+
+* ``eager`` - points are computed before the ID is returned
+* ``deferred`` - receipts are parked in a ``DeferredStore`` and scored by a background
+  thread; the last column is how long the backlog took to drain after the burst
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+import app.main as app_main
+from app.deferred import DeferredStore
+from app.storage import DictStore
+from benchmarks.bench_async import percentile
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+
+async def burst(bodies, concurrency):
+    latencies = []
+    pending = iter(bodies)
+
+    async def worker(client):
+        for body in pending:
+            start = time.perf_counter()
+            await client.post("/receipts/process", content=body, headers={"Content-Type": "application/json"})
+            latencies.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return latencies
+
+
+def run(store, bodies, concurrency):
+    app_main.store = store
+    latencies = asyncio.run(burst(bodies, concurrency))
+    start = time.perf_counter()
+    while isinstance(store, DeferredStore) and store.pending:
+        time.sleep(0.001)
+    return latencies, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="typical")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bodies = [json.dumps(receipt).encode() for receipt in generate_receipts(args.requests, args.seed, shape=SHAPES[args.shape])]
+    original = app_main.store
+    try:
+        run(DictStore(), bodies[:200], args.concurrency)  # Warm up
+        print(f"{'scoring':<10} {'p50 ms':>10} {'p99 ms':>10} {'drain s':>10}")
+        for label, store in [
+            ("eager", DictStore()),
+            ("deferred", DeferredStore(DictStore(), max_queue=len(bodies))),
+        ]:
+            latencies, drain = run(store, bodies, args.concurrency)
+            print(
+                f"{label:<10} {percentile(latencies, 0.5) * 1e3:>10.2f} {percentile(latencies, 0.99) * 1e3:>10.2f}"
+                f" {drain:>10.3f}"
+            )
+            store.close()
+    finally:
+        app_main.store = original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compares the standard and fast ingest paths for ``POST /receipts/process``.
+
+Run with ``python -m benchmarks.bench_fast_ingest [--count 2000] [--shape typical]``.
+
+For each path the parse, validate and score work done per request is measured on its own:
+
+* standard - ``json.loads``, ``Receipt.model_validate`` and ``calculate_points`` (Decimal)
+* fast - ``parse_lean_receipt`` straight from the bytes and ``lean_points`` on integer cents
+
+CPU time is process time per receipt, best of ``--repeat`` runs. Memory is measured with
+``tracemalloc`` while every validated receipt is kept alive: the peak covers the temporary
+dicts and strings the path allocates, the retained figure is the size of the receipts it
+leaves behind. The last column is a full in-process request through the app.
+"""
+import argparse
+import dataclasses
+import json
+import time
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+import app.main as app_main
+from app.fast_ingest import lean_points, parse_lean_receipt
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+
+def standard_path(body: bytes):
+    receipt = Receipt.model_validate(json.loads(body))
+    return receipt, calculate_points(receipt)
+
+
+def fast_path(body: bytes):
+    receipt = parse_lean_receipt(body)
+    return receipt, lean_points(receipt)
+
+
+def cpu_per_receipt(path, bodies, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.process_time()
+        for body in bodies:
+            path(body)
+        runs.append((time.process_time() - start) / len(bodies))
+    return min(runs)
+
+
+def memory_per_receipt(path, bodies):
+    """Returns the peak and retained heap bytes per receipt while processing ``bodies``."""
+    tracemalloc.start()
+    try:
+        kept = [path(body) for body in bodies]
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return peak / len(bodies), retained / len(bodies)
+
+
+def request_latency(bodies, fast_ingest, repeat):
+    """Best seconds per full ``POST /receipts/process`` with fast ingest on or off."""
+    original = app_main.settings
+    app_main.settings = dataclasses.replace(original, fast_ingest=fast_ingest)
+    try:
+        client = TestClient(app_main.app)
+        headers = {"Content-Type": "application/json"}
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for body in bodies:
+                client.post("/receipts/process", content=body, headers=headers)
+            runs.append((time.perf_counter() - start) / len(bodies))
+        return min(runs)
+    finally:
+        app_main.settings = original
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="typical")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bodies = [json.dumps(receipt).encode() for receipt in generate_receipts(args.count, args.seed, shape=SHAPES[args.shape])]
+    e2e_bodies = bodies[: max(1, args.count // 4)]
+    for path in (standard_path, fast_path):
+        path(bodies[0])  # Build lazy validators before measuring
+
+    print(f"{'path':<10} {'cpu us':>10} {'peak B':>10} {'kept B':>10} {'request us':>12}")
+    for label, path, fast_ingest in [("standard", standard_path, False), ("fast", fast_path, True)]:
+        cpu = cpu_per_receipt(path, bodies, args.repeat)
+        peak, retained = memory_per_receipt(path, bodies)
+        request = request_latency(e2e_bodies, fast_ingest, args.repeat)
+        print(f"{label:<10} {cpu * 1e6:>10.1f} {peak:>10,.0f} {retained:>10,.0f} {request * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Shows that the cost of a page from ``ReceiptIndex`` does not grow with the number of receipts.
+
+Run with ``python -m benchmarks.bench_index [--sizes 10000 100000 1000000] [--limit 100]``.
+For each size an index is filled with seeded receipt metadata, then pages are fetched from
+random cursors through each index. A full scan that filters every row, which is what a
+listing costs without the indexes, is timed alongside for comparison.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import date, time as time_of_day, timedelta
+from types import SimpleNamespace
+
+from app.index import ReceiptIndex
+
+RETAILERS = ["Target", "Walgreens", "M&M Corner Market", "Costco", "Kroger", "Safeway", "Aldi", "Trader Joes"]
+
+
+def fill(size: int, seed: int) -> ReceiptIndex:
+    rng = random.Random(seed)
+    index = ReceiptIndex()
+    first_day = date(2020, 1, 1)
+    index.add_many(
+        (
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            SimpleNamespace(
+                retailer=rng.choice(RETAILERS),
+                purchaseDate=first_day + timedelta(days=rng.randrange(1500)),
+                purchaseTime=time_of_day(rng.randrange(24), rng.randrange(60)),
+            ),
+        )
+        for _ in range(size)
+    )
+    return index
+
+
+def time_pages(fetch, pages: int, limit: int, rng: random.Random) -> float:
+    """Microseconds per page, each fetched from the cursor of a page at a random offset."""
+    cursors = []
+    _, cursor = fetch(limit, None)
+    while cursor is not None and len(cursors) < 50:
+        cursors.append(cursor)
+        for _ in range(rng.randrange(1, 20)):
+            _, cursor = fetch(limit, cursor)
+            if cursor is None:
+                break
+    cursors = cursors or [None]
+    start = time.perf_counter()
+    for _ in range(pages):
+        fetch(limit, rng.choice(cursors))
+    return (time.perf_counter() - start) / pages * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        index = fill(size, args.seed)
+        rng = random.Random(args.seed)
+        start_at, end_at = (date(2021, 1, 1), time_of_day.min), (date(2021, 12, 31), time_of_day.max)
+        row = {
+            "receipts": size,
+            "retailer_page_us": time_pages(lambda n, c: index.by_retailer("Target", n, c), args.pages, args.limit, rng),
+            "date_range_page_us": time_pages(
+                lambda n, c: index.by_datetime(start_at, end_at, n, c), args.pages, args.limit, rng
+            ),
+            "time_range_page_us": time_pages(
+                lambda n, c: index.by_time(time_of_day(14), time_of_day(16), n, c), args.pages, args.limit, rng
+            ),
+        }
+        scan_start = time.perf_counter()
+        matches = [row for row, retailer in enumerate(index._retailers) if retailer == "Target"][:args.limit]
+        row["full_scan_page_us"] = (time.perf_counter() - scan_start) * 1e6
+        results.append({key: round(value, 1) if isinstance(value, float) else value for key, value in row.items()})
+        del matches
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
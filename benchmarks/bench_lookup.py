@@ -0,0 +1,69 @@
+"""Compares looking up many receipts one GET at a time with the bulk points endpoint.
+
+Run with ``python -m benchmarks.bench_lookup [--ids 5000]``. Requests go through the app
+in-process over ``httpx.ASGITransport``:
+
+* ``get`` - one ``GET /receipts/{id}/points`` per ID, as the loyalty service does today
+* ``bulk`` - one ``POST /receipts/points`` with a JSON list of IDs
+* ``stream`` - the same lookup sent and answered as NDJSON
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.main import app, store
+from app.models import new_receipt_id
+
+
+async def lookup_each(client, ids):
+    for receipt_id in ids:
+        await client.get(f"/receipts/{receipt_id}/points")
+
+
+async def lookup_bulk(client, ids):
+    await client.post("/receipts/points", json={"ids": ids})
+
+
+async def lookup_stream(client, ids):
+    body = "".join(receipt_id + "\n" for receipt_id in ids)
+    async with client.stream(
+        "POST", "/receipts/points", content=body, headers={"Content-Type": "application/x-ndjson"}
+    ) as response:
+        async for _ in response.aiter_lines():
+            pass
+
+
+async def run(ids, repeat):
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, lookup in [("get", lookup_each), ("bulk", lookup_bulk), ("stream", lookup_stream)]:
+            await lookup(client, ids[:100])  # Warm up
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await lookup(client, ids)
+                runs.append(time.perf_counter() - start)
+            results[label] = min(runs)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=5000, help="receipts looked up per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    ids = [new_receipt_id() for _ in range(args.ids)]
+    store.put_many((receipt_id, points) for points, receipt_id in enumerate(ids))
+
+    results = asyncio.run(run(ids, args.repeat))
+    print(f"{'lookup':<8} {'seconds':>10} {'us/id':>10} {'speedup':>10}")
+    for label, seconds in results.items():
+        print(f"{label:<8} {seconds:>10.3f} {seconds / len(ids) * 1e6:>10.2f} {results['get'] / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Compares heap usage per receipt of the dict store and the compact store.
+
+Run with ``python -m benchmarks.bench_memory [--receipts N]``.
+"""
+import argparse
+import random
+import tracemalloc
+import uuid
+
+from app.storage import CompactStore, DictStore
+
+
+def measure(store, count, seed):
+    rng = random.Random(seed)
+    tracemalloc.start()
+    try:
+        for _ in range(count):
+            store.put(str(uuid.uuid4()), rng.randint(0, 500))
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--receipts", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dict_bytes = measure(DictStore(), args.receipts, args.seed)
+    compact = CompactStore()
+    compact_bytes = measure(compact, args.receipts, args.seed)
+
+    print(f"{'store':<10} {'heap bytes/entry':>18}")
+    print(f"{'dict':<10} {dict_bytes / args.receipts:>18.1f}")
+    print(f"{'compact':<10} {compact_bytes / args.receipts:>18.1f}  (table reports {compact.bytes_per_entry():.1f})")
+    print(f"compact store is {dict_bytes / compact_bytes:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
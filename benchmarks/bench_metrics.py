@@ -0,0 +1,66 @@
+"""Measures the request overhead of the metrics middleware and stage timers.
+
+Run with ``python -m benchmarks.bench_metrics [--requests 5000] [--rounds 3]``. The app reads
+``RECEIPTS_METRICS_ENABLED`` at import time, so each configuration runs in a fresh child
+process; rounds alternate between the two to spread machine noise evenly, and the best
+round of each is reported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+
+def run_child(requests: int, concurrency: int, seed: int) -> None:
+    from app.main import app
+    from benchmarks.bench_async import drive
+    from benchmarks.synthetic import generate_receipts
+
+    receipts = generate_receipts(requests, seed)
+    asyncio.run(drive(app, receipts[: requests // 10], concurrency))  # Warm up
+    throughput, p50, p99 = asyncio.run(drive(app, receipts, concurrency))
+    print(json.dumps({"throughput": throughput, "p50": p50, "p99": p99}))
+
+
+def run_config(enabled: bool, args) -> dict:
+    env = dict(os.environ, RECEIPTS_METRICS_ENABLED="1" if enabled else "0")
+    command = [
+        sys.executable, "-m", "benchmarks.bench_metrics", "--child",
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--seed", str(args.seed),
+    ]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000, help="receipts posted per round")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.requests, args.concurrency, args.seed)
+        return
+
+    best = {}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            result = run_config(enabled, args)
+            if enabled not in best or result["throughput"] > best[enabled]["throughput"]:
+                best[enabled] = result
+
+    print(f"{'metrics':<10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for enabled, label in [(False, "off"), (True, "on")]:
+        result = best[enabled]
+        print(f"{label:<10} {result['throughput']:>10,.0f} {result['p50'] * 1e3:>10.3f} {result['p99'] * 1e3:>10.3f}")
+    overhead = best[False]["throughput"] / best[True]["throughput"] - 1
+    print(f"\noverhead per request: {overhead:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compares scalar ``calculate_points`` with the columnar bulk engine.
+
+Run with ``python -m benchmarks.bench_points_engine [--receipts N]``.
+"""
+import argparse
+import time
+
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from app.points_engine import ReceiptColumns, np, score_columns
+from benchmarks.synthetic import generate_receipts
+
+
+def measure(label, func, count, repeat):
+    best = min(_timed(func) for _ in range(repeat))
+    print(f"{label:<24} {count / best:>14,.0f} receipts/s")
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--receipts", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    receipts = [Receipt.model_validate(data) for data in generate_receipts(args.receipts, args.seed)]
+    columns = ReceiptColumns.from_receipts(receipts)
+
+    measure("scalar", lambda: [calculate_points(r) for r in receipts], len(receipts), args.repeat)
+    measure("columns (build only)", lambda: ReceiptColumns.from_receipts(receipts), len(receipts), args.repeat)
+    measure("bulk python", lambda: score_columns(columns, use_numpy=False), len(receipts), args.repeat)
+    if np is not None:
+        measure("bulk numpy", lambda: score_columns(columns, use_numpy=True), len(receipts), args.repeat)
+        measure(
+            "bulk numpy + build",
+            lambda: score_columns(ReceiptColumns.from_receipts(receipts), use_numpy=True),
+            len(receipts),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measures process-pool scoring of very large receipts and batches.
+
+Run with ``python -m benchmarks.bench_pool [--receipts 200] [--items 2000]``. Two parts:
+
+* scaling - a batch of large receipts scored in-process (``calculate_points_bulk``) and by a
+  ``ScoringExecutor`` pool of 1, 2, 4, ... workers up to the CPU count; pool start-up is
+  excluded. Speedup is relative to in-process scoring, so it only exceeds 1 with several cores.
+* event loop - the longest stall of a 1 ms asyncio ticker while single huge receipts are
+  scored on the threadpool (which still holds the GIL) versus in the pool. This is what other
+  requests served by the same process wait for.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.executor import ScoringExecutor
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from app.points_engine import calculate_points_bulk
+from benchmarks.synthetic import Shape, generate_receipts
+
+
+def large_receipts(count: int, items: int, seed: int):
+    shape = Shape(max_items=items, max_words=6)
+    receipts = []
+    for data in generate_receipts(count, seed, shape=shape):
+        data["items"] = (data["items"] * items)[:items]  # Exactly ``items`` items each
+        receipts.append(Receipt.model_validate(data))
+    return receipts
+
+
+def best_time(func, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return min(runs)
+
+
+async def max_stall(score, receipts):
+    """Scores ``receipts`` one at a time while measuring the longest gap between 1 ms ticks."""
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall = max(stall, now - last - 0.001)
+            last = now
+
+    task = asyncio.ensure_future(ticker())
+    for receipt in receipts:
+        await score(receipt)
+    done = True
+    await task
+    return stall
+
+
+def worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=200, help="receipts per batch")
+    parser.add_argument("--items", type=int, default=2000, help="items per receipt")
+    parser.add_argument("--chunk-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    receipts = large_receipts(args.receipts, args.items, args.seed)
+    print(f"batch of {args.receipts} receipts x {args.items} items, {os.cpu_count()} CPUs")
+    inline = best_time(lambda: calculate_points_bulk(receipts), args.repeat)
+    print(f"{'scoring':<12} {'seconds':>10} {'receipts/s':>12} {'speedup':>8}")
+    print(f"{'in-process':<12} {inline:>10.3f} {len(receipts) / inline:>12,.0f} {1:>7.2f}x")
+    for workers in worker_counts():
+        executor = ScoringExecutor(workers, min_batch=1, chunk_size=args.chunk_size)
+        executor.score_bulk(receipts[: workers * args.chunk_size])  # Start the workers
+        seconds = best_time(lambda: executor.score_bulk(receipts), args.repeat)
+        executor.close()
+        label = f"pool x{workers}"
+        print(f"{label:<12} {seconds:>10.3f} {len(receipts) / seconds:>12,.0f} {inline / seconds:>7.2f}x")
+
+    huge = large_receipts(5, args.items * 10, args.seed)
+    executor = ScoringExecutor(1, min_items=1)
+    asyncio.run(executor.score_async(huge[0]))  # Start the worker
+    threadpool_stall = asyncio.run(max_stall(lambda receipt: run_in_threadpool(calculate_points, receipt), huge))
+    pool_stall = asyncio.run(max_stall(executor.score_async, huge))
+    executor.close()
+    print(f"\nlongest event loop stall scoring {len(huge)} receipts x {args.items * 10} items:")
+    print(f"  threadpool {threadpool_stall * 1e3:8.2f} ms")
+    print(f"  pool       {pool_stall * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measures the cost of ``ProfilingMiddleware`` on ``POST /receipts/process``.
+
+Run with ``python -m benchmarks.bench_profiling [--requests 2000] [--shape large]``. The
+service app is driven straight through the ASGI interface, with no middleware and then with
+profiling off (installed but not selecting anything), on a 1% sample and on every request.
+The slow threshold is set out of reach, so the numbers show the profiling overhead and not
+the disk writes of captures.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from app.main import app as service_app
+from app.profiling import ProfileRing, ProfilingMiddleware
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+
+async def asgi_post(app, path: str, body: bytes) -> int:
+    """Sends one POST through ``app`` and returns the response status."""
+    status = 0
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def time_requests(app, bodies, repeat):
+    for body in bodies[:50]:
+        assert await asgi_post(app, "/receipts/process", body) == 200  # Warm up
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in bodies:
+            await asgi_post(app, "/receipts/process", body)
+        runs.append((time.perf_counter() - start) / len(bodies))
+    return min(runs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="typical")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bodies = [json.dumps(r).encode() for r in generate_receipts(args.requests, args.seed, shape=SHAPES[args.shape])]
+    with tempfile.TemporaryDirectory() as directory:
+        ring = ProfileRing(directory, max_entries=10)
+        apps = [
+            ("none", service_app),
+            ("off", ProfilingMiddleware(service_app, ring, slow_seconds=3600)),
+            ("sample 1%", ProfilingMiddleware(service_app, ring, sample_rate=0.01, slow_seconds=3600)),
+            ("all", ProfilingMiddleware(service_app, ring, profile_all=True, slow_seconds=3600)),
+        ]
+        print(f"{'profiling':<10} {'us/request':>12} {'overhead':>9}")
+        baseline = None
+        for label, app in apps:
+            seconds = asyncio.run(time_requests(app, bodies, args.repeat))
+            baseline = baseline or seconds
+            print(f"{label:<10} {seconds * 1e6:>12.1f} {seconds / baseline - 1:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
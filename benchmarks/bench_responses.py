@@ -0,0 +1,101 @@
+"""Measures the response-layer cost of ``GET /receipts/{id}/points``.
+
+Run with ``python -m benchmarks.bench_responses [--requests 20000]``. Two minimal apps share
+one store and differ only in how the handler returns its result:
+
+* ``model`` - returns ``{"points": ...}`` and lets FastAPI validate it against
+  ``PointsResponse`` and serialize it through ``jsonable_encoder`` (the previous behaviour)
+* ``bytes`` - returns ``points_response``, written directly as bytes
+
+Requests are driven straight through the ASGI interface, without an HTTP client, so the
+per-request difference is the response handling. The service app, with its metrics
+middleware, is measured the same way for reference.
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI, HTTPException
+
+from app.main import app as service_app
+from app.main import store
+from app.models import PointsResponse, new_receipt_id
+from app.responses import points_response
+
+
+def build_app(lean: bool) -> FastAPI:
+    bench_app = FastAPI()
+
+    @bench_app.get("/receipts/{id}/points", response_model=PointsResponse)
+    async def get_points(id: str):
+        points = await store.get_async(id)
+        if points is None:
+            raise HTTPException(status_code=404, detail="No receipt found for that ID.")
+        return points_response(points) if lean else {"points": points}
+
+    return bench_app
+
+
+async def asgi_get(app, path: str) -> int:
+    """Sends one GET through ``app`` and returns the response status."""
+    status = 0
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def time_requests(app, paths, repeat):
+    for path in paths[:100]:
+        assert await asgi_get(app, path) == 200  # Warm up
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            await asgi_get(app, path)
+        runs.append((time.perf_counter() - start) / len(paths))
+    return min(runs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    ids = [new_receipt_id() for _ in range(args.requests)]
+    store.put_many((receipt_id, points) for points, receipt_id in enumerate(ids))
+    paths = [f"/receipts/{receipt_id}/points" for receipt_id in ids]
+
+    results = {}
+    print(f"{'app':<10} {'us/request':>12}")
+    for label, app in [("model", build_app(lean=False)), ("bytes", build_app(lean=True)), ("service", service_app)]:
+        results[label] = asyncio.run(time_requests(app, paths, args.repeat))
+        print(f"{label:<10} {results[label] * 1e6:>12.1f}")
+    print(f"\nbytes responses save {(results['model'] - results['bytes']) * 1e6:.1f}us per request "
+          f"({1 - results['bytes'] / results['model']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
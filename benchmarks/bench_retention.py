@@ -0,0 +1,75 @@
+"""Memory of the store under constant ingest, with and without retention.
+
+Run with ``python -m benchmarks.bench_retention [--rate 20] [--hours 12]``. Receipts are
+stored at ``--rate`` per simulated second, with UUIDv7 IDs minted at the simulated time, for
+``--hours`` simulated hours. Every simulated hour the heap held by the store is reported,
+measured with ``tracemalloc``. Without retention it grows with every receipt. With
+``--retention-hours`` it levels off at the retention window plus one partition, and the cost
+of dropping a partition shows in the slowest ``put_many`` of the hour. ``tracemalloc`` slows
+every allocation, so compare put times between runs of this benchmark only.
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.ids import uuid7
+from app.retention import RetentionStore
+from app.storage import CompactStore, DictStore, ShardedStore
+
+BACKENDS = {"dict": DictStore, "sharded": ShardedStore, "compact": CompactStore}
+
+
+class SimulatedClock:
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def run(store, clock: SimulatedClock, rate: int, hours: int, step: float):
+    """Ingests for ``hours``, yielding (hour, receipts held, heap MiB, slowest put_many ms) each hour."""
+    tracemalloc.start()
+    slowest = 0.0
+    try:
+        for hour in range(1, hours + 1):
+            for _ in range(int(3600 / step)):
+                millis = int(clock.now * 1000)
+                batch = [(uuid7(millis), 42) for _ in range(int(rate * step))]
+                start = time.perf_counter()
+                store.put_many(batch)
+                slowest = max(slowest, time.perf_counter() - start)
+                clock.now += step
+            yield hour, len(store), tracemalloc.get_traced_memory()[0] / 2**20, slowest * 1000
+            slowest = 0.0
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=int, default=20, help="receipts per simulated second")
+    parser.add_argument("--hours", type=int, default=12, help="simulated hours of ingest")
+    parser.add_argument("--retention-hours", type=float, default=4.0)
+    parser.add_argument("--partition-hours", type=float, default=1.0)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="dict")
+    parser.add_argument("--step", type=float, default=10.0, help="simulated seconds per put_many")
+    args = parser.parse_args(argv)
+
+    factory = BACKENDS[args.backend]
+    for label in ("unbounded", "retention"):
+        clock = SimulatedClock(1_700_000_000.0)
+        if label == "retention":
+            store = RetentionStore(
+                factory, args.retention_hours * 3600, args.partition_hours * 3600, clock=clock
+            )
+        else:
+            store = factory()
+        print(f"\n{label} ({args.backend}, {args.rate}/s)")
+        print(f"{'hour':>5} {'receipts':>10} {'heap MiB':>10} {'slowest put ms':>15}")
+        for hour, receipts, heap, slowest in run(store, clock, args.rate, args.hours, args.step):
+            print(f"{hour:>5} {receipts:>10,} {heap:>10.1f} {slowest:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measures per-rule breakdown storage and the cost of a rule change.
+
+Run with ``python -m benchmarks.bench_rules [--receipts 200000]``. Seeded receipts are stored
+in a ``BreakdownStore`` and the benchmark reports:
+
+* the bytes per receipt of the stored features and components
+* the time to migrate one rule (the 2-4pm window) against rescoring every receipt from
+  scratch, which also needs the receipts themselves
+* lookup latency percentiles from a reader thread while the migration runs
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+from app.breakdown import BreakdownStore
+from app.models import Receipt
+from app.points_engine import calculate_points_bulk
+from app.storage import DictStore
+from benchmarks.bench_async import percentile
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+
+def column_bytes(store: BreakdownStore) -> int:
+    columns = list(store._columns.values()) + list(store._components.values())
+    return sum(column.itemsize * len(column) if hasattr(column, "itemsize") else 8 * len(column) for column in columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=200_000)
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="typical")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    receipts = [Receipt(**data) for data in generate_receipts(args.receipts, args.seed, shape=SHAPES[args.shape])]
+    ids = [str(uuid.uuid4()) for _ in receipts]
+    store = BreakdownStore(DictStore(), chunk_size=args.chunk_size)
+    start = time.perf_counter()
+    store.add_many(zip(ids, receipts))
+    stored = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculate_points_bulk(receipts)
+    rescore = time.perf_counter() - start
+
+    latencies = []
+    done = threading.Event()
+
+    def reader():
+        index = 0
+        while not done.is_set():
+            lookup = time.perf_counter()
+            store.get(ids[index % len(ids)])
+            latencies.append(time.perf_counter() - lookup)
+            index += 7919
+            time.sleep(0.0001)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    start = time.perf_counter()
+    store.migrate("purchase_window", start_minute=15 * 60, end_minute=17 * 60)
+    migrate = time.perf_counter() - start
+    done.set()
+    thread.join()
+
+    print(json.dumps({
+        "receipts": len(receipts),
+        "breakdown_bytes_per_receipt": round(column_bytes(store) / len(receipts), 1),
+        "store_seconds": round(stored, 3),
+        "rescore_all_seconds": round(rescore, 3),
+        "migrate_one_rule_seconds": round(migrate, 3),
+        "lookups_during_migration": len(latencies),
+        "lookup_p50_us": round(percentile(latencies, 0.5) * 1e6, 1),
+        "lookup_p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measures each storage backend under concurrent load from a thread pool.
+
+Run with ``python -m benchmarks.bench_storage [--threads 16] [--ops 20000]``. Each thread
+writes a receipt and then reads back a random earlier one, the mix FastAPI's threadpool sees.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from app.config import Settings
+from app.storage import create_store
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(store, threads, ops_per_thread):
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        written = []
+        samples = latencies[index]
+        barrier.wait()
+        for _ in range(ops_per_thread):
+            receipt_id = str(uuid.uuid4())
+            start = time.perf_counter()
+            store.put(receipt_id, rng.randint(0, 500))
+            store.get(rng.choice(written) if written else receipt_id)
+            samples.append(time.perf_counter() - start)
+            written.append(receipt_id)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for thread_samples in latencies for sample in thread_samples]
+    return len(samples) / elapsed, percentile(samples, 0.5), percentile(samples, 0.99)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=20000, help="write+read pairs per backend")
+    parser.add_argument("--backends", default="dict,sharded,sqlite")
+    args = parser.parse_args(argv)
+
+    print(f"{'backend':<10} {'pairs/s':>12} {'p50 us':>10} {'p99 us':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends.split(","):
+            settings = Settings(store_backend=backend, store_path=os.path.join(directory, f"{backend}.db"))
+            store = create_store(settings)
+            throughput, p50, p99 = run(store, args.threads, max(1, args.ops // args.threads))
+            store.close()
+            print(f"{backend:<10} {throughput:>12,.0f} {p50 * 1e6:>10.1f} {p99 * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Shows that startup of the wal backend depends on the log tail, not the history size.
+
+Run with ``python -m benchmarks.bench_wal_startup [--tail 1000]``.
+"""
+import argparse
+import tempfile
+import uuid
+
+from app.wal import LogStructuredStore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tail", type=int, default=1000, help="records written after the last snapshot")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated history sizes")
+    args = parser.parse_args(argv)
+
+    print(f"{'history':>10} {'replayed':>10} {'startup ms':>12}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            store = LogStructuredStore(directory, snapshot_every=10**12)
+            for points in range(size):
+                store.put(str(uuid.uuid4()), points % 500)
+            store.snapshot()
+            for points in range(args.tail):
+                store.put(str(uuid.uuid4()), points % 500)
+            store.close()
+
+            reopened = LogStructuredStore(directory)
+            print(f"{size:>10,} {reopened.replayed_records:>10,} {reopened.startup_seconds * 1e3:>12.2f}")
+            reopened.close()
+
+
+if __name__ == "__main__":
+    main()
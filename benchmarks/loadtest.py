@@ -0,0 +1,263 @@
+"""Load test of the service over real HTTP, reporting throughput, latency percentiles and errors.
+
+Run with ``python -m benchmarks.loadtest [--rate 500 | --concurrency 32] [--duration 10]``.
+Each configuration starts the app under uvicorn in a fresh temporary directory, preloads
+receipts so lookups have IDs to read, then drives a mix of ``POST /receipts/process`` and
+``GET /receipts/{id}/points`` with an asyncio ``httpx`` client:
+
+* ``--rate`` sends requests on an open-loop schedule, whether or not earlier ones have
+  answered, and measures each latency from its scheduled send time, so queueing in the
+  client counts against the server instead of hiding overload
+* ``--concurrency`` runs that many clients that each send their next request as soon as the
+  previous one answers
+
+Lookups read IDs returned by earlier posts. Receipts are seeded synthetic ones of the chosen
+``--shape``. Configurations to compare are given as ``--config NAME:KEY=VALUE,...``, where
+keys are ``RECEIPTS_*`` settings without the prefix, or ``workers`` for uvicorn workers::
+
+    python -m benchmarks.loadtest --rate 400 --config dict: --config sqlite:store_backend=sqlite
+
+With more than one worker, use a backend shared by the workers (``shared``, ``sqlite``);
+otherwise a lookup can reach a worker that never saw the receipt and counts as an error.
+``--url`` drives an already running server instead. The load generator shares the machine
+with the server, so leave it CPUs to run on. The report is printed as JSON, and written to
+``--output`` if given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+
+# (kind, status or None for a transport error, latency in seconds)
+Sample = Tuple[str, Optional[int], float]
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, str], int]:
+    """Splits ``NAME:KEY=VALUE,...`` into the name, the environment overrides and the worker count."""
+    name, _, settings = spec.partition(":")
+    env, workers = {}, 1
+    for pair in filter(None, settings.split(",")):
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {pair!r}")
+        if key.strip().lower() == "workers":
+            workers = int(value)
+        else:
+            env["RECEIPTS_" + key.strip().upper()] = value.strip()
+    return name or "default", env, workers
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def uvicorn_server(env: Dict[str, str], workers: int, timeout: float = 60.0) -> Iterator[str]:
+    """Runs the app under uvicorn in a temporary directory, yielding its base URL once it answers."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        environ = dict(os.environ, **env, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        command = [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ]
+        process = subprocess.Popen(command, env=environ, cwd=directory)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.perf_counter() + timeout
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+                try:
+                    httpx.get(f"{url}/receipts/ready/points", timeout=1.0)
+                    break
+                except httpx.TransportError:
+                    if time.perf_counter() > deadline:
+                        raise RuntimeError("uvicorn did not answer in time")
+                    time.sleep(0.05)
+            yield url
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+class LoadGenerator:
+    """Sends the request mix and records one sample per request."""
+
+    def __init__(self, client: httpx.AsyncClient, bodies: List[bytes], read_ratio: float, seed: int):
+        self.client = client
+        self.bodies = bodies
+        self.read_ratio = read_ratio
+        self.rng = random.Random(seed)
+        self.ids: List[str] = []
+        self.samples: List[Sample] = []
+
+    async def preload(self, count: int) -> None:
+        for body in self.bodies[:count]:
+            response = await self.client.post("/receipts/process", content=body)
+            response.raise_for_status()
+            self.ids.append(response.json()["id"])
+
+    async def request(self, scheduled: float, record: bool = True) -> None:
+        """Sends one request; its latency counts from ``scheduled``."""
+        kind = "get_points" if self.ids and self.rng.random() < self.read_ratio else "process"
+        status = None
+        try:
+            if kind == "process":
+                response = await self.client.post("/receipts/process", content=self.rng.choice(self.bodies))
+                if response.status_code == 200:
+                    self.ids.append(response.json()["id"])
+            else:
+                response = await self.client.get(f"/receipts/{self.rng.choice(self.ids)}/points")
+            status = response.status_code
+        except httpx.HTTPError:
+            pass
+        if record:
+            self.samples.append((kind, status, time.perf_counter() - scheduled))
+
+    async def open_loop(self, rate: float, duration: float, warmup: float) -> float:
+        """Starts ``rate`` requests per second on schedule; returns the measured seconds."""
+        tasks = []
+        start = time.perf_counter()
+        sent = 0
+        while True:
+            now = time.perf_counter()
+            if now - start >= warmup + duration:
+                break
+            # Start every arrival that is due, each timed from when it should have been sent
+            for index in range(sent, int((now - start) * rate)):
+                scheduled = start + index / rate
+                tasks.append(asyncio.ensure_future(self.request(scheduled, record=scheduled - start >= warmup)))
+            sent = max(sent, int((now - start) * rate))
+            await asyncio.sleep(0.001)
+        await asyncio.gather(*tasks)
+        # Until the last measured request answered, so a backlog lowers the throughput
+        return time.perf_counter() - start - warmup
+
+    async def closed_loop(self, concurrency: int, duration: float, warmup: float) -> float:
+        """Runs ``concurrency`` clients back to back; returns the measured seconds."""
+        start = time.perf_counter()
+        measured_from = start + warmup
+        end = measured_from + duration
+
+        async def client():
+            while time.perf_counter() < end:
+                scheduled = time.perf_counter()
+                await self.request(scheduled, record=scheduled >= measured_from)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - measured_from
+
+
+def summarize(samples: List[Sample], seconds: float) -> Dict[str, object]:
+    """Throughput, error rate and latency percentiles in milliseconds of some samples."""
+    latencies = sorted(latency for _, _, latency in samples)
+    errors = sum(1 for _, status, _ in samples if status is None or status >= 400)
+    summary: Dict[str, object] = {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / seconds, 1) if seconds else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+    }
+    for name, fraction in PERCENTILES:
+        index = min(len(latencies) - 1, int(len(latencies) * fraction))
+        summary[f"{name}_ms"] = round(latencies[index] * 1000, 3) if latencies else None
+    summary["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else None
+    statuses = Counter("transport_error" if status is None else str(status) for _, status, _ in samples)
+    summary["status"] = dict(sorted(statuses.items()))
+    return summary
+
+
+async def drive(url: str, bodies: List[bytes], args) -> Dict[str, object]:
+    """Runs the configured load against ``url`` and summarizes it, overall and per request kind."""
+    connections = args.concurrency or args.max_connections
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    headers = {"Content-Type": "application/json"}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout, headers=headers) as client:
+        generator = LoadGenerator(client, bodies, args.read_ratio, args.seed)
+        await generator.preload(args.preload)
+        if args.concurrency:
+            seconds = await generator.closed_loop(args.concurrency, args.duration, args.warmup)
+        else:
+            seconds = await generator.open_loop(args.rate, args.duration, args.warmup)
+    samples = generator.samples
+    return {
+        **summarize(samples, seconds),
+        "by_kind": {
+            kind: summarize([sample for sample in samples if sample[0] == kind], seconds)
+            for kind in ("process", "get_points")
+        },
+    }
+
+
+def main(argv=None, stdout=sys.stdout) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, default=200.0, help="requests per second, open loop (default)")
+    load.add_argument("--concurrency", type=int, help="clients sending back to back, closed loop")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    parser.add_argument("--read-ratio", type=float, default=0.5, help="share of requests that are lookups")
+    parser.add_argument("--preload", type=int, default=200, help="receipts posted before the load starts")
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="typical")
+    parser.add_argument("--receipts", type=int, default=2000, help="distinct synthetic receipts to send")
+    parser.add_argument("--max-connections", type=int, default=256, help="connection pool size with --rate")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request is an error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--config", type=parse_config, action="append", metavar="NAME:KEY=VALUE,...",
+        help="a server configuration to measure; repeat to compare several",
+    )
+    parser.add_argument("--url", help="drive this running server instead of starting uvicorn")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+    if args.concurrency:
+        args.rate = None
+
+    bodies = [
+        json.dumps(receipt).encode()
+        for receipt in generate_receipts(max(args.receipts, args.preload), args.seed, shape=SHAPES[args.shape])
+    ]
+    load = {"rate": args.rate} if args.rate else {"concurrency": args.concurrency}
+    runs = []
+    if args.url:
+        runs.append({"name": "external", "url": args.url, **asyncio.run(drive(args.url, bodies, args))})
+    else:
+        for name, env, workers in args.config or [parse_config("default:")]:
+            with uvicorn_server(env, workers) as url:
+                runs.append({"name": name, "env": env, "workers": workers, **asyncio.run(drive(url, bodies, args))})
+    report = {
+        "load": {**load, "duration_s": args.duration, "read_ratio": args.read_ratio, "shape": args.shape},
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    stdout.write(text + "\n")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Benchmark suite covering each stage of handling a receipt.
+
+Stages are timed per receipt over seeded synthetic workloads of several shapes:
+
+* ``validate_dict`` / ``validate_json`` - pydantic ``Receipt`` validation, including the
+  ``constr`` regexes, from a dict and from raw JSON bytes
+* ``score_scalar`` / ``score_bulk`` - ``calculate_points`` and the columnar engine
+* ``post_e2e`` / ``get_e2e`` - full ``TestClient`` round trips through the app
+
+Usage::
+
+    python -m benchmarks.suite --save benchmarks/baselines/local.json
+    python -m benchmarks.suite --compare benchmarks/baselines/local.json --threshold 0.2
+
+``--compare`` exits with status 1 when any stage is slower than the baseline by more than
+the threshold (0.2 = 20%).
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+# Receipts per shape for each stage; end-to-end stages are much slower per receipt
+DEFAULT_COUNTS = {"small": 2000, "typical": 2000, "large": 100}
+E2E_FRACTION = 0.25
+
+
+def time_per_op(func: Callable[[], object], ops: int, repeat: int) -> float:
+    """Returns the best seconds per operation over ``repeat`` runs of ``func``.
+
+    The minimum is the least noisy estimate on a shared machine, as with ``timeit``.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) / ops)
+    return min(runs)
+
+
+def stage_functions(receipts: List[dict]) -> Dict[str, Callable[[], object]]:
+    """Builds one zero-argument callable per stage over the given receipts."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.models import Receipt
+    from app.points_calculator import calculate_points
+    from app.points_engine import calculate_points_bulk
+
+    client = TestClient(app)
+    bodies = [json.dumps(receipt).encode() for receipt in receipts]
+    models = [Receipt.model_validate(receipt) for receipt in receipts]
+    e2e_count = max(1, int(len(receipts) * E2E_FRACTION))
+    ids = [client.post("/receipts/process", json=receipt).json()["id"] for receipt in receipts[:e2e_count]]
+
+    return {
+        "validate_dict": lambda: [Receipt.model_validate(receipt) for receipt in receipts],
+        "validate_json": lambda: [Receipt.model_validate_json(body) for body in bodies],
+        "score_scalar": lambda: [calculate_points(model) for model in models],
+        "score_bulk": lambda: calculate_points_bulk(models),
+        "post_e2e": lambda: [
+            client.post("/receipts/process", content=body, headers={"Content-Type": "application/json"})
+            for body in bodies[:e2e_count]
+        ],
+        "get_e2e": lambda: [client.get(f"/receipts/{receipt_id}/points") for receipt_id in ids],
+    }
+
+
+def run_suite(counts: Dict[str, int], seed: int = 0, repeat: int = 5, stages: Optional[List[str]] = None) -> dict:
+    """Runs every stage on every shape and returns the JSON-serializable results."""
+    results = {}
+    for shape_name, count in counts.items():
+        receipts = generate_receipts(count, seed=seed, shape=SHAPES[shape_name])
+        functions = stage_functions(receipts)
+        for stage, func in functions.items():
+            if stages and stage not in stages:
+                continue
+            ops = max(1, int(count * E2E_FRACTION)) if stage.endswith("_e2e") else count
+            func()  # Warm up caches and lazily built validators
+            results[f"{stage}/{shape_name}"] = {"us_per_op": time_per_op(func, ops, repeat) * 1e6, "ops": ops}
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed": seed,
+            "repeat": repeat,
+            "counts": counts,
+        },
+        "stages": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Returns a description of every stage that regressed beyond ``threshold``."""
+    regressions = []
+    for name, result in current["stages"].items():
+        reference = baseline["stages"].get(name)
+        if reference is None:
+            continue
+        ratio = result["us_per_op"] / reference["us_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {result['us_per_op']:.2f}us vs {reference['us_per_op']:.2f}us baseline ({ratio - 1:+.0%})"
+            )
+    return regressions
+
+
+def print_results(current: dict, baseline: Optional[dict] = None) -> None:
+    print(f"{'stage':<24} {'us/op':>12} {'baseline':>12} {'change':>8}")
+    for name, result in current["stages"].items():
+        line = f"{name:<24} {result['us_per_op']:>12.2f}"
+        reference = (baseline or {}).get("stages", {}).get(name)
+        if reference:
+            line += f" {reference['us_per_op']:>12.2f} {result['us_per_op'] / reference['us_per_op'] - 1:>+8.0%}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the receipts per shape")
+    parser.add_argument("--stages", help="comma-separated subset of stages to run")
+    args = parser.parse_args(argv)
+
+    counts = {shape: max(1, int(count * args.scale)) for shape, count in DEFAULT_COUNTS.items()}
+    stages = args.stages.split(",") if args.stages else None
+    current = run_suite(counts, args.seed, args.repeat, stages)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(current, baseline)
+
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(current, output, indent=2, sort_keys=True)
+            output.write("\n")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
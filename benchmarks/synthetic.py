@@ -0,0 +1,89 @@
+"""Seeded generator of realistic synthetic receipts for tests and benchmarks."""
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+RETAILERS = [
+    "Target",
+    "M&M Corner Market",
+    "Walgreens",
+    "Costco Wholesale",
+    "7-Eleven",
+    "Whole Foods Market",
+    "Café Olé",
+]
+
+WORDS = [
+    "Mountain", "Dew", "12PK", "Emils", "Cheese", "Pizza", "Knorr", "Creamy", "Chicken",
+    "Doritos", "Nacho", "Gatorade", "Klarbrunn", "FL", "OZ", "Organic", "Milk", "2L",
+]
+
+
+class Shape(NamedTuple):
+    """Controls how large and how varied generated receipts are."""
+
+    max_items: int = 10
+    max_words: int = 4  # Words per item description
+    large_amount_rate: float = 0.0  # Share of amounts in the millions of dollars
+
+
+SHAPES: Dict[str, Shape] = {
+    "small": Shape(max_items=3, max_words=2),
+    "typical": Shape(),
+    "large": Shape(max_items=500, max_words=12, large_amount_rate=0.05),
+}
+
+
+def random_description(rng: random.Random, max_words: int = 4) -> str:
+    description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, max_words)))
+    # Occasionally pad with whitespace, which rule 5 strips before measuring
+    if rng.random() < 0.1:
+        description = "  " + description + " "
+    return description
+
+
+def random_amount(rng: random.Random, large_amount_rate: float = 0.0) -> str:
+    roll = rng.random()
+    if roll < large_amount_rate:
+        cents = rng.randint(10**8, 10**11)
+    elif roll < 0.2:
+        cents = rng.randint(0, 400) * 100  # Round dollar amount
+    elif roll < 0.4:
+        cents = rng.randint(0, 1600) * 25  # Multiple of 0.25
+    else:
+        cents = rng.randint(0, 40000)
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def random_receipt(rng: random.Random, max_items: int = 10, shape: Shape = Shape()) -> dict:
+    """Returns one receipt as a JSON-compatible dict."""
+    purchase_date = date(2022, 1, 1) + timedelta(days=rng.randint(0, 730))
+    hour = rng.choice([rng.randint(0, 23), 14, 15, 16])
+    purchase_time = f"{hour:02d}:{rng.randint(0, 59):02d}"
+    if rng.random() < 0.05:
+        purchase_time = rng.choice(["14:00", "16:00", "14:00:01", "15:59:59"])
+    return {
+        "retailer": rng.choice(RETAILERS),
+        "purchaseDate": purchase_date.isoformat(),
+        "purchaseTime": purchase_time,
+        "items": [
+            {
+                "shortDescription": random_description(rng, shape.max_words),
+                "price": random_amount(rng, shape.large_amount_rate),
+            }
+            for _ in range(rng.randint(1, max_items))
+        ],
+        "total": random_amount(rng, shape.large_amount_rate),
+    }
+
+
+def iter_receipts(count: int, seed: int = 0, max_items: Optional[int] = None, shape: Shape = Shape()) -> Iterator[dict]:
+    rng = random.Random(seed)
+    max_items = shape.max_items if max_items is None else max_items
+    for _ in range(count):
+        yield random_receipt(rng, max_items, shape)
+
+
+def generate_receipts(count: int, seed: int = 0, max_items: Optional[int] = None, shape: Shape = Shape()) -> List[dict]:
+    """Returns ``count`` receipts; the same seed and shape always yield the same receipts."""
+    return list(iter_receipts(count, seed, max_items, shape))
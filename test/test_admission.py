@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+import app.main as main
+from app import admission
+from app.admission import AdmissionMiddleware, Budget, classify
+
+
+def scope(method, path):
+    return {"type": "http", "method": method, "path": path}
+
+
+async def slow_app(scope, receive, send):
+    await asyncio.sleep(0.05 if scope["path"].startswith("/receipts/process") else 0.001)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def drive(app, requests):
+    """Sends every (method, path) at once, returning the responses in order."""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.request(method, path) for method, path in requests))
+    return asyncio.run(run())
+
+
+# 1. Test requests are classified into budgets
+def test_classify():
+    assert classify(scope("POST", "/receipts/process")) == "ingest"
+    assert classify(scope("POST", "/receipts/process/batch")) == "ingest"
+    assert classify(scope("GET", "/receipts/abc/points")) == "read"
+    assert classify(scope("POST", "/receipts/points")) == "read"
+    assert classify(scope("GET", "/metrics")) is None
+
+
+# 2. Test a budget admits in FIFO order and sheds when the queue is full or the wait runs out
+def test_budget():
+    async def run():
+        budget = Budget("test", max_in_flight=1, max_queue=2, max_wait=0.05)
+        order = []
+
+        async def request(name, hold):
+            reason = await budget.acquire()
+            if reason is None:
+                order.append(name)
+                await asyncio.sleep(hold)
+                budget.release()
+            return reason
+
+        first = asyncio.ensure_future(request("first", 0.02))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(request(name, 0)) for name in ("second", "third")]
+        await asyncio.sleep(0)
+        assert budget.queue_depth == 2
+        assert await request("fourth", 0) == "queue_full"
+        assert await asyncio.gather(first, *waiting) == [None, None, None]
+        assert order == ["first", "second", "third"]
+        assert budget.in_flight == 0
+
+        blocker = asyncio.ensure_future(request("blocker", 0.2))
+        await asyncio.sleep(0)
+        assert await request("late", 0) == "wait_timeout"
+        assert budget.queue_depth == 0
+        await blocker
+        assert budget.in_flight == 0
+
+    asyncio.run(run())
+
+
+# 3. Test heavy ingest is shed with 503 and Retry-After while reads keep their own budget
+def test_middleware_sheds_ingest_not_reads():
+    budgets = {"ingest": Budget("ingest", 2, 2, 0.02), "read": Budget("read", 8, 8, 1.0)}
+    app = AdmissionMiddleware(slow_app, budgets, retry_after=3)
+    shed_before = admission.ADMISSION_SHED.value("ingest", "queue_full")
+    responses = drive(app, [("POST", "/receipts/process")] * 10 + [("GET", "/receipts/x/points")] * 8)
+    ingest, reads = responses[:10], responses[10:]
+    assert [response.status_code for response in reads] == [200] * 8
+    shed = [response for response in ingest if response.status_code == 503]
+    assert len(shed) >= 6
+    assert shed[0].headers["retry-after"] == "3"
+    assert shed[0].json()["detail"] == "The service is overloaded, retry later."
+    assert admission.ADMISSION_SHED.value("ingest", "queue_full") > shed_before
+    assert budgets["ingest"].in_flight == budgets["read"].in_flight == 0
+
+
+# 4. Test the app mounts the middleware and reports queue depth when enabled
+def test_app_metrics():
+    # Settings are read at import, so the app is wired up in a fresh interpreter
+    code = """
+import json
+from fastapi.testclient import TestClient
+import app.main as main
+from app.admission import AdmissionMiddleware
+with TestClient(main.app) as client:
+    status = client.get("/receipts/unknown/points").status_code
+    exposition = client.get("/metrics").text
+print(json.dumps({
+    "mounted": [middleware.cls is AdmissionMiddleware for middleware in main.app.user_middleware],
+    "status": status,
+    "in_flight": main.admission_budgets["read"].in_flight,
+    "metrics": exposition,
+}))
+"""
+    env = dict(os.environ, RECEIPTS_ADMISSION_ENABLED="true", RECEIPTS_METRICS_ENABLED="true")
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.splitlines()[-1])
+    assert report["mounted"].count(True) == 1
+    assert report["status"] == 404 and report["in_flight"] == 0
+    for budget in ("ingest", "read"):
+        assert f'receipts_admission_queue_depth{{budget="{budget}"}} 0' in report["metrics"]
+        assert f'receipts_admission_in_flight{{budget="{budget}"}}' in report["metrics"]
+    # Off by default
+    assert not any(middleware.cls is AdmissionMiddleware for middleware in main.app.user_middleware)
@@ -0,0 +1,140 @@
+import dataclasses
+import json
+import os
+import time
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app.aggregates import AggregateSync, Aggregates, combine, summarize
+from app.deferred import DeferredStore
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from app.storage import DictStore
+
+client = TestClient(main.app)
+
+
+def receipt(retailer="Target", purchase_date="2022-01-01", total="6.49"):
+    return {
+        "retailer": retailer,
+        "purchaseDate": purchase_date,
+        "purchaseTime": "13:01",
+        "items": [{"shortDescription": "Mountain Dew 12PK", "price": total}],
+        "total": total,
+    }
+
+
+@pytest.fixture
+def aggregates(monkeypatch):
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, aggregates_enabled=True))
+    aggregates = Aggregates()
+    monkeypatch.setattr(main, "aggregates", aggregates)
+    return aggregates
+
+
+# 1. Test counts, sums and histograms per retailer and per date
+def test_record(aggregates):
+    aggregates.record_many([
+        ("Target", date(2022, 1, 1), 20),
+        ("  target ", date(2022, 1, 2), 80),
+        ("Walgreens", date(2022, 1, 2), 5000),
+    ])
+    target = summarize(aggregates.retailer("TARGET"))
+    assert (target["count"], target["points"]) == (2, 100)
+    assert {bucket["le"]: bucket["count"] for bucket in target["histogram"] if bucket["count"]} == {25: 1, 100: 1}
+    walgreens = summarize(aggregates.retailer("Walgreens"))
+    assert walgreens["histogram"][-1] == {"le": None, "count": 1}
+    assert aggregates.retailer("Costco") is None
+    assert summarize(aggregates.date("2022-01-02"))["points"] == 5080
+
+
+# 2. Test date ranges are inclusive and open-ended
+def test_date_range(aggregates):
+    for day in range(1, 11):
+        aggregates.record("Target", date(2022, 3, day), day)
+    assert aggregates.date_range("2022-03-02", "2022-03-04")[-1] == 2 + 3 + 4
+    assert aggregates.date_range(None, "2022-03-02")[-2] == 2
+    assert aggregates.date_range("2022-03-09")[-2] == 2
+    assert aggregates.date_range("2023-01-01") is None
+
+
+# 3. Test snapshots merge by adding series
+def test_merge():
+    first, second = Aggregates(), Aggregates()
+    first.record("Target", date(2022, 1, 1), 10)
+    second.record("Target", date(2022, 1, 1), 30)
+    second.record("Costco", date(2021, 12, 31), 7)
+    merged = Aggregates.from_snapshot(json.loads(json.dumps(first.snapshot())))
+    merged.merge(second.snapshot())
+    assert merged.retailer("target")[-2:] == [2, 40]
+    assert merged.date_range()[-2:] == [3, 47]
+    assert combine([first.retailer("Target"), None, second.retailer("Target")]) == merged.retailer("Target")
+    with pytest.raises(ValueError):
+        Aggregates(buckets=(1, 2)).merge(first.snapshot())
+
+
+# 4. Test workers see each other's aggregates through the shared directory
+def test_sync(tmp_path):
+    peer = Aggregates()
+    peer.record("Target", date(2022, 1, 1), 10)
+    (tmp_path / "4242-a1.json").write_text(json.dumps(peer.snapshot()))
+    stale = tmp_path / "4343-b2.json"
+    stale.write_text(json.dumps(peer.snapshot()))
+    os.utime(stale, (0, 0))  # A worker that died without closing
+    local = Aggregates()
+    local.record("Target", date(2022, 1, 1), 5)
+    sync = AggregateSync(local, str(tmp_path), interval=60)
+    restarted = AggregateSync(Aggregates(), str(tmp_path), interval=60)
+    try:
+        assert combine(source.retailer("Target") for source in sync.sources())[-2:] == [2, 15]
+        assert not stale.exists()
+        sync.publish()
+        published = json.loads(open(sync.path).read())
+        assert published["retailers"]["target"][-1] == 5
+        assert restarted.path != sync.path and os.path.basename(sync.path).startswith(f"{os.getpid()}-")
+    finally:
+        sync.close()
+        restarted.close()
+    assert sorted(os.listdir(tmp_path)) == ["4242-a1.json"]
+
+
+# 5. Test the endpoints follow single, batch and deferred ingestion
+def test_endpoints(aggregates, monkeypatch):
+    client.post("/receipts/process", json=receipt())
+    client.post("/receipts/process/batch", json=[receipt(), receipt("Costco", "2022-01-03", "1.00")])
+    deferred = DeferredStore(DictStore(), workers=0)
+    monkeypatch.setattr(main, "store", deferred)
+    receipt_id = client.post("/receipts/process", json=receipt(purchase_date="2022-01-02")).json()["id"]
+    client.get(f"/receipts/{receipt_id}/points")
+
+    target = client.get("/aggregates/retailers/target").json()
+    assert target["count"] == 3
+    assert target["points"] == 2 * calculate_points(Receipt(**receipt())) + deferred.get(receipt_id)
+    assert client.get("/aggregates/dates/2022-01-01").json()["count"] == 2
+    assert client.get("/aggregates/dates", params={"start": "2022-01-02"}).json()["count"] == 2
+    assert client.get("/aggregates/retailers/nobody").json()["count"] == 0
+    assert client.get("/aggregates/dates/not-a-date").status_code == 400
+    assert set(client.get("/aggregates").json()["retailers"]) == {"target", "costco"}
+
+
+# 6. Test peers are reloaded by the sync thread, so readers never touch the directory
+def test_sync_reloads_in_background(tmp_path, monkeypatch):
+    sync = AggregateSync(Aggregates(), str(tmp_path), interval=0.01)
+    try:
+        peer = Aggregates()
+        peer.record("Target", date(2022, 1, 1), 10)
+        (tmp_path / "4242-a1.json").write_text(json.dumps(peer.snapshot()))
+        for _ in range(500):
+            if sync.peers().retailer("Target") is not None:
+                break
+            time.sleep(0.01)
+        assert sync.peers().retailer("Target")[-2:] == [1, 10]
+        sync._stop.set()
+        sync._thread.join()
+        monkeypatch.setattr(os, "listdir", None)  # Any read of the directory would fail
+        assert combine(source.retailer("Target") for source in sync.sources())[-2:] == [1, 10]
+    finally:
+        monkeypatch.undo()
+        sync.close()
@@ -0,0 +1,105 @@
+import json
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+valid_receipt = {
+    "retailer": "M&M Corner Market",
+    "purchaseDate": "2022-03-20",
+    "purchaseTime": "14:33",
+    "items": [
+        {"shortDescription": "Gatorade", "price": "2.25"},
+        {"shortDescription": "Gatorade", "price": "2.25"},
+        {"shortDescription": "Gatorade", "price": "2.25"},
+        {"shortDescription": "Gatorade", "price": "2.25"}
+    ],
+    "total": "9.00"
+}
+
+invalid_receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [
+        {"shortDescription": "Mountain Dew 12PK", "price": "6.49A"}  # Invalid price format
+    ],
+    "total": "6.49"
+}
+
+
+# 1. Test JSON array batch returns per-entry results in input order
+def test_batch_json_array():
+    response = client.post("/receipts/process/batch", json=[valid_receipt, invalid_receipt, valid_receipt])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert "id" in results[0] and "id" in results[2]
+    assert results[0]["id"] != results[2]["id"]
+    assert results[1]["errors"][0]["loc"] == ["items", 0, "price"]
+
+    # Accepted receipts are scored and stored like single submissions
+    points_response = client.get(f"/receipts/{results[0]['id']}/points")
+    assert points_response.status_code == 200
+    assert points_response.json() == {"points": 109}
+
+
+# 2. Test NDJSON batch rejects only the malformed lines
+def test_batch_ndjson():
+    body = "\n".join([json.dumps(valid_receipt), "{not json", "", json.dumps(invalid_receipt)]) + "\n"
+    response = client.post(
+        "/receipts/process/batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert "id" in results[0]
+    assert results[1]["errors"][0]["type"] == "json_invalid"
+    assert results[2]["errors"][0]["loc"] == ["items", 0, "price"]
+
+
+# 3. Test a batch body that is not a JSON array is rejected as a whole
+def test_batch_not_an_array():
+    response = client.post("/receipts/process/batch", json=valid_receipt)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The receipt is invalid."
+
+    response = client.post(
+        "/receipts/process/batch",
+        content="[{",
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["type"] == "json_invalid"
+
+
+# 4. Test empty batch
+def test_batch_empty():
+    response = client.post("/receipts/process/batch", json=[])
+    assert response.status_code == 200
+    assert response.json() == {"results": []}
+
+
+# 5. Test bytes that are not UTF-8 are a JSON decode error, not a server error
+def test_batch_invalid_utf8():
+    response = client.post(
+        "/receipts/process/batch",
+        content=b"[\xff]",
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["type"] == "json_invalid"
+
+    body = json.dumps(valid_receipt).encode() + b"\n{\xff}\n"
+    response = client.post(
+        "/receipts/process/batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert "id" in results[0]
+    assert results[1]["errors"][0]["type"] == "json_invalid"
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+
+import app.main as main
+from app.models import Receipt
+from benchmarks.loadtest import LoadGenerator, parse_config, summarize
+from benchmarks.suite import compare, run_suite
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+
+# 1. Test the generator is deterministic per seed and produces valid receipts
+def test_generator_is_seeded():
+    assert generate_receipts(50, seed=3) == generate_receipts(50, seed=3)
+    assert generate_receipts(50, seed=3) != generate_receipts(50, seed=4)
+    for receipt in generate_receipts(50, seed=3, shape=SHAPES["large"]):
+        Receipt.model_validate(receipt)
+
+
+# 2. Test shapes bound the item counts
+def test_generator_shapes():
+    small = generate_receipts(200, shape=SHAPES["small"])
+    large = generate_receipts(200, shape=SHAPES["large"])
+    assert max(len(receipt["items"]) for receipt in small) <= SHAPES["small"].max_items
+    assert max(len(receipt["items"]) for receipt in large) > SHAPES["typical"].max_items
+
+
+# 3. Test the comparison flags only stages slower than the threshold
+def test_compare_detects_regressions():
+    baseline = {"stages": {"a/small": {"us_per_op": 10.0}, "b/small": {"us_per_op": 10.0}}}
+    current = {
+        "stages": {
+            "a/small": {"us_per_op": 11.0},
+            "b/small": {"us_per_op": 13.0},
+            "c/small": {"us_per_op": 99.0},  # Not in the baseline, ignored
+        }
+    }
+    regressions = compare(current, baseline, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("b/small")
+
+
+# 4. Test a tiny suite run produces a result per stage and shape
+def test_run_suite_smoke():
+    results = run_suite({"small": 8}, repeat=1, stages=["validate_dict", "score_scalar", "get_e2e"])
+    assert set(results["stages"]) == {"validate_dict/small", "score_scalar/small", "get_e2e/small"}
+    assert all(result["us_per_op"] > 0 for result in results["stages"].values())
+
+
+# 5. Test load-test configurations and summaries
+def test_loadtest_config_and_summary():
+    assert parse_config("sqlite:store_backend=sqlite,workers=4") == ("sqlite", {"RECEIPTS_STORE_BACKEND": "sqlite"}, 4)
+    assert parse_config("plain:") == ("plain", {}, 1)
+    samples = [("process", 200, i / 1000) for i in range(1, 1001)] + [("get_points", 404, 0.5), ("process", None, 2.0)]
+    summary = summarize(samples, seconds=2.0)
+    assert summary["requests"] == 1002 and summary["throughput_rps"] == 501.0
+    assert summary["error_rate"] == round(2 / 1002, 4)
+    assert summary["p50_ms"] == 501.0 and summary["p999_ms"] == 1000.0 and summary["max_ms"] == 2000.0
+    assert summary["status"] == {"200": 1000, "404": 1, "transport_error": 1}
+
+
+# 6. Test the load generator drives the mix of posts and lookups
+def test_load_generator():
+    bodies = [json.dumps(receipt).encode() for receipt in generate_receipts(20, seed=1)]
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        headers = {"Content-Type": "application/json"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            generator = LoadGenerator(client, bodies, read_ratio=0.5, seed=0)
+            await generator.preload(5)
+            await generator.closed_loop(concurrency=4, duration=0.2, warmup=0.05)
+            await generator.open_loop(rate=200, duration=0.2, warmup=0)
+            return generator.samples
+
+    samples = asyncio.run(run())
+    assert {kind for kind, _, _ in samples} == {"process", "get_points"}
+    assert {status for _, status, _ in samples} == {200}
@@ -0,0 +1,167 @@
+import dataclasses
+import os
+import subprocess
+import sys
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app import metrics
+from app.breakdown import BreakdownStore, MigrationInProgress
+from app.fast_ingest import parse_lean_receipt
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from app.rules import Rule, RuleRegistry
+from app.storage import DictStore
+from benchmarks.synthetic import generate_receipts
+from test_points_engine import edge_case_receipts
+
+client = TestClient(main.app)
+
+body = (
+    b'{"retailer": "Target", "purchaseDate": "2022-01-01", "purchaseTime": "14:33",'
+    b' "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}], "total": "6.49"}'
+)
+
+
+@pytest.fixture
+def breakdown_store(monkeypatch):
+    store = BreakdownStore(DictStore(), chunk_size=7)
+    monkeypatch.setattr(main, "store", store)
+    return store
+
+
+def add_receipts(store, receipts):
+    ids = [str(uuid.uuid4()) for _ in receipts]
+    store.add_many(zip(ids, receipts))
+    return ids
+
+
+# 1. Test the components of the default rules add up to the calculator's points
+def test_components_match_calculator(breakdown_store):
+    receipts = [Receipt(**data) for data in generate_receipts(200, seed=3) + edge_case_receipts()]
+    ids = add_receipts(breakdown_store, receipts)
+    expected = [calculate_points(receipt) for receipt in receipts]
+    assert breakdown_store.get_many(ids + ["unknown"]) == expected + [None]
+    assert breakdown_store.backing.get_many(ids) == expected
+    components = breakdown_store.breakdown(ids[0])
+    assert list(components) == breakdown_store.registry.names()
+    assert sum(points for _, points in components.values()) == expected[0]
+
+    lean_id = str(uuid.uuid4())
+    assert breakdown_store.add(lean_id, parse_lean_receipt(body)) == calculate_points(Receipt.model_validate_json(body))
+
+
+# 2. Test a rule change rescores only its component and writes changed totals through
+def test_migration(breakdown_store):
+    receipts = [Receipt(**data) for data in generate_receipts(100, seed=4)]
+    ids = add_receipts(breakdown_store, receipts)
+    before = {receipt_id: breakdown_store.breakdown(receipt_id) for receipt_id in ids}
+
+    rule = breakdown_store.migrate("purchase_window", start_minute=0, end_minute=24 * 60, points=7)
+    assert rule.version == 2
+    assert breakdown_store.registry["purchase_window"] is rule
+    assert [r.version for r in breakdown_store.registry.history("purchase_window")] == [1, 2]
+    for receipt_id in ids:
+        after = breakdown_store.breakdown(receipt_id)
+        changed = {name for name in after if after[name] != before[receipt_id][name]}
+        assert changed <= {"purchase_window"}
+        assert after["purchase_window"] == (2, 7 if receipts[ids.index(receipt_id)].purchaseTime.isoformat() != "00:00:00" else 0)
+        total = sum(points for _, points in after.values())
+        assert breakdown_store.get(receipt_id) == breakdown_store.backing.get(receipt_id) == total
+    assert breakdown_store.migration is None
+
+    with pytest.raises(KeyError):
+        breakdown_store.migrate("no_such_rule")
+    with pytest.raises(ValueError):
+        breakdown_store.migrate("purchase_window", bonus=3)
+    with pytest.raises(ValueError):
+        breakdown_store.migrate("item_descriptions", price_denominator=0)
+
+
+# 3. Test totals stay readable at the old version while a migration runs
+def test_reads_during_migration():
+    gate = threading.Event()
+    entered = threading.Event()
+
+    def per_item(features, params):
+        if params["points"] == 2:
+            entered.set()
+            gate.wait(5)
+        return features.item_count * params["points"]
+
+    store = BreakdownStore(DictStore(), RuleRegistry([Rule("per_item", 1, {"points": 1}, "", per_item)]), chunk_size=2)
+    ids = add_receipts(store, [parse_lean_receipt(body)] * 5)
+    rule = store.begin_migration("per_item", points=2)
+    with pytest.raises(MigrationInProgress):
+        store.begin_migration("per_item", points=3)
+    thread = threading.Thread(target=store.run_migration, args=(rule,))
+    thread.start()
+    assert entered.wait(5)
+    assert store.migration["rule"] == "per_item" and store.migration["total"] == 5
+    assert store.get_many(ids) == [1] * 5
+    # Stored mid-migration with the old version, caught up before the switch
+    late_id = add_receipts(store, [parse_lean_receipt(body)])[0]
+    assert store.get(late_id) == 1
+    gate.set()
+    thread.join(5)
+    assert store.get_many(ids + [late_id]) == [2] * 6
+    assert store.breakdown(late_id) == {"per_item": (2, 2)}
+    assert store.add(str(uuid.uuid4()), parse_lean_receipt(body)) == 2
+
+
+# 4. Test the breakdown and rule endpoints
+def test_endpoints(breakdown_store, monkeypatch):
+    receipt_id = client.post("/receipts/process", content=body).json()["id"]
+    response = client.get(f"/receipts/{receipt_id}/breakdown")
+    assert response.status_code == 200
+    breakdown = response.json()
+    assert breakdown["points"] == client.get(f"/receipts/{receipt_id}/points").json()["points"] == 22
+    assert breakdown["rules"]["purchase_window"] == {"version": 1, "points": 10}
+    assert client.get("/receipts/unknown/breakdown").status_code == 404
+    assert [rule["name"] for rule in client.get("/rules").json()["rules"]] == breakdown_store.registry.names()
+
+    change = {"params": {"start_minute": 15 * 60}}
+    assert client.put("/rules/purchase_window", json=change).status_code == 403
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, rules_admin_token="secret"))
+    assert client.put("/rules/purchase_window", json=change, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    headers = {"X-Admin-Token": "secret"}
+    response = client.put("/rules/purchase_window", json=change, headers=headers)
+    assert response.status_code == 202
+    assert response.json()["version"] == 2
+    assert client.get(f"/receipts/{receipt_id}/points").json()["points"] == 12
+    assert client.get(f"/receipts/{receipt_id}/breakdown").json()["rules"]["purchase_window"] == {"version": 2, "points": 0}
+    assert client.get("/rules").json()["migration"] is None
+
+    assert client.put("/rules/nope", json=change, headers=headers).status_code == 404
+    assert client.put("/rules/odd_day", json={"params": {"colour": 1}}, headers=headers).status_code == 400
+    assert client.put("/rules/odd_day", json={"params": {"points": "6"}}, headers=headers).status_code == 400
+
+
+# 5. Test the endpoints are unavailable without breakdowns
+def test_disabled():
+    receipt_id = client.post("/receipts/process", content=body).json()["id"]
+    missing_before = metrics.POINTS_NOT_FOUND.value()
+    assert client.get(f"/receipts/{receipt_id}/breakdown").status_code == 404
+    assert metrics.POINTS_NOT_FOUND.value() == missing_before
+    assert client.get("/rules").status_code == 404
+
+
+# 6. Test breakdowns are refused with aggregates, which rule changes would not revise, and
+# with backends that outlive the process or are shared between workers
+def test_rejected_combinations(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, RECEIPTS_STORE_BREAKDOWNS="true", RECEIPTS_AGGREGATES_ENABLED="true", PYTHONPATH=root)
+
+    def start():
+        return subprocess.run([sys.executable, "-c", "import app.main"], env=env, cwd=tmp_path, capture_output=True, text=True)
+
+    result = start()
+    assert result.returncode != 0 and "aggregates_enabled" in result.stderr
+    env["RECEIPTS_AGGREGATES_ENABLED"] = "false"
+    assert start().returncode == 0
+    env["RECEIPTS_STORE_BACKEND"] = "wal"
+    result = start()
+    assert result.returncode != 0 and "store_breakdowns requires one of the dict" in result.stderr
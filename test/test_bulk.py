@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+
+import pytest
+from app.bulk import iter_json_array_records, main, score_records
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from benchmarks.synthetic import generate_receipts
+
+receipts = generate_receipts(50, seed=4)
+invalid = {**receipts[0], "total": "1"}
+
+
+def expected_points(records):
+    return [calculate_points(Receipt.model_validate(record)) for record in records]
+
+
+def read_output(path):
+    with open(path) as output:
+        rows = list(csv.reader(output))
+    assert rows[0] == ["id", "points"]
+    return rows[1:]
+
+
+# 1. Test an NDJSON file is scored in order with rejects written separately
+def test_ndjson_file(tmp_path):
+    source = tmp_path / "receipts.ndjson"
+    lines = [json.dumps(record) for record in receipts[:10]]
+    lines[3:3] = [json.dumps(invalid), "", "{not json"]
+    source.write_text("\n".join(lines) + "\n")
+
+    status = main([str(source), "--workers", "0", "--chunk-size", "4",
+                   "--output", str(tmp_path / "out.csv"), "--rejects", str(tmp_path / "rejects.ndjson")])
+    assert status == 0
+    rows = read_output(tmp_path / "out.csv")
+    assert [int(points) for _, points in rows] == expected_points(receipts[:10])
+    assert len({receipt_id for receipt_id, _ in rows}) == 10
+    rejects = [json.loads(line) for line in (tmp_path / "rejects.ndjson").read_text().splitlines()]
+    assert [reject["record"] for reject in rejects] == [4, 5]
+    assert rejects[0]["errors"][0]["loc"] == ["total"]
+    assert rejects[1]["errors"][0]["type"] == "json_invalid"
+
+
+# 2. Test JSON arrays are split into elements across any read size
+@pytest.mark.parametrize("read_size", [1, 7, 4096])
+def test_json_array_records(read_size):
+    data = [receipts[0], 12.5e3, "café ]", [], {"a": {"b": "},"}}]
+    raw = json.dumps(data, ensure_ascii=False).encode()
+    records = list(iter_json_array_records(io.BytesIO(raw), read_size))
+    assert [json.loads(record) for record in records] == data
+    for bad in (b"[1,2", b"[1,]", b'{"a": 1}', b"[1 2]"):
+        with pytest.raises(ValueError):
+            list(iter_json_array_records(io.BytesIO(bad), read_size))
+
+
+# 3. Test worker processes give the same ordered output, with IDs taken from the input
+def test_json_array_in_worker_processes(tmp_path):
+    source = tmp_path / "receipts.json"
+    source.write_text(json.dumps([{**record, "receiptId": f"r{i}"} for i, record in enumerate(receipts)]))
+    output = tmp_path / "out.csv"
+    status = main([str(source), "--workers", "2", "--chunk-size", "8", "--window", "2",
+                   "--id-field", "receiptId", "--output", str(output)])
+    assert status == 0
+    assert read_output(output) == [[f"r{i}", str(points)] for i, points in enumerate(expected_points(receipts))]
+
+
+# 4. Test a malformed JSON array fails the run
+def test_malformed_array(tmp_path, capsys):
+    source = tmp_path / "receipts.json"
+    source.write_text(json.dumps(receipts[:3])[:-5])
+    assert main([str(source), "--workers", "0", "--output", str(tmp_path / "out.csv")]) == 1
+    assert "error:" in capsys.readouterr().err
+
+
+# 5. Test a record that is not UTF-8 is rejected when IDs are read from the input
+def test_invalid_utf8_with_id_field():
+    record = json.dumps({**receipts[0], "receiptId": "r0"}).encode()
+    outcomes = score_records([record, b'{"receiptId": "\xff"}'], id_field="receiptId")
+    assert outcomes[0] == ("r0", expected_points(receipts[:1])[0])
+    assert outcomes[1][0] is None and outcomes[1][1][0]["type"] == "json_invalid"
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+import app.main as main
+from app import metrics, startup
+from app.startup import StartupTimings, cached_openapi, warm_up
+
+
+# 1. Test NumPy is not imported until bulk scoring asks for it
+def test_numpy_is_deferred():
+    code = "import sys, app.main; print('numpy' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "False"
+    from app import points_engine
+    assert points_engine.np is points_engine.numpy_module()
+
+
+# 2. Test the warm-up runs the hot paths without storing anything
+def test_warm_up():
+    stored = len(main.store)
+    asyncio.run(warm_up())
+    assert len(main.store) == stored
+
+
+# 3. Test the OpenAPI schema is written once and served from the cache while the fingerprint matches
+def test_cached_openapi(monkeypatch, tmp_path):
+    path = tmp_path / "openapi.json"
+    monkeypatch.setattr(main.app, "openapi_schema", None)
+    schema = cached_openapi(main.app, str(path))
+    assert json.loads(path.read_text())["schema"] == schema
+    assert "/receipts/process" in schema["paths"]
+
+    cached = json.loads(path.read_text())
+    cached["schema"]["info"]["title"] = "From the cache"
+    path.write_text(json.dumps(cached))
+    cached_openapi(main.app, str(path))
+    assert TestClient(main.app).get("/openapi.json").json()["info"]["title"] == "From the cache"
+
+    monkeypatch.setattr(startup, "openapi_fingerprint", lambda: "changed")
+    assert cached_openapi(main.app, str(path))["info"]["title"] != "From the cache"
+    assert json.loads(path.read_text())["fingerprint"] == "changed"
+    monkeypatch.setattr(main.app, "openapi_schema", None)
+
+
+# 4. Test the startup report and metrics cover import, readiness and the first request
+def test_startup_report(monkeypatch):
+    timings = StartupTimings()
+    monkeypatch.setattr(main, "startup_timings", timings)
+    assert timings.report()["ready_seconds"] is None
+    timings.mark_imported()
+    timings.mark_ready()
+    timings.mark_first_request(0.002)
+    timings.mark_first_request(5.0)
+    report = TestClient(main.app).get("/startup").json()
+    assert report["import_seconds"] >= 0
+    assert report["ready_seconds"] <= report["first_request_seconds"]
+    assert report["first_request_duration_seconds"] == 0.002
+    if sys.platform.startswith("linux"):
+        assert report["interpreter_seconds"] > 0
+    assert 'receipts_startup_seconds{phase="ready"}' in metrics.registry.render()
+
+
+# 5. Test serving does not import the cold-start CLI or the backends it was not configured with
+def test_serving_imports():
+    modules = ["app.coldstart", "app.shared_store", "app.sqlite_store", "argparse", "statistics", "sqlite3", "mmap"]
+    code = f"import sys, app.main; print([m for m in {modules!r} if m in sys.modules])"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "[]"
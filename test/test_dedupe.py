@@ -0,0 +1,122 @@
+import dataclasses
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app.dedupe import IdempotencyKeyReused, ReceiptCache, receipt_fingerprint
+from app.fast_ingest import parse_lean_receipt
+from app.models import Receipt
+
+client = TestClient(main.app)
+
+receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [
+        {"shortDescription": "Mountain Dew 12PK", "price": "6.49"},
+        {"shortDescription": "Emils Cheese Pizza", "price": "12.25"}
+    ],
+    "total": "35.35"
+}
+
+
+@pytest.fixture
+def dedupe_enabled(monkeypatch):
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, dedupe_receipts=True))
+    monkeypatch.setattr(main, "receipt_cache", ReceiptCache())
+
+
+# 1. Test equivalent receipts share a fingerprint and different ones do not
+def test_receipt_fingerprint():
+    reordered = dict(reversed(list(receipt.items())), purchaseTime="13:01:00")
+    assert receipt_fingerprint(Receipt(**receipt)) == receipt_fingerprint(Receipt(**reordered))
+    assert receipt_fingerprint(Receipt(**receipt)) != receipt_fingerprint(Receipt(**{**receipt, "total": "35.36"}))
+    # The fast ingest path fingerprints the same receipt the same way
+    assert receipt_fingerprint(parse_lean_receipt(json.dumps(receipt))) == receipt_fingerprint(Receipt(**receipt))
+
+
+# 2. Test LRU eviction and hit/miss counters
+def test_cache_lru_eviction():
+    cache = ReceiptCache(max_entries=2)
+    cache.put("a", "id-a")
+    cache.put("b", "id-b")
+    assert cache.get("a") == "id-a"  # "a" is now the most recently used
+    cache.put("c", "id-c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "id-a"
+    assert cache.get("c") == "id-c"
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+# 3. Test TTL expiry
+def test_cache_ttl_expiry():
+    cache = ReceiptCache(ttl_seconds=0.01)
+    cache.put("a", "id-a")
+    assert cache.get("a") == "id-a"
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+# 4. Test identical resubmissions return the original ID without storing again
+def test_duplicate_receipt_returns_original_id(dedupe_enabled, monkeypatch):
+    stored_before = len(main.store)
+    first = client.post("/receipts/process", json=receipt).json()["id"]
+    second = client.post("/receipts/process", json=receipt).json()["id"]
+    assert first == second
+    assert len(main.store) == stored_before + 1
+    assert main.receipt_cache.hits == 1
+
+    other = client.post("/receipts/process", json={**receipt, "total": "35.00"}).json()["id"]
+    assert other != first
+
+    # A retry validated by the standard path matches a receipt that took the fast ingest path
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, fast_ingest=False))
+    assert client.post("/receipts/process", json=receipt).json()["id"] == first
+
+
+# 5. Test content dedupe is off by default
+def test_duplicates_accepted_by_default():
+    first = client.post("/receipts/process", json=receipt).json()["id"]
+    second = client.post("/receipts/process", json=receipt).json()["id"]
+    assert first != second
+
+
+# 6. Test the Idempotency-Key header is honoured even without content dedupe
+def test_idempotency_key():
+    headers = {"Idempotency-Key": "pos-17-txn-0042"}
+    first = client.post("/receipts/process", json=receipt, headers=headers).json()["id"]
+    second = client.post("/receipts/process", json=receipt, headers=headers).json()["id"]
+    third = client.post("/receipts/process", json=receipt, headers={"Idempotency-Key": "pos-17-txn-0043"}).json()["id"]
+    assert first == second
+    assert third != first
+    assert client.get(f"/receipts/{first}/points").status_code == 200
+
+
+# 7. Test an Idempotency-Key reused for a different receipt is rejected
+def test_idempotency_key_reused():
+    headers = {"Idempotency-Key": "pos-17-txn-0044"}
+    first = client.post("/receipts/process", json=receipt, headers=headers).json()["id"]
+    response = client.post("/receipts/process", json={**receipt, "total": "35.00"}, headers=headers)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "The Idempotency-Key was already used for a different receipt."}
+    # The same receipt spelled differently is a retry
+    retry = client.post("/receipts/process", json={**receipt, "purchaseTime": "13:01:00"}, headers=headers)
+    assert retry.json()["id"] == first
+
+
+# 8. Test a submission counts one cache hit or miss, however many keys it has
+def test_one_lookup_per_submission(dedupe_enabled):
+    headers = {"Idempotency-Key": "pos-17-txn-0045"}
+    client.post("/receipts/process", json=receipt, headers=headers)
+    client.post("/receipts/process", json=receipt, headers=headers)
+    assert (main.receipt_cache.hits, main.receipt_cache.misses) == (1, 1)
+    cache = ReceiptCache()
+    cache.put("key:a", "id-a", "sha256:a")
+    with pytest.raises(IdempotencyKeyReused):
+        cache.lookup(["key:a"], "sha256:b")
+    assert cache.lookup(["key:b", "key:a"], "sha256:a") == "id-a"
+    assert cache.lookup(["key:a"], expired=lambda receipt_id: True) is None
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app import deferred
+from app.deferred import DeferredStore
+from app.fast_ingest import lean_points, parse_lean_receipt
+from app.shared_store import SharedMemoryStore
+from app.storage import DictStore, StoreFull
+
+client = TestClient(main.app)
+
+body = (
+    b'{"retailer": "Target", "purchaseDate": "2022-01-01", "purchaseTime": "13:01",'
+    b' "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}], "total": "6.49"}'
+)
+
+
+class CountingScore:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self, receipt):
+        self.calls += 1
+        time.sleep(self.delay)
+        return lean_points(receipt)
+
+
+@pytest.fixture
+def deferred_store(monkeypatch):
+    store = DeferredStore(DictStore(), max_queue=4, workers=0)
+    monkeypatch.setattr(main, "store", store)
+    return store
+
+
+# 1. Test a deferred receipt is scored once, on its first read
+def test_scored_on_first_read(deferred_store):
+    score = CountingScore()
+    receipt_id = str(uuid.uuid4())
+    assert deferred_store.defer(receipt_id, parse_lean_receipt(body), score)
+    assert score.calls == 0
+    assert deferred_store.backing.get(receipt_id) is None
+    assert len(deferred_store) == 1
+
+    assert deferred_store.get(receipt_id) == 12
+    assert deferred_store.get(receipt_id) == 12
+    assert deferred_store.get_many([receipt_id, "unknown"]) == [12, None]
+    assert score.calls == 1
+    assert deferred_store.pending == 0
+
+
+# 2. Test concurrent readers never see a 404 and score the receipt only once
+def test_concurrent_reads_score_once(deferred_store):
+    score = CountingScore(delay=0.01)
+    receipt_id = str(uuid.uuid4())
+    deferred_store.defer(receipt_id, parse_lean_receipt(body), score)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(deferred_store.get(receipt_id))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [12] * 8
+    assert score.calls == 1
+
+
+# 3. Test the background worker precomputes points ahead of any read
+def test_background_worker():
+    store = DeferredStore(DictStore(), max_queue=100, workers=2)
+    score = CountingScore()
+    ids = [str(uuid.uuid4()) for _ in range(50)]
+    lag_before = deferred.DEFERRED_LAG.count("worker")
+    for receipt_id in ids:
+        store.defer(receipt_id, parse_lean_receipt(body), score)
+    for _ in range(500):
+        if not store.pending:
+            break
+        time.sleep(0.01)
+    assert store.backing.get_many(ids) == [12] * 50
+    assert score.calls == 50
+    assert store.queue_depth == 0
+    assert deferred.DEFERRED_LAG.count("worker") == lag_before + 50
+    store.close()
+
+
+# 4. Test the API defers scoring and falls back to inline scoring when the queue is full
+def test_api_deferred_mode(deferred_store):
+    ids = [
+        client.post("/receipts/process", content=body, headers={"Content-Type": "application/json"}).json()["id"]
+        for _ in range(6)
+    ]
+    assert deferred_store.pending == 4
+    assert deferred_store.backing.get_many(ids) == [None] * 4 + [12, 12]
+    assert client.get(f"/receipts/{ids[0]}/points").json() == {"points": 12}
+    assert client.post("/receipts/points", json={"ids": ids}).json()["missing"] == []
+    assert deferred_store.pending == 0
+
+
+# 5. Test closing scores whatever is still pending
+def test_close_drains_pending():
+    backing = DictStore()
+    store = DeferredStore(backing, workers=0)
+    receipt_id = str(uuid.uuid4())
+    store.defer(receipt_id, parse_lean_receipt(body), lean_points)
+    store.close()
+    assert backing.get(receipt_id) == 12
+
+
+class FullStore(DictStore):
+    def put(self, receipt_id, points):
+        raise StoreFull("full")
+
+
+# 6. Test a fixed-capacity store is never deferred to, and a full store drops the receipt
+def test_full_store(tmp_path):
+    shared = SharedMemoryStore(str(tmp_path / "receipts.shm"), capacity=16)
+    store = DeferredStore(shared, workers=0)
+    assert not store.defer(str(uuid.uuid4()), parse_lean_receipt(body), lean_points)
+    store.close()
+
+    store = DeferredStore(FullStore(), workers=0)
+    receipt_id = str(uuid.uuid4())
+    store.defer(receipt_id, parse_lean_receipt(body), lean_points)
+    dropped = deferred.DEFERRED_DROPPED.value()
+    with pytest.raises(StoreFull):
+        store.get(receipt_id)
+    assert deferred.DEFERRED_DROPPED.value() == dropped + 1
+    assert store.pending == 0 and store.get(receipt_id) is None
+    store.close()
+
+
+# 7. Test deferred scoring is refused with the shared backend, where other workers could not read pending receipts
+def test_rejected_with_shared_backend(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(
+        os.environ, PYTHONPATH=root, RECEIPTS_SCORING_MODE="deferred", RECEIPTS_STORE_BACKEND="shared",
+        RECEIPTS_SHM_PATH=str(tmp_path / "receipts.shm"), RECEIPTS_SHM_CAPACITY="64",
+    )
+    result = subprocess.run([sys.executable, "-c", "import app.main"], env=env, cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode != 0 and "cannot be combined with the shared backend" in result.stderr
+
+
+# 8. Test batched reads score pending receipts on a worker thread, not the event loop
+def test_get_many_async_offloads(deferred_store):
+    threads = []
+
+    def score(receipt):
+        threads.append(threading.current_thread())
+        return lean_points(receipt)
+
+    deferred_store.defer("a", parse_lean_receipt(body), score)
+    deferred_store.put("b", 5)
+    assert asyncio.run(deferred_store.get_many_async(["a", "b", "c"])) == [12, 5, None]
+    assert threads and threads[0] is not threading.main_thread()
+    assert asyncio.run(deferred_store.get_many_async(["a", "b"])) == [12, 5]
+    assert len(threads) == 1
@@ -0,0 +1,85 @@
+import json
+import pickle
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app import executor as executor_module
+from app.executor import ScoringExecutor, pack_receipts, score_packed
+from app.fast_ingest import parse_lean_receipt
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+client = TestClient(main.app)
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = ScoringExecutor(workers=2, min_items=20, min_batch=10, chunk_size=7)
+    yield executor
+    executor.close()
+
+
+# 1. Test packed scoring matches calculate_points for full and lean receipts
+@pytest.mark.parametrize("shape", sorted(SHAPES))
+def test_score_packed(shape):
+    data = generate_receipts(60, seed=5, shape=SHAPES[shape])
+    receipts = [Receipt.model_validate(receipt) for receipt in data]
+    lean = [parse_lean_receipt(json.dumps(receipt).encode()) for receipt in data]
+    expected = [calculate_points(receipt) for receipt in receipts]
+    assert score_packed(pack_receipts(receipts)) == expected
+    assert score_packed(pickle.loads(pickle.dumps(pack_receipts(lean)))) == expected
+
+
+# 2. Test the packed form pickles smaller than the models
+def test_packed_is_compact():
+    receipts = [Receipt.model_validate(receipt) for receipt in generate_receipts(20, shape=SHAPES["large"])]
+    assert len(pickle.dumps(pack_receipts(receipts))) < len(pickle.dumps(receipts))
+
+
+# 3. Test large batches are scored in pool chunks with the same results
+def test_score_bulk_in_pool(executor):
+    receipts = [Receipt.model_validate(receipt) for receipt in generate_receipts(30, seed=2)]
+    assert executor.score_bulk(receipts) == [calculate_points(receipt) for receipt in receipts]
+    assert executor._pool is not None
+    assert ScoringExecutor(workers=0).score_bulk(receipts[:3]) == [calculate_points(r) for r in receipts[:3]]
+
+
+# 4. Test only receipts over the item threshold go to the pool, through the API too
+def test_large_receipt_through_api(executor, monkeypatch):
+    assert not ScoringExecutor(workers=0, min_items=1).accepts(10**6)
+    assert executor.accepts(20) and not executor.accepts(19)
+
+    monkeypatch.setattr(main, "scoring_pool", executor)
+    receipt = generate_receipts(1, seed=9, max_items=1)[0]
+    receipt["items"] = receipt["items"] * 25
+    receipt_id = client.post("/receipts/process", json=receipt).json()["id"]
+    expected = calculate_points(Receipt.model_validate(receipt))
+    assert client.get(f"/receipts/{receipt_id}/points").json() == {"points": expected}
+
+
+# 5. Test concurrent first uses create a single pool
+def test_pool_created_once(monkeypatch):
+    created = []
+
+    class SlowPool:
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.01)  # Widens the window between the check and the assignment
+            created.append(self)
+
+        def shutdown(self):
+            pass
+
+    monkeypatch.setattr(executor_module, "ProcessPoolExecutor", SlowPool)
+    scoring = ScoringExecutor(workers=2)
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(scoring.pool)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and all(pool is created[0] for pool in pools)
+    scoring.close()
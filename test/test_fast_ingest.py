@@ -0,0 +1,93 @@
+import dataclasses
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app import fast_ingest
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from benchmarks.synthetic import SHAPES, generate_receipts
+
+client = TestClient(main.app)
+
+receipt = {
+    "retailer": "M&M Corner Market",
+    "purchaseDate": "2022-03-20",
+    "purchaseTime": "14:33",
+    "items": [
+        {"shortDescription": "Gatorade", "price": "2.25"},
+        {"shortDescription": "Gatorade", "price": "2.25"}
+    ],
+    "total": "9.00"
+}
+
+invalid_bodies = [
+    b'{"retailer": "Target",',
+    b"[]",
+    b"{}",
+    b"",
+    json.dumps({**receipt, "total": "9"}).encode(),
+    json.dumps({**receipt, "total": 9.0}).encode(),
+    json.dumps({**receipt, "items": []}).encode(),
+    json.dumps({**receipt, "purchaseDate": "2022-02-30"}).encode(),
+    json.dumps({**receipt, "retailer": "Target!"}).encode(),
+    json.dumps({**receipt, "items": [{"shortDescription": "Gatorade"}]}).encode(),
+]
+
+
+def set_fast_ingest(monkeypatch, enabled):
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, fast_ingest=enabled))
+
+
+def record_parses(monkeypatch):
+    parsed = []
+    parse = fast_ingest.parse_lean_receipt
+    monkeypatch.setattr(fast_ingest, "parse_lean_receipt", lambda body: parsed.append(body) or parse(body))
+    return parsed
+
+
+# 1. Test lean scoring matches calculate_points on every workload shape
+@pytest.mark.parametrize("shape", sorted(SHAPES))
+def test_lean_points_match(shape):
+    for data in generate_receipts(200, seed=11, shape=SHAPES[shape]):
+        lean = fast_ingest.parse_lean_receipt(json.dumps(data).encode())
+        assert fast_ingest.lean_points(lean) == calculate_points(Receipt.model_validate(data))
+
+
+# 2. Test valid JSON bodies take the fast path and score the same
+def test_fast_path_used(monkeypatch):
+    parsed = record_parses(monkeypatch)
+    response = client.post("/receipts/process", json=receipt)
+    assert response.status_code == 200
+    assert len(parsed) == 1
+    assert client.get(f"/receipts/{response.json()['id']}/points").json() == {
+        "points": calculate_points(Receipt.model_validate(receipt))
+    }
+
+    set_fast_ingest(monkeypatch, False)
+    client.post("/receipts/process", json=receipt)
+    assert len(parsed) == 1
+
+
+# 3. Test rejected bodies get exactly the responses of the standard path
+@pytest.mark.parametrize("body", invalid_bodies)
+def test_errors_unchanged(monkeypatch, body):
+    headers = {"Content-Type": "application/json"}
+    fast = client.post("/receipts/process", content=body, headers=headers)
+    set_fast_ingest(monkeypatch, False)
+    standard = client.post("/receipts/process", content=body, headers=headers)
+    assert fast.status_code == standard.status_code == 400
+    assert fast.json() == standard.json()
+
+
+# 4. Test only JSON media types are validated from raw bytes
+def test_json_content_types(monkeypatch):
+    parsed = record_parses(monkeypatch)
+    body = json.dumps(receipt)
+    response = client.post("/receipts/process", content=body, headers={"Content-Type": "application/vnd.receipt+json"})
+    assert response.status_code == 200
+    assert len(parsed) == 1
+    assert not fast_ingest.is_json("application/x-ndjson")
+    assert not fast_ingest.is_json(None)
+    assert fast_ingest.is_json("application/json; charset=utf-8")
@@ -0,0 +1,120 @@
+import random
+import uuid
+from datetime import date, time
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app.index import ReceiptIndex, SortedIndex
+from app.models import Receipt
+from benchmarks.synthetic import generate_receipts
+
+client = TestClient(main.app)
+
+
+def receipt(retailer="Target", purchase_date="2022-01-01", purchase_time="13:01"):
+    return {
+        "retailer": retailer,
+        "purchaseDate": purchase_date,
+        "purchaseTime": purchase_time,
+        "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}],
+        "total": "6.49",
+    }
+
+
+def pages(fetch, limit):
+    """Follows cursors through every page, returning all entries."""
+    entries, cursor = fetch(limit, None)
+    while cursor is not None:
+        page, cursor = fetch(limit, cursor)
+        assert page
+        entries += page
+    return entries
+
+
+@pytest.fixture
+def indexed():
+    index = ReceiptIndex(load=4)
+    receipts = [Receipt(**data) for data in generate_receipts(300, seed=9)]
+    ids = [str(uuid.uuid4()) for _ in receipts]
+    index.add_many(zip(ids, receipts))
+    return index, list(zip(ids, receipts))
+
+
+# 1. Test the blocked sorted index stays ordered and seeks like bisect on a flat list
+def test_sorted_index():
+    index = SortedIndex(load=3)
+    values = random.Random(1).sample(range(10_000), 500)
+    for value in values:
+        index.add(value)
+    flat = sorted(values)
+    assert len(index) == 500 and list(index.iter_from(-1)) == flat
+    for probe in (0, flat[10], flat[10] + 1, flat[-1], 10_001):
+        assert list(index.iter_from(probe)) == [v for v in flat if v >= probe]
+        assert list(index.iter_from(probe, inclusive=False)) == [v for v in flat if v > probe]
+
+
+# 2. Test paging through each index returns every match exactly once, in order
+@pytest.mark.parametrize("limit", [1, 7, 1000])
+def test_pagination(indexed, limit):
+    index, stored = indexed
+    retailer = stored[0][1].retailer
+    by_retailer = pages(lambda n, c: index.by_retailer(retailer.upper(), n, c), limit)
+    assert [entry[0] for entry in by_retailer] == [i for i, r in stored if r.retailer.casefold() == retailer.casefold()]
+
+    start, end = (date(2022, 3, 1), time(12)), (date(2023, 6, 30), time.max)
+    by_datetime = pages(lambda n, c: index.by_datetime(start, end, n, c), limit)
+    expected = sorted(
+        ((r.purchaseDate, r.purchaseTime), n) for n, (i, r) in enumerate(stored)
+        if start <= (r.purchaseDate, r.purchaseTime) <= end
+    )
+    assert [entry[0] for entry in by_datetime] == [stored[n][0] for _, n in expected]
+
+    by_time = pages(lambda n, c: index.by_time(time(14), time(16), n, c), limit)
+    assert sorted(entry[0] for entry in by_time) == sorted(i for i, r in stored if time(14) <= r.purchaseTime <= time(16))
+    assert [entry[3] for entry in by_time] == sorted(entry[3] for entry in by_time)
+
+
+# 3. Test a cursor stays valid while receipts are added
+def test_cursor_survives_inserts(indexed):
+    index, stored = indexed
+    start, end = (date.min, time.min), (date.max, time.max)
+    first, cursor = index.by_datetime(start, end, 10, None)
+    index.add(str(uuid.uuid4()), Receipt(**receipt(purchase_date="1999-01-01")))  # Sorts before the cursor
+    late_id = str(uuid.uuid4())
+    index.add(late_id, Receipt(**receipt(purchase_date="2999-01-01")))  # Sorts after it
+    rest = pages(lambda n, c: index.by_datetime(start, end, n, c or cursor), 50)
+    assert len(first) + len(rest) == len(stored) + 1
+    assert rest[-1][0] == late_id
+    with pytest.raises(ValueError):
+        index.by_retailer("Target", 10, "not-a-cursor")
+
+
+# 4. Test the listing endpoint
+def test_endpoint(monkeypatch):
+    monkeypatch.setattr(main, "receipt_index", ReceiptIndex())
+    ids = [
+        client.post("/receipts/process", json=receipt(purchase_date=f"2022-01-{day:02d}", purchase_time="14:30")).json()["id"]
+        for day in range(1, 6)
+    ]
+    client.post("/receipts/process/batch", json=[receipt("Costco", "2022-01-03", "09:00")])
+
+    page = client.get("/receipts", params={"retailer": "target", "limit": 2}).json()
+    assert [listing["id"] for listing in page["receipts"]] == ids[:2]
+    assert page["receipts"][0]["points"] == client.get(f"/receipts/{ids[0]}/points").json()["points"]
+    page = client.get("/receipts", params={"retailer": "target", "limit": 2, "cursor": page["next_cursor"]}).json()
+    assert [listing["id"] for listing in page["receipts"]] == ids[2:4]
+
+    page = client.get("/receipts", params={"start_date": "2022-01-02", "end_date": "2022-01-03"}).json()
+    assert [listing["retailer"] for listing in page["receipts"]] == ["Target", "Costco", "Target"]
+    assert page["next_cursor"] is None
+    page = client.get("/receipts", params={"start_time": "09:00", "end_time": "10:00"}).json()
+    assert [listing["retailer"] for listing in page["receipts"]] == ["Costco"]
+
+    assert client.get("/receipts").status_code == 400
+    assert client.get("/receipts", params={"retailer": "Target", "start_date": "2022-01-01"}).status_code == 400
+    assert client.get("/receipts", params={"retailer": "Target", "cursor": "x"}).status_code == 400
+    assert client.get("/receipts", params={"retailer": "Target", "limit": 0}).status_code == 400
+
+    monkeypatch.setattr(main, "receipt_index", None)
+    assert client.get("/receipts", params={"retailer": "Target"}).status_code == 404
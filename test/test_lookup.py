@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+from app.main import app
+from app.lookup import MAX_ID_LINE_BYTES, aiter_ids, parse_id_line
+
+client = TestClient(app)
+
+receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [
+        {"shortDescription": "Mountain Dew 12PK", "price": "6.49"}
+    ],
+    "total": "6.49"
+}
+
+
+def submit(count):
+    return [client.post("/receipts/process", json=receipt).json()["id"] for _ in range(count)]
+
+
+# 1. Test a JSON lookup returns found points and missing IDs
+def test_bulk_lookup_json():
+    ids = submit(3)
+    unknown = str(uuid.uuid4())
+    response = client.post("/receipts/points", json={"ids": [ids[0], unknown, ids[1], ids[2]]})
+    assert response.status_code == 200
+    assert response.json() == {"points": {receipt_id: 12 for receipt_id in ids}, "missing": [unknown]}
+
+
+# 2. Test invalid lookup bodies are rejected like receipts
+def test_bulk_lookup_invalid():
+    for body in (b'{"ids": [1, 2]}', b'["abc"]', b'{"ids":', b"\xff"):
+        response = client.post("/receipts/points", content=body, headers={"Content-Type": "application/json"})
+        assert response.status_code == 400
+        assert response.json()["errors"][0]["loc"][0] == "body"
+
+
+# 3. Test NDJSON lookups stream one line per ID in request order
+def test_bulk_lookup_ndjson():
+    ids = submit(2)
+    body = f'{ids[0]}\n"{ids[1]}"\n\nmissing-id\n'
+    response = client.post("/receipts/points", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.splitlines() == [
+        f'{{"id":"{ids[0]}","points":12}}',
+        f'{{"id":"{ids[1]}","points":12}}',
+        '{"id":"missing-id","points":null}',
+    ]
+
+    # A JSON body can ask for a streamed response too
+    response = client.post("/receipts/points", json={"ids": ids}, headers={"Accept": "application/x-ndjson"})
+    assert len(response.text.splitlines()) == 2
+
+
+# 4. Test streamed IDs are split correctly across chunk boundaries
+def test_aiter_ids_chunk_boundaries():
+    async def chunks():
+        for chunk in (b"ab", b"c\n\"de", b"f\"\r\n", b"gh"):
+            yield chunk
+
+    async def collect():
+        return [receipt_id async for receipt_id in aiter_ids(chunks())]
+
+    assert asyncio.run(collect()) == ["abc", "def", "gh"]
+    assert parse_id_line(b'"unterminated') == '"unterminated'
+    assert parse_id_line(b'"\xff"') == '"\ufffd"'  # Not UTF-8: an unknown ID, not an error
+
+
+# 5. Test a streamed line longer than any ID is rejected before it is buffered further
+def test_aiter_ids_line_limit():
+    async def chunks(*parts):
+        for part in parts:
+            yield part
+
+    async def collect(*parts):
+        return [receipt_id async for receipt_id in aiter_ids(chunks(*parts))]
+
+    assert asyncio.run(collect(b"a" * MAX_ID_LINE_BYTES)) == ["a" * MAX_ID_LINE_BYTES]
+    with pytest.raises(RequestValidationError) as excinfo:
+        asyncio.run(collect(b"ok\n", b"b" * MAX_ID_LINE_BYTES, b"b"))
+    assert excinfo.value.errors()[0]["loc"] == ("body", 1)
+
+    body = b"id\n" + b"x" * (MAX_ID_LINE_BYTES * 4)
+    response = client.post("/receipts/points", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["type"] == "string_too_long"
@@ -0,0 +1,79 @@
+from fastapi.testclient import TestClient
+from app import metrics
+from app.main import app
+
+client = TestClient(app)
+
+receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [
+        {"shortDescription": "Mountain Dew 12PK", "price": "6.49"}
+    ],
+    "total": "6.49"
+}
+
+
+# 1. Test requests, validation failures and 404s are counted
+def test_request_counters():
+    process_route = "/receipts/process"
+    points_route = "/receipts/{id}/points"
+    ok_before = metrics.REQUESTS.value("POST", process_route, "200")
+    invalid_before = metrics.VALIDATION_FAILURES.value(process_route)
+    missing_before = metrics.POINTS_NOT_FOUND.value()
+
+    client.post("/receipts/process", json=receipt)
+    client.post("/receipts/process", json={})
+    client.get("/receipts/does-not-exist/points")
+
+    assert metrics.REQUESTS.value("POST", process_route, "200") == ok_before + 1
+    assert metrics.VALIDATION_FAILURES.value(process_route) == invalid_before + 1
+    assert metrics.POINTS_NOT_FOUND.value() == missing_before + 1
+    assert metrics.REQUESTS.value("GET", points_route, "404") >= 1
+
+
+# 2. Test every stage of a receipt submission is timed
+def test_stage_histograms():
+    route = "/receipts/process"
+    stages = ["receive_body", "validate", "score", "store", "serialize"]
+    before = {stage: metrics.STAGE_LATENCY.count(route, stage) for stage in stages}
+    client.post("/receipts/process", json=receipt)
+    for stage in stages:
+        assert metrics.STAGE_LATENCY.count(route, stage) == before[stage] + 1, stage
+
+
+# 3. Test the /metrics endpoint serves the Prometheus text format
+def test_metrics_endpoint():
+    client.post("/receipts/process", json=receipt)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE receipts_http_request_duration_seconds histogram" in body
+    assert 'receipts_http_request_duration_seconds_bucket{route="/receipts/process",le="+Inf"}' in body
+    assert "# TYPE receipts_points_not_found_total counter" in body
+    assert "/metrics" not in client.get("/openapi.json").json()["paths"]
+
+
+# 4. Test histogram buckets are cumulative
+def test_histogram_render():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+    assert list(histogram.render())[2:] == [
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1.0"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_count{stage="a"} 3',
+        'test_seconds_sum{stage="a"} 5.55',
+    ]
+
+
+# 5. Test stage timing outside a request is a no-op
+def test_stage_outside_request():
+    count = metrics.STAGE_LATENCY.count("unmatched", "score")
+    with metrics.stage("score"):
+        pass
+    assert metrics.STAGE_LATENCY.count("unmatched", "score") == count
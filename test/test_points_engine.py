@@ -0,0 +1,69 @@
+import pytest
+from app.models import Receipt
+from app.points_calculator import calculate_points
+from app.points_engine import ReceiptColumns, calculate_points_bulk, np, score_columns, to_cents
+from benchmarks.synthetic import generate_receipts
+
+engines = [pytest.param(False, id="python")]
+if np is not None:
+    engines.append(pytest.param(True, id="numpy"))
+
+
+def edge_case_receipts():
+    """Receipts sitting on the boundary of every rule."""
+    base = {
+        "retailer": "Café & Co 7-Eleven",
+        "purchaseDate": "2022-01-31",
+        "purchaseTime": "14:00",
+        "items": [{"shortDescription": "   Klarbrunn 12-PK 12 FL OZ  ", "price": "12.00"}],
+        "total": "0.00",
+    }
+    receipts = [base]
+    for purchase_time in ["14:00:00.000001", "15:59:59.999999", "16:00", "13:59:59", "00:00"]:
+        receipts.append({**base, "purchaseTime": purchase_time})
+    for total in ["0.25", "0.50", "1.00", "0.01", "99999999999.75"]:
+        receipts.append({**base, "total": total})
+    for price in ["0.00", "0.01", "5.00", "5.01", "4.99"]:
+        receipts.append({**base, "items": [{"shortDescription": "abc", "price": price}] * 3})
+    # Amounts too large for 64-bit columns fall back to Python integers
+    receipts.append({**base, "total": "123456789012345678901234.00"})
+    return receipts
+
+
+# 1. Test cents conversion
+def test_to_cents():
+    assert to_cents("0.00") == 0
+    assert to_cents("6.49") == 649
+    assert to_cents("12345.05") == 1234505
+
+
+# 2. Differential test against the scalar calculator over randomized receipts
+@pytest.mark.parametrize("use_numpy", engines)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bulk_matches_scalar(use_numpy, seed):
+    receipts = [Receipt.model_validate(data) for data in generate_receipts(500, seed=seed, max_items=20)]
+    expected = [calculate_points(receipt) for receipt in receipts]
+    assert calculate_points_bulk(receipts, use_numpy=use_numpy) == expected
+
+
+# 3. Differential test on rule boundaries
+@pytest.mark.parametrize("use_numpy", engines)
+def test_bulk_matches_scalar_edge_cases(use_numpy):
+    receipts = [Receipt.model_validate(data) for data in edge_case_receipts()]
+    expected = [calculate_points(receipt) for receipt in receipts]
+    assert calculate_points_bulk(receipts, use_numpy=use_numpy) == expected
+    assert calculate_points_bulk(receipts[:-1], use_numpy=use_numpy) == expected[:-1]
+
+
+# 4. Test columns of very large amounts are kept as Python integers
+def test_wide_columns():
+    receipts = [Receipt.model_validate(data) for data in edge_case_receipts()]
+    assert ReceiptColumns.from_receipts(receipts).wide
+    assert not ReceiptColumns.from_receipts(receipts[:-1]).wide
+
+
+# 5. Test empty input
+@pytest.mark.parametrize("use_numpy", engines)
+def test_bulk_empty(use_numpy):
+    assert score_columns(ReceiptColumns(), use_numpy=use_numpy) == []
+    assert calculate_points_bulk([], use_numpy=use_numpy) == []
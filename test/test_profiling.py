@@ -0,0 +1,97 @@
+import dataclasses
+import json
+import pstats
+
+from fastapi.testclient import TestClient
+import app.main as main
+from app import profiling
+from app.profiling import ProfileRing, ProfilingMiddleware, body_shape, redact
+
+RECEIPT = {
+    "retailer": "Target 42",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}] * 30,
+    "total": "194.70",
+}
+
+
+def profiled_client(tmp_path, monkeypatch, **options):
+    ring = ProfileRing(str(tmp_path), max_entries=options.pop("max_entries", 100))
+    monkeypatch.setattr(main, "profile_ring", ring)
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, profile_token=options.get("token", "")))
+    return TestClient(ProfilingMiddleware(main.app, ring, **options)), ring
+
+
+# 1. Test the shape keeps lengths and character classes but none of the text
+def test_redacted_shape():
+    assert redact("Mountain Dew 12PK-ü€") == "aaaaaaaa aaa 99aa-a?"
+    shape = body_shape("/receipts/process", json.dumps(RECEIPT).encode(), "application/json")
+    receipt = shape["receipt"]
+    assert receipt["retailer"] == "aaaaaa 99" and receipt["total"] == "999.99"
+    assert receipt["item_count"] == 30 and len(receipt["items"]) == profiling.SHAPE_ITEMS
+    assert receipt["description_length_max"] == 17
+    assert "Target" not in json.dumps(shape)
+
+    batch = "\n".join(json.dumps(r) for r in ({"items": []}, RECEIPT)).encode()
+    shape = body_shape("/receipts/process/batch", batch, "application/x-ndjson")
+    assert shape["receipts"] == 2 and shape["largest_receipt"]["item_count"] == 30
+    assert body_shape("/receipts/process", b"{oops", "application/json")["json"] is False
+
+
+# 2. Test slow profiled requests are captured with their profile, fast ones are not
+def test_capture(tmp_path, monkeypatch):
+    client, ring = profiled_client(tmp_path, monkeypatch, profile_all=True, slow_seconds=0)
+    response = client.post("/receipts/process", json=RECEIPT)
+    assert response.status_code == 200
+    client.get("/receipts/unknown/points")  # Reads are never profiled
+    [entry] = ring.entries()
+    assert entry["status"] == 200 and entry["trigger"] == "config"
+    assert entry["shape"]["receipt"]["item_count"] == 30
+    functions = {name for _, _, name in pstats.Stats(ring.profile_path(entry["id"])).stats}
+    assert "lean_points" in functions or "calculate_points" in functions
+
+    client, ring = profiled_client(tmp_path / "fast", monkeypatch, profile_all=True, slow_seconds=10)
+    client.post("/receipts/process", json=RECEIPT)
+    assert ring.entries() == []
+
+
+# 3. Test the header token and the sample rate select requests, and the ring keeps the newest
+def test_selection_and_ring(tmp_path, monkeypatch):
+    client, ring = profiled_client(tmp_path, monkeypatch, token="secret", slow_seconds=0, max_entries=2)
+    client.post("/receipts/process", json=RECEIPT)
+    client.post("/receipts/process", json=RECEIPT, headers={"X-Profile-Token": "wrong"})
+    assert ring.entries() == []
+    for _ in range(3):
+        client.post("/receipts/process", json=RECEIPT, headers={"X-Profile-Token": "secret"})
+    entries = ring.entries()
+    assert len(entries) == 2 and len(list(tmp_path.iterdir())) == 4
+    assert entries[0]["captured_at"] >= entries[1]["captured_at"]
+    assert {entry["trigger"] for entry in entries} == {"header"}
+
+    client, ring = profiled_client(tmp_path / "sampled", monkeypatch, sample_rate=1.0, slow_seconds=0)
+    client.post("/receipts/process/batch", json=[RECEIPT, RECEIPT])
+    [entry] = ring.entries()
+    assert entry["trigger"] == "sample" and entry["shape"]["receipts"] == 2
+
+
+# 4. Test the endpoints list and download profiles behind the token
+def test_endpoints(tmp_path, monkeypatch):
+    client, ring = profiled_client(tmp_path, monkeypatch, token="secret", slow_seconds=0)
+    headers = {"X-Profile-Token": "secret"}
+    client.post("/receipts/process", json=RECEIPT, headers=headers)
+    assert client.get("/profiles").status_code == 403
+    [entry] = client.get("/profiles", headers=headers).json()["profiles"]
+    download = client.get(f"/profiles/{entry['id']}", headers=headers)
+    assert download.headers["content-type"] == "application/octet-stream"
+    assert download.content == (tmp_path / f"{entry['id']}.prof").read_bytes()
+    assert "cumulative" in client.get(f"/profiles/{entry['id']}?format=text", headers=headers).text
+    assert client.get("/profiles/../etc", headers=headers).status_code == 404
+    assert client.get("/profiles/0000000000000-1-1", headers=headers).status_code == 404
+
+
+# 5. Test the endpoints are unavailable without profiling
+def test_disabled():
+    client = TestClient(main.app)
+    assert main.profile_ring is None
+    assert client.get("/profiles").status_code == 404
@@ -0,0 +1,45 @@
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import ReceiptResponse, new_receipt_id
+from app.responses import id_response, points_response
+
+client = TestClient(app)
+
+receipt = {
+    "retailer": "Target",
+    "purchaseDate": "2022-01-01",
+    "purchaseTime": "13:01",
+    "items": [
+        {"shortDescription": "Mountain Dew 12PK", "price": "6.49"}
+    ],
+    "total": "6.49"
+}
+
+
+# 1. Test the byte responses match what JSONResponse renders
+def test_bodies_match_json_response():
+    receipt_id = new_receipt_id()
+    assert id_response(receipt_id).body == JSONResponse({"id": receipt_id}).body
+    for points in (0, 28, 10**20):
+        assert points_response(points).body == JSONResponse({"points": points}).body
+    assert id_response(receipt_id).headers["content-type"] == "application/json"
+
+
+# 2. Test the endpoints serve valid response-model JSON
+def test_endpoint_responses():
+    response = client.post("/receipts/process", json=receipt)
+    assert response.headers["content-type"] == "application/json"
+    ReceiptResponse.model_validate_json(response.content)
+    points = client.get(f"/receipts/{response.json()['id']}/points")
+    assert points.content == b'{"points":12}'
+    assert int(points.headers["content-length"]) == len(points.content)
+
+
+# 3. Test the OpenAPI schemas still document the response models
+def test_openapi_response_schemas():
+    paths = client.get("/openapi.json").json()["paths"]
+    def schema(path, method):
+        return paths[path][method]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema("/receipts/process", "post") == {"$ref": "#/components/schemas/ReceiptResponse"}
+    assert schema("/receipts/{id}/points", "get") == {"$ref": "#/components/schemas/PointsResponse"}
@@ -0,0 +1,125 @@
+from datetime import date, time
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app import models
+from app.ids import id_minter, uuid7, uuid7_millis
+from app.index import ReceiptIndex
+from app.retention import RetentionStore
+from app.storage import CompactStore, DictStore
+
+client = TestClient(main.app)
+
+HOUR = 3600.0
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def minted_at(clock: Clock) -> str:
+    return uuid7(int(clock.now * 1000))
+
+
+# 1. Test UUIDv7 IDs are canonical, time-ordered and carry their creation time
+def test_uuid7():
+    first, second = uuid7(1_700_000_000_000), uuid7(1_700_000_000_001)
+    assert first < second
+    assert UUID(first).version == 7 and str(UUID(first)) == first
+    assert uuid7_millis(first) == 1_700_000_000_000
+    assert uuid7_millis(str(UUID(int=0))) is None
+    assert uuid7_millis(first.upper()) is None
+    assert uuid7_millis(id_minter("uuid4")()) is None
+    assert uuid7_millis(id_minter("UUID7")()) is not None
+    with pytest.raises(ValueError):
+        id_minter("ulid")
+
+
+# 2. Test expiry drops whole partitions and expired receipts read as unknown before that
+@pytest.mark.parametrize("factory", [DictStore, CompactStore])
+def test_retention_store(factory):
+    clock = Clock()
+    store = RetentionStore(factory, retention_seconds=2 * HOUR, partition_seconds=HOUR, clock=clock)
+    old = [minted_at(clock) for _ in range(3)]
+    store.put_many((receipt_id, 10) for receipt_id in old)
+    clock.now += HOUR
+    recent = minted_at(clock)
+    store.put(recent, 20)
+    assert store.get_many(old + [recent]) == [10, 10, 10, 20]
+    assert store.partitions == 2 and len(store) == 4
+
+    clock.now += 2 * HOUR
+    assert store.get(old[0]) is None and store.expired(old[0])
+    assert store.get(recent) == 20 and not store.expired(recent)
+    store.put(old[0], 30)  # Scored after it expired, not kept
+    assert store.partitions == 2
+    assert len(store) == 1 and store.partitions == 1
+    with pytest.raises(ValueError):
+        store.put(str(UUID(int=1)), 1)
+
+
+# 3. Test memory reaches a steady state under constant ingest
+def test_steady_state():
+    clock = Clock()
+    store = RetentionStore(DictStore, retention_seconds=4 * HOUR, partition_seconds=HOUR, clock=clock)
+    sizes = []
+    for _ in range(24 * 6):
+        store.put_many((minted_at(clock), 1) for _ in range(10))
+        clock.now += HOUR / 6
+        sizes.append((len(store), store.partitions))
+    assert max(size for size, _ in sizes[48:]) == max(size for size, _ in sizes[-48:]) <= 5 * 60
+    assert max(partitions for _, partitions in sizes) <= 6
+
+
+# 4. Test the receipt index drops expired rows and keeps its cursors valid
+def test_index_expiry():
+    clock = Clock()
+    index = ReceiptIndex(load=4)
+    receipt = SimpleNamespace(retailer="Target", purchaseDate=date(2022, 1, 1), purchaseTime=time(13, 1))
+    ids = []
+    for _ in range(20):
+        ids.append(minted_at(clock))
+        index.add(ids[-1], receipt)
+        clock.now += 60
+    page, cursor = index.by_retailer("target", 5)
+    cutoff = uuid7_millis(ids[12])
+    assert index.expire(lambda receipt_id: uuid7_millis(receipt_id) < cutoff) == 12
+    assert len(index) == 8
+    rest, _ = index.by_retailer("target", 100, cursor)
+    assert [entry[0] for entry in rest] == ids[12:]
+    window = ((date(2022, 1, 1), time(0)), (date(2022, 1, 1), time(23)))
+    listed, _ = index.by_datetime(*window, limit=100)
+    assert [entry[0] for entry in listed] == ids[12:]
+    assert len(index._by_datetime) == 8  # Compacted once dropped rows outnumbered live ones
+    index.add(minted_at(clock), receipt)
+    assert index.by_datetime(*window, limit=100)[0][-1][0] == index._ids[-1]
+
+
+# 5. Test expired receipts return 404 from the API
+def test_expired_receipt_is_not_found(monkeypatch):
+    clock = Clock()
+    store = RetentionStore(DictStore, retention_seconds=HOUR, partition_seconds=60, clock=clock)
+    monkeypatch.setattr(main, "store", store)
+    monkeypatch.setattr(main, "retention", store)
+    monkeypatch.setattr(models, "_mint_receipt_id", lambda: minted_at(clock))
+    receipt = {
+        "retailer": "Target",
+        "purchaseDate": "2022-01-01",
+        "purchaseTime": "13:01",
+        "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}],
+        "total": "6.49",
+    }
+    receipt_id = client.post("/receipts/process", json=receipt).json()["id"]
+    assert uuid7_millis(receipt_id) == int(clock.now * 1000)
+    assert client.get(f"/receipts/{receipt_id}/points").status_code == 200
+    clock.now += HOUR + 60
+    response = client.get(f"/receipts/{receipt_id}/points")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "No receipt found for that ID."}
@@ -0,0 +1,274 @@
+import asyncio
+import fcntl
+import multiprocessing
+import os
+import threading
+import tracemalloc
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app.config import Settings
+from app.shared_store import SharedMemoryStore
+from app.sqlite_store import SQLiteStore
+from app.storage import CompactStore, DictStore, ShardedStore, StoreFull, create_store
+
+
+@pytest.fixture(params=["dict", "sharded", "compact", "shared", "sqlite", "wal"])
+def store(request, tmp_path):
+    settings = Settings(
+        store_backend=request.param,
+        store_path=str(tmp_path / "receipts.db"),
+        shm_path=str(tmp_path / "receipts.shm"),
+        shm_capacity=4096,
+        wal_dir=str(tmp_path / "wal"),
+    )
+    store = create_store(settings)
+    yield store
+    store.close()
+
+
+# 1. Test basic get/put behaviour shared by every backend
+def test_put_and_get(store):
+    receipt_id = str(uuid.uuid4())
+    assert store.get(receipt_id) is None
+    assert receipt_id not in store
+
+    store.put(receipt_id, 109)
+    assert store.get(receipt_id) == 109
+    assert receipt_id in store
+    assert len(store) == 1
+
+    store.put_many([(str(uuid.uuid4()), 28), (str(uuid.uuid4()), 0)])
+    assert len(store) == 3
+
+
+# 2. Test concurrent writers from many threads do not lose updates
+def test_concurrent_writes(store):
+    ids = [[str(uuid.uuid4()) for _ in range(200)] for _ in range(8)]
+
+    def writer(chunk):
+        for points, receipt_id in enumerate(chunk):
+            store.put(receipt_id, points)
+
+    threads = [threading.Thread(target=writer, args=(chunk,)) for chunk in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 8 * 200
+    for chunk in ids:
+        assert [store.get(receipt_id) for receipt_id in chunk] == list(range(200))
+
+
+# 3. Test the sqlite backend survives a restart
+def test_sqlite_persists_across_restart(tmp_path):
+    path = str(tmp_path / "receipts.db")
+    store = SQLiteStore(path, batch_size=1000, flush_interval=60)
+    store.put("abc", 42)
+    store.put_many([("def", 7)])
+    store.close()
+
+    reopened = SQLiteStore(path)
+    assert reopened.get("abc") == 42
+    assert reopened.get("def") == 7
+    reopened.close()
+
+
+# 4. Test the sqlite backend commits a partial batch on its own
+def test_sqlite_background_flush(tmp_path):
+    path = str(tmp_path / "receipts.db")
+    store = SQLiteStore(path, batch_size=1000, flush_interval=0.01)
+    store.put("abc", 42)
+    for _ in range(200):
+        if not store._conn.in_transaction:
+            break
+        threading.Event().wait(0.01)
+    assert not store._conn.in_transaction
+    store.close()
+
+
+# 5. Test backend selection from configuration
+def test_create_store_from_settings(tmp_path):
+    assert isinstance(create_store(Settings()), DictStore)
+    sharded = create_store(Settings.from_env({"RECEIPTS_STORE_BACKEND": "sharded", "RECEIPTS_STORE_SHARDS": "4"}))
+    assert isinstance(sharded, ShardedStore)
+    assert len(sharded._shards) == 4
+    with pytest.raises(ValueError):
+        create_store(Settings(store_backend="redis"))
+
+
+# 6. Test the compact store only accepts canonical UUID IDs
+def test_compact_store_ids():
+    store = CompactStore(capacity=8)
+    receipt_id = str(uuid.uuid4())
+    store.put(receipt_id, 5)
+    assert store.get(receipt_id) == 5
+    assert store.get(receipt_id.upper()) is None
+    assert store.get(receipt_id.replace("-", "")) is None
+    assert store.get("1234") is None
+    with pytest.raises(ValueError):
+        store.put("1234", 5)
+    with pytest.raises(ValueError):
+        store.put(str(uuid.UUID(int=0)), 5)
+
+
+# 7. Test the compact store grows and keeps every entry
+def test_compact_store_growth():
+    store = CompactStore(capacity=8)
+    expected = {str(uuid.uuid4()): points for points in range(5000)}
+    for receipt_id, points in expected.items():
+        store.put(receipt_id, points)
+    store.put(next(iter(expected)), -1)  # Overwrites keep the count unchanged
+    expected[next(iter(expected))] = -1
+
+    assert len(store) == 5000
+    assert dict(store.items()) == expected
+    assert all(store.get(receipt_id) == points for receipt_id, points in expected.items())
+
+
+# 8. Test the compact store is several times smaller than the dict for the same workload
+def test_compact_store_memory():
+    keys = [uuid.uuid4().bytes for _ in range(5000)]
+
+    def measure(store):
+        # IDs are minted inside the traced region, as they are per request in the service
+        tracemalloc.start()
+        try:
+            for points, key in enumerate(keys):
+                store.put(str(uuid.UUID(bytes=key)), 1000 + points)
+            return tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    dict_bytes = measure(DictStore())
+    compact = CompactStore()
+    compact_bytes = measure(compact)
+
+    assert compact.bytes_per_entry() < 48
+    assert compact_bytes * 3 < dict_bytes
+
+
+def _write_shared(path, ids):
+    store = SharedMemoryStore(path)
+    for points, receipt_id in enumerate(ids):
+        store.put(receipt_id, points)
+    store.close()
+
+
+# 9. Test worker processes sharing one table see each other's writes
+def test_shared_store_across_processes(tmp_path):
+    path = str(tmp_path / "receipts.shm")
+    store = SharedMemoryStore(path, capacity=8192)
+    ids = [[str(uuid.uuid4()) for _ in range(500)] for _ in range(4)]
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_write_shared, args=(path, chunk)) for chunk in ids]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert len(store) == 2000
+    for chunk in ids:
+        assert [store.get(receipt_id) for receipt_id in chunk] == list(range(500))
+    store.close()
+
+
+# 10. Test the shared store keeps the capacity it was created with and refuses to overfill
+def test_shared_store_capacity(tmp_path):
+    path = str(tmp_path / "receipts.shm")
+    first = SharedMemoryStore(path, capacity=10)
+    second = SharedMemoryStore(path, capacity=5000)
+    assert second.capacity == 10
+
+    assert first.max_receipts == 9
+    first.put_many((str(uuid.uuid4()), 1) for _ in range(8))
+    with pytest.raises(StoreFull):
+        second.put_many((str(uuid.uuid4()), 1) for _ in range(2))  # Refused whole
+    first.put(str(uuid.uuid4()), 1)
+    with pytest.raises(StoreFull):
+        first.put(str(uuid.uuid4()), 1)
+    assert len(second) == 9
+    first.close()
+    second.close()
+
+
+# 11. Test batched reads match single reads on every backend
+def test_get_many(store):
+    ids = [str(uuid.uuid4()) for _ in range(1200)]
+    store.put_many((receipt_id, points) for points, receipt_id in enumerate(ids[::2]))
+    lookup = ids + ["not-a-uuid", ids[0]]
+    assert store.get_many(lookup) == [store.get(receipt_id) for receipt_id in lookup]
+    assert store.get_many(lookup)[:4] == [0, None, 1, None]
+    assert store.get_many([]) == []
+
+
+# 12. Test the API answers 503 once the shared table is full
+def test_full_store_response(tmp_path, monkeypatch):
+    store = SharedMemoryStore(str(tmp_path / "receipts.shm"), capacity=2)
+    monkeypatch.setattr(main, "store", store)
+    receipt = {
+        "retailer": "Target",
+        "purchaseDate": "2022-01-01",
+        "purchaseTime": "13:01",
+        "items": [{"shortDescription": "Mountain Dew 12PK", "price": "6.49"}],
+        "total": "6.49",
+    }
+    client = TestClient(main.app)
+    assert client.post("/receipts/process", json=receipt).status_code == 200
+    response = client.post("/receipts/process", json=receipt)
+    assert response.status_code == 503
+    assert response.json() == {"detail": "The receipt store is full."}
+    assert client.post("/receipts/process/batch", json=[receipt]).status_code == 503
+    store.close()
+
+
+# 13. Test a shared store put waiting on another process's lock does not block the event loop
+def test_shared_put_off_event_loop(tmp_path):
+    path = str(tmp_path / "receipts.shm")
+    store = SharedMemoryStore(path, capacity=64)
+    holder = os.open(path, os.O_RDWR)
+    fcntl.flock(holder, fcntl.LOCK_EX)  # As another worker's put_many would
+    # Let go eventually, so a put that blocks the loop fails the test instead of hanging it
+    timer = threading.Timer(1.0, fcntl.flock, (holder, fcntl.LOCK_UN))
+    timer.start()
+
+    async def run():
+        put = asyncio.ensure_future(store.put_async(str(uuid.uuid4()), 1))
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+        assert not put.done()
+        fcntl.flock(holder, fcntl.LOCK_UN)
+        await put
+
+    try:
+        asyncio.run(run())
+    finally:
+        timer.cancel()
+        timer.join()
+        os.close(holder)
+    assert len(store) == 1
+    store.close()
+
+
+# 14. Test growth moves a bounded number of slots per write, with every entry readable throughout
+def test_compact_store_incremental_growth():
+    store = CompactStore(capacity=1024)
+    ids = [str(uuid.uuid4()) for _ in range(1000)]
+    for points, receipt_id in enumerate(ids[:819]):
+        store.put(receipt_id, points)
+    assert store._old is None
+    store.put(ids[819], 819)  # Crosses the load factor: a larger table takes new writes
+    assert store._old is not None and store._old[3] == CompactStore._MIGRATE_SLOTS
+    store.put(ids[0], -1)  # Possibly still only in the old table
+    assert store.get(ids[0]) == -1 and len(store) == 820
+    assert store.get_many(ids[1:820]) == list(range(1, 820))
+    for points, receipt_id in enumerate(ids[820:], start=820):
+        store.put(receipt_id, points)
+    assert store._old is None
+    assert store.get_many(ids) == [-1] + list(range(1, 1000))
+    assert len(store) == 1000 and len(dict(store.items())) == 1000
@@ -0,0 +1,129 @@
+import os
+import threading
+import uuid
+
+import pytest
+from app.wal import LOG_RECORD, LogStructuredStore, log_name
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "wal")
+
+
+def fill(store, count, offset=0):
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    for points, receipt_id in enumerate(ids, start=offset):
+        store.put(receipt_id, points)
+    return ids
+
+
+# 1. Test writes survive a restart through log replay alone
+def test_replay_log_after_restart(directory):
+    store = LogStructuredStore(directory, snapshot_every=10**9)
+    ids = fill(store, 100)
+    store.close()
+
+    reopened = LogStructuredStore(directory)
+    assert reopened.replayed_records == 100
+    assert [reopened.get(receipt_id) for receipt_id in ids] == list(range(100))
+    assert len(reopened) == 100
+    reopened.close()
+
+
+# 2. Test a snapshot folds the log so startup replays only the tail
+def test_snapshot_then_replay_tail(directory):
+    store = LogStructuredStore(directory, snapshot_every=10**9)
+    old_ids = fill(store, 500)
+    store.snapshot()
+    store.put(old_ids[0], -1)  # Newer value must shadow the snapshot
+    new_ids = fill(store, 10, offset=500)
+    store.close()
+    assert [name for name in os.listdir(directory) if name.endswith(".log")] == [log_name(1)]
+
+    reopened = LogStructuredStore(directory)
+    assert reopened.replayed_records == 11
+    assert reopened.get(old_ids[0]) == -1
+    assert [reopened.get(receipt_id) for receipt_id in old_ids[1:]] == list(range(1, 500))
+    assert [reopened.get(receipt_id) for receipt_id in new_ids] == list(range(500, 510))
+    assert reopened.get(str(uuid.uuid4())) is None
+    assert len(reopened) == 510
+
+    # A second snapshot merges the tail into the previous one
+    reopened.snapshot()
+    assert reopened.get(old_ids[0]) == -1
+    assert len(reopened) == 510
+    reopened.close()
+
+
+# 3. Test startup cost stays flat as history grows
+def test_startup_independent_of_history(directory, tmp_path):
+    def history(path, size):
+        store = LogStructuredStore(path, snapshot_every=10**9)
+        fill(store, size)
+        store.snapshot()
+        fill(store, 50)
+        store.close()
+        return LogStructuredStore(path)
+
+    small = history(str(tmp_path / "small"), 100)
+    large = history(str(tmp_path / "large"), 20000)
+    assert small.replayed_records == large.replayed_records == 50
+    assert len(large) == 20050
+    assert large.startup_seconds < 0.5
+    small.close()
+    large.close()
+
+
+# 4. Test a torn record at the end of the log is dropped on replay
+def test_torn_record(directory):
+    store = LogStructuredStore(directory)
+    ids = fill(store, 3)
+    store.close()
+    path = os.path.join(directory, log_name(0))
+    with open(path, "ab") as log:
+        log.write(b"\x01" * (LOG_RECORD.size - 5))
+
+    reopened = LogStructuredStore(directory)
+    assert reopened.replayed_records == 3
+    assert os.path.getsize(path) == 3 * LOG_RECORD.size
+    assert [reopened.get(receipt_id) for receipt_id in ids] == [0, 1, 2]
+    reopened.close()
+
+
+# 5. Test the background committer snapshots once the tail is large enough
+def test_automatic_snapshot(directory):
+    store = LogStructuredStore(directory, fsync_interval=0.01, snapshot_every=100)
+    ids = fill(store, 150)
+    for _ in range(500):
+        if store._snapshot.count:
+            break
+        store._closed.wait(0.01)
+    assert store._snapshot.count == 150
+    assert [store.get(receipt_id) for receipt_id in ids] == list(range(150))
+    store.close()
+
+
+# 6. Test writes and reads do not wait for a group commit's fsync
+def test_fsync_outside_lock(directory, monkeypatch):
+    store = LogStructuredStore(directory, fsync_interval=3600, snapshot_every=10**9)
+    ids = fill(store, 10)
+    syncing, release = threading.Event(), threading.Event()
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        syncing.set()
+        release.wait(5)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+    committer = threading.Thread(target=store.flush)
+    committer.start()
+    assert syncing.wait(5)
+    assert not store._lock.locked()
+    fill(store, 10, offset=10)
+    assert store.get(ids[0]) == 0
+    release.set()
+    committer.join()
+    monkeypatch.setattr(os, "fsync", fsync)
+    store.close()